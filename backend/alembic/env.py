@@ -5,20 +5,35 @@ from sqlalchemy import pool
 
 from alembic import context
 
+from app.database import DATABASE_URL, Base
+from app import models  # noqa: F401  (registers every table on Base.metadata)
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+# This line sets up loggers basically. Skipped when the app runs migrations
+# itself (app.database.upgrade_database), so the server's logging is kept.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# the app's DATABASE_URL wins over the placeholder in alembic.ini
+if DATABASE_URL:
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
+target_metadata = Base.metadata
 
-# add your model's MetaData object here
-# for 'autogenerate' support
-# from myapp import mymodel
-# target_metadata = mymodel.Base.metadata
-target_metadata = None
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Leave alone what the models do not describe: the patient search index
+    (SQLite FTS5 tables, PostgreSQL trigram indexes) is managed by
+    app.services.search_service.
+    """
+    if reflected and compare_to is None and type_ in ("table", "index"):
+        return False
+    return True
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
@@ -44,6 +59,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -65,7 +82,11 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite cannot ALTER most things; batch mode rebuilds the table
+            render_as_batch=connection.dialect.name == "sqlite",
         )
 
         with context.begin_transaction():
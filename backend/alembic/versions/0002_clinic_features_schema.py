@@ -0,0 +1,144 @@
+"""tables and columns added since the baseline
+
+Billing rollups, the prescribed-medicine index, background jobs, queue
+timing columns, updated_at on prescriptions / bills, and doctor / duration
+on appointments. Databases that were kept current with create_all already
+have some of these, so every step is skipped when its object exists.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-06-03 09:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_COLUMNS = {
+    "queue_tokens": [
+        sa.Column("called_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    ],
+    "prescriptions": [sa.Column("updated_at", sa.DateTime(), nullable=True)],
+    "billing": [sa.Column("updated_at", sa.DateTime(), nullable=True)],
+    "appointments": [
+        sa.Column("doctor_id", sa.Integer(), sa.ForeignKey("users.id", name="fk_appointments_doctor_id"), nullable=True),
+        sa.Column("duration_minutes", sa.Integer(), nullable=False, server_default="15"),
+        sa.Column("end_time", sa.DateTime(), nullable=True),
+    ],
+}
+
+
+def _create_table(tables, name, *columns, indexes=()):
+    if name in tables:
+        return
+    op.create_table(name, *columns)
+    for index_name, index_columns in indexes:
+        op.create_index(index_name, name, index_columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    for table, columns in NEW_COLUMNS.items():
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        missing = [c for c in columns if c.name not in existing]
+        if missing:
+            with op.batch_alter_table(table) as batch:
+                for column in missing:
+                    batch.add_column(column)
+
+    op.execute("UPDATE prescriptions SET updated_at = created_at WHERE updated_at IS NULL")
+    op.execute("UPDATE billing SET updated_at = created_at WHERE updated_at IS NULL")
+    if op.get_bind().dialect.name == "sqlite":
+        end_time = "strftime('%Y-%m-%d %H:%M:%f', appointment_time, '+' || duration_minutes || ' minutes')"
+    else:
+        end_time = "appointment_time + make_interval(mins => duration_minutes)"
+    op.execute(f"UPDATE appointments SET end_time = {end_time} WHERE end_time IS NULL")
+
+    if "ix_appointments_doctor_time" not in {i["name"] for i in inspector.get_indexes("appointments")}:
+        op.create_index("ix_appointments_doctor_time", "appointments", ["doctor_id", "appointment_time"])
+
+    _create_table(
+        tables, "billing_daily_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("bill_count", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("day", "status"),
+    )
+    _create_table(
+        tables, "billing_patient_rollups",
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("bill_count", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("patient_id", "status"),
+    )
+    _create_table(
+        tables, "billing_status_totals",
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("bill_count", sa.Integer(), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("status"),
+    )
+    _create_table(
+        tables, "prescription_medicines",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("prescription_id", sa.Integer(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("name_key", sa.String(), nullable=False),
+        sa.Column("dosage", sa.String(), nullable=True),
+        sa.Column("duration", sa.String(), nullable=True),
+        sa.Column("prescribed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["prescription_id"], ["prescriptions.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        indexes=[
+            ("ix_prescription_medicines_prescription_id", ["prescription_id"]),
+            ("ix_prescription_medicines_patient_id", ["patient_id"]),
+            ("ix_prescription_medicines_name_date", ["name_key", "prescribed_at"]),
+        ],
+    )
+    _create_table(
+        tables, "background_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        indexes=[
+            ("ix_background_jobs_id", ["id"]),
+            ("ix_background_jobs_status_created", ["status", "created_at"]),
+        ],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("background_jobs", "prescription_medicines", "billing_status_totals",
+                  "billing_patient_rollups", "billing_daily_rollups"):
+        op.drop_table(table)
+    op.drop_index("ix_appointments_doctor_time", table_name="appointments")
+    for table, columns in NEW_COLUMNS.items():
+        with op.batch_alter_table(table) as batch:
+            for column in reversed(columns):
+                if column.foreign_keys:
+                    batch.drop_constraint("fk_appointments_doctor_id", type_="foreignkey")
+                batch.drop_column(column.name)
@@ -0,0 +1,55 @@
+"""hot-path indexes
+
+One composite index per router filter + ORDER BY: per-patient history
+pages, date-range exports and dashboards, the queue's token lookups, and
+keyset pagination on (time, id). Checked by check_query_plans.py.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-06-03 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_appointments_patient_time", "appointments", ["patient_id", "appointment_time", "id"]),
+    ("ix_appointments_status_time", "appointments", ["status", "appointment_time", "id"]),
+    ("ix_appointments_time", "appointments", ["appointment_time", "id"]),
+    ("ix_prescriptions_patient_created", "prescriptions", ["patient_id", "created_at"]),
+    ("ix_prescriptions_created", "prescriptions", ["created_at", "id"]),
+    ("ix_billing_patient_created", "billing", ["patient_id", "created_at"]),
+    ("ix_billing_status_created", "billing", ["status", "created_at", "id"]),
+    ("ix_billing_created", "billing", ["created_at", "id"]),
+    ("ix_queue_tokens_appointment", "queue_tokens", ["appointment_id"]),
+    ("ix_queue_tokens_token_number", "queue_tokens", ["token_number"]),
+    ("ix_queue_tokens_created", "queue_tokens", ["created_at"]),
+    ("ix_queue_tokens_status_created", "queue_tokens", ["status", "created_at"]),
+    ("ix_queue_tokens_completed", "queue_tokens", ["completed_at"]),
+    ("ix_ai_notes_patient_created", "ai_notes", ["patient_id", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # gains a trailing id so it also serves ORDER BY appointment_time, id
+    op.drop_index("ix_appointments_doctor_time", table_name="appointments")
+    op.create_index("ix_appointments_doctor_time", "appointments", ["doctor_id", "appointment_time", "id"])
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_index("ix_appointments_doctor_time", table_name="appointments")
+    op.create_index("ix_appointments_doctor_time", "appointments", ["doctor_id", "appointment_time"])
@@ -0,0 +1,43 @@
+"""token revocation shared across processes
+
+users.token_version invalidates every token of a user after a password or
+role change; revoked_tokens records logged-out tokens until they expire.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-06-10 14:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("jti", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index("ix_revoked_tokens_email_expires", "revoked_tokens", ["email", "expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_revoked_tokens_email_expires", table_name="revoked_tokens")
+    op.drop_table("revoked_tokens")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
@@ -0,0 +1,37 @@
+"""one AI note per background job
+
+ai_notes.job_id (unique) lets a SOAP job that is retried after its note
+was saved find that note instead of inserting a second one.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-12 11:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("ai_notes") as batch:
+        batch.add_column(sa.Column("job_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_ai_notes_job_id", "background_jobs", ["job_id"], ["id"])
+        batch.create_index("ix_ai_notes_job", ["job_id"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("ai_notes") as batch:
+        batch.drop_index("ix_ai_notes_job")
+        batch.drop_constraint("fk_ai_notes_job_id", type_="foreignkey")
+        batch.drop_column("job_id")
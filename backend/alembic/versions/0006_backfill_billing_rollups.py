@@ -0,0 +1,64 @@
+"""build the billing rollups for existing bills
+
+Until now every API process backfilled empty rollups at startup, so
+several workers starting together could all insert them. As a migration
+it runs once per database; the inserts skip rows that already exist in
+case two processes apply it at the same time.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-06-17 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+billing = sa.table(
+    "billing",
+    sa.column("id", sa.Integer), sa.column("patient_id", sa.Integer), sa.column("amount", sa.Float),
+    sa.column("status", sa.String), sa.column("created_at", sa.DateTime),
+)
+totals = ("bill_count", "total_amount")
+daily = sa.table("billing_daily_rollups", sa.column("day"), sa.column("status"), *map(sa.column, totals))
+by_patient = sa.table("billing_patient_rollups", sa.column("patient_id"), sa.column("status"), *map(sa.column, totals))
+by_status = sa.table("billing_status_totals", sa.column("status"), *map(sa.column, totals))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.execute(sa.select(by_status.c.status).limit(1)).first():
+        return   # already built and kept current by the mapper events
+    dialect = bind.dialect.name
+    day = sa.func.date(billing.c.created_at) if dialect == "sqlite" else sa.cast(billing.c.created_at, sa.Date)
+    # same defaults as the mapper events: null status counts as unpaid, undated bills skip the daily rollup
+    status = sa.func.coalesce(billing.c.status, "unpaid")
+    count, total = sa.func.count(billing.c.id), sa.func.sum(billing.c.amount)
+    for table, keys, where in (
+        (daily, [day, status], billing.c.created_at.isnot(None)),
+        (by_patient, [billing.c.patient_id, status], sa.true()),
+        (by_status, [status], sa.true()),
+    ):
+        rows = sa.select(*keys, count, total).where(where).group_by(*keys)
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert(table).from_select([c.name for c in table.c], rows).on_conflict_do_nothing()
+        else:
+            stmt = sa.insert(table).from_select([c.name for c in table.c], rows)
+        bind.execute(stmt)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # the rows stay valid (the mapper events keep them current) and 0002 drops the tables
+    pass
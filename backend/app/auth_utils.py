@@ -1,55 +1,229 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import time
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import delete, event, select, update
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
-from app.database import get_db
-from app.models import User
+from app.cache import TTLCache
+from app.database import SessionLocal
+from app.models import RevokedToken, User
+from app.schemas import UserPrincipal
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with any other cost are flagged by verify_and_update and rehashed on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Verified token -> claims, so repeat requests skip signature checks
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# email -> (UserPrincipal, token_version, revoked jtis), so authenticated requests
+# skip the users query; other processes' revocations are seen once this expires
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# Token ids revoked by this process, for immediate effect here
+_revoked_jti = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+class HashPoolBusy(Exception):
+    """
+    Raised when the password hashing pool already has its maximum backlog.
+    """
+
+
+class PasswordHashPool:
+    """
+    Runs bcrypt on a bounded thread pool so logins never block the event
+    loop (bcrypt releases the GIL while hashing). At most max_pending
+    hashes are queued or running; further callers wait up to
+    queue_timeout seconds for a slot and then get HashPoolBusy, so a
+    login burst is shed instead of piling up unbounded.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = asyncio.Semaphore(max_pending)
+        self.queue_timeout = queue_timeout
+
+    async def _run(self, fn, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HashPoolBusy()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def verify_and_update(self, plain_password: str, hashed_password: Optional[str]):
+        """
+        Returns (verified, new_hash); new_hash is set when the stored hash
+        should be replaced because the configured cost changed. A missing
+        hash still costs one bcrypt round so unknown emails aren't faster.
+        """
+        if hashed_password is None:
+            await self._run(pwd_context.dummy_verify)
+            return False, None
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+
+password_hash_pool = PasswordHashPool()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def _decode_token(token: str) -> dict:
+    """
+    Verify a token, memoizing the claims until the token expires.
+    Raises JWTError for invalid, expired or revoked tokens.
+    """
+    claims = _token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        ttl = claims.get("exp", 0) - time.time()
+        if ttl > 0:
+            _token_cache.set(token, claims, ttl=ttl)
+    elif claims.get("exp", 0) <= time.time():
+        _token_cache.invalidate(token)
+        raise JWTError("Signature has expired.")
+    if claims.get("jti") and _revoked_jti.get(claims["jti"]):
+        raise JWTError("Token has been revoked.")
+    return claims
+
+def revoke_token(token: str):
+    """
+    Revoke a token (e.g. on logout): immediately in this process, and in
+    the revoked_tokens table for the others.
+    """
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return
+    _token_cache.invalidate(token)
+    ttl = claims.get("exp", 0) - time.time()
+    if not claims.get("jti") or ttl <= 0 or not claims.get("sub"):
+        return
+    _revoked_jti.set(claims["jti"], True, ttl=ttl)
+    db: Session = SessionLocal()
+    try:
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+        db.merge(RevokedToken(
+            jti=claims["jti"], email=claims["sub"], expires_at=datetime.utcfromtimestamp(claims["exp"])
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def invalidate_user(email: str):
+    """
+    Drop the cached principal so the next request reloads it; call after
+    changing a user's profile. Other processes reload within AUTH_CACHE_TTL.
+    """
+    _principal_cache.invalidate(email)
+
+def revoke_user_tokens(email: str, db: Optional[Session] = None):
+    """
+    Reject every token issued to a user so far; call after a password or
+    role change. Bumps users.token_version (committed by the caller when a
+    session is passed), so every process rejects them once its cached
+    principal expires. This process's cached principal is dropped only
+    after the commit: dropped earlier, a request in between could cache the
+    old version again and keep accepting stale tokens until it expires.
+    """
+    stmt = update(User).where(User.email == email).values(token_version=User.token_version + 1)
+    if db is not None:
+        db.execute(stmt)
+        event.listen(db, "after_commit", lambda session: _principal_cache.invalidate(email), once=True)
+        return
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+    _principal_cache.invalidate(email)
+
+def _load_principal(email: str) -> Optional[tuple]:
+    """
+    (principal, token_version, jtis revoked by any process) for a user.
+    """
+    db: Session = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        if not user:
+            return None
+        revoked = db.scalars(select(RevokedToken.jti).where(
+            RevokedToken.email == email, RevokedToken.expires_at > datetime.utcnow()
+        )).all()
+        return UserPrincipal.model_validate(user), user.token_version, frozenset(revoked)
+    finally:
+        db.close()
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    cached = _principal_cache.get(email)
+    # a token newer than the cached version was issued after a change: reload
+    if cached is None or payload.get("ver", 0) > cached[1]:
+        cached = _load_principal(email)
+        if cached is None:
+            raise credentials_exception
+        _principal_cache.set(email, cached)
+    user, token_version, revoked = cached
+    if payload.get("ver", 0) != token_version or payload.get("jti") in revoked:
         raise credentials_exception
     return user
@@ -0,0 +1,68 @@
+# Small in-process caches shared by routers and services
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+
+    Entries are evicted least-recently-used once maxsize is reached and
+    treated as absent after ttl seconds. The cache is per process, so
+    invalidate() only affects the worker it runs in.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# patient_id -> (version, PatientSummary); checked against the database on every read
+patient_summary_cache = TTLCache(
+    maxsize=int(os.getenv("PATIENT_SUMMARY_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("PATIENT_SUMMARY_CACHE_TTL", "300"))
+)
+
+# date -> DashboardStats; short TTL, shared by every dashboard client of this worker
+dashboard_stats_cache = TTLCache(
+    maxsize=4,
+    ttl=float(os.getenv("DASHBOARD_STATS_CACHE_TTL", "5"))
+)
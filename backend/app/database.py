@@ -1,25 +1,161 @@
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# schema as created by create_all before migrations existed
+BASELINE_REVISION = "0001"
+
+# Pool sizing; apply to both engines (the async engine serves API traffic)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _pool_options(url: str, use_async: bool = False) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # in-memory SQLite uses a single shared connection, not a sized pool
+        return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if use_async and parsed.get_backend_name() == "sqlite":
+        # aiosqlite defaults to NullPool; pool file databases like the others
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+def async_database_url(url: str) -> str:
+    """
+    Swap the sync driver in DATABASE_URL for its asyncio counterpart.
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername == driver:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    **_pool_options(DATABASE_URL)
+)
+
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    **_pool_options(DATABASE_URL, use_async=True)
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+
+class PoolMonitor:
+    """
+    Tracks connection-pool utilization and how long callers wait to check
+    out a connection, so pool_size / max_overflow can be sized from data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = async_engine.sync_engine.pool
+        stats = {"pool": pool.status()}
+        for name in ("size", "checkedout", "overflow", "checkedin"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW
+        if "checkedout" in stats and capacity:
+            stats["utilization"] = round(stats["checkedout"] / capacity, 3)
+        with self._lock:
+            stats.update(
+                checkouts=self.checkouts,
+                avg_checkout_wait_ms=round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                max_checkout_wait_ms=round(self.max_wait * 1000, 3),
+                checkout_timeouts=self.timeouts,
+            )
+        return stats
+
+
+pool_monitor = PoolMonitor()
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        # check out eagerly so the wait for a pooled connection is measured
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeoutError:
+            pool_monitor.record_timeout()
+            raise
+        pool_monitor.record_wait(time.perf_counter() - start)
+        yield db
+
+
+def upgrade_database(revision: str = "head"):
+    """
+    Apply Alembic migrations. Databases created by create_all before
+    migrations existed have no alembic_version table; they are stamped at
+    the baseline first (later migrations skip objects that already exist).
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    tables = inspect(engine).get_table_names()
+    if "alembic_version" not in tables and "users" in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
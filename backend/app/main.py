@@ -3,13 +3,29 @@ from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 
-from app.database import engine
-from app import models
-from app.routers import auth, appointments, patients, prescriptions, billing, queue, ai_assistant
+from app.database import engine, async_engine, pool_monitor, upgrade_database
+from app.services.search_service import patient_search
+from app.services.ai_service import ai_service
+from app.services.job_queue import job_queue
+from app.services.document_batch import document_batch
+from app.services.broadcast_service import queue_broadcaster
+from app.profiling import SQL_PROFILING, SQLProfilingMiddleware, instrument_engine, profile_report
+from app.routers import auth, appointments, patients, prescriptions, billing, queue, ai_assistant, dashboard, documents
 
 load_dotenv()
 
-models.Base.metadata.create_all(bind=engine)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+
+def prepare_database():
+    """
+    Apply pending migrations (turn DB_AUTO_MIGRATE off to run `alembic
+    upgrade head` as a deploy step instead), then build what lives outside
+    the migrations: the patient search index.
+    """
+    if DB_AUTO_MIGRATE:
+        upgrade_database()
+    patient_search.ensure_index(engine)
 
 app = FastAPI(
     title="AI-Powered Clinic Management API",
@@ -27,8 +43,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-SQL-Profile", "X-Batch-Id", "X-Batch-Total"],
 )
 
+if SQL_PROFILING:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    app.add_middleware(SQLProfilingMiddleware)
+
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(appointments.router, prefix="/api/appointments", tags=["Appointments"])
 app.include_router(patients.router, prefix="/api/patients", tags=["Patients"])
@@ -36,6 +58,44 @@ app.include_router(prescriptions.router, prefix="/api/prescriptions", tags=["Pre
 app.include_router(billing.router, prefix="/api/billing", tags=["Billing"])
 app.include_router(queue.router, prefix="/api/queue", tags=["Queue"])
 app.include_router(ai_assistant.router, prefix="/api/ai", tags=["AI Assistant"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(documents.router, prefix="/api/documents", tags=["Documents"])
+
+@app.on_event("startup")
+def migrate_database():
+    prepare_database()
+
+@app.on_event("startup")
+def restore_queue_state():
+    queue.restore_waiting_queue()
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("startup")
+async def start_queue_broadcaster():
+    await queue_broadcaster.start()
+
+@app.on_event("shutdown")
+async def stop_queue_broadcaster():
+    await queue_broadcaster.stop()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    await async_engine.dispose()
+
+@app.on_event("shutdown")
+async def close_ai_client():
+    await ai_service.aclose()
+
+@app.on_event("shutdown")
+def stop_document_pool():
+    document_batch.shutdown()
 
 @app.get("/")
 async def root():
@@ -44,3 +104,16 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    return pool_monitor.snapshot()
+
+if SQL_PROFILING:
+    @app.get("/debug/sql-profile")
+    async def sql_profile_report():
+        return profile_report.summary()
+
+    @app.delete("/debug/sql-profile", status_code=204)
+    async def reset_sql_profile_report():
+        profile_report.clear()
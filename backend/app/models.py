@@ -6,7 +6,9 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Float,
-    JSON
+    JSON,
+    Date,
+    Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -24,10 +26,27 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     role = Column(String, default="doctor")
     hashed_password = Column(String, nullable=False)
+    # bumped on password / role changes; tokens carrying an older "ver" are rejected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+# =========================
+# REVOKED TOKENS
+# (logged-out token ids, until the token would have expired anyway)
+# =========================
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_email_expires", "email", "expires_at"),
+    )
+
+    jti = Column(String, primary_key=True)
+    email = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
 # =========================
 # PATIENTS
 # =========================
@@ -45,19 +64,28 @@ class Patient(Base):
     prescriptions = relationship(
         "Prescription",
         back_populates="patient",
-        cascade="all, delete"
+        cascade="all, delete",
+        order_by="desc(Prescription.created_at)"
     )
 
     appointments = relationship(
         "Appointment",
         back_populates="patient",
-        cascade="all, delete"
+        cascade="all, delete",
+        order_by="desc(Appointment.appointment_time)"
     )
 
     bills = relationship(
         "Bill",
         back_populates="patient",
-        cascade="all, delete"
+        cascade="all, delete",
+        order_by="desc(Bill.created_at)"
+    )
+
+    ai_notes = relationship(
+        "AINote",
+        cascade="all, delete",
+        order_by="desc(AINote.created_at)"
     )
 
 
@@ -69,11 +97,23 @@ class Appointment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    doctor_id = Column(Integer, ForeignKey("users.id"))
     appointment_time = Column(DateTime, nullable=False)
+    duration_minutes = Column(Integer, nullable=False, default=15)
+    end_time = Column(DateTime)   # appointment_time + duration, kept for overlap queries
     status = Column(String, default="scheduled")
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # keyset pages order by (appointment_time, id); the trailing id lets the
+    # index serve that ORDER BY after any equality filter
+    __table_args__ = (
+        Index("ix_appointments_doctor_time", "doctor_id", "appointment_time", "id"),
+        Index("ix_appointments_patient_time", "patient_id", "appointment_time", "id"),
+        Index("ix_appointments_status_time", "status", "appointment_time", "id"),
+        Index("ix_appointments_time", "appointment_time", "id"),
+    )
+
     patient = relationship("Patient", back_populates="appointments")
     queue_token = relationship("QueueToken", back_populates="appointment", uselist=False)
 
@@ -91,10 +131,36 @@ class Prescription(Base):
     notes = Column(Text)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_prescriptions_patient_created", "patient_id", "created_at"),
+        Index("ix_prescriptions_created", "created_at", "id"),
+    )
 
     patient = relationship("Patient", back_populates="prescriptions")
 
 
+# =========================
+# PRESCRIBED MEDICINES
+# (one row per medicine of a prescription, maintained on save / delete)
+# =========================
+class PrescriptionMedicine(Base):
+    __tablename__ = "prescription_medicines"
+    __table_args__ = (
+        Index("ix_prescription_medicines_name_date", "name_key", "prescribed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    prescription_id = Column(Integer, ForeignKey("prescriptions.id", ondelete="CASCADE"), nullable=False, index=True)
+    patient_id = Column(Integer, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    name_key = Column(String, nullable=False)   # lower-cased, whitespace-collapsed name
+    dosage = Column(String)
+    duration = Column(String)
+    prescribed_at = Column(DateTime)            # prescriptions.created_at
+
+
 # =========================
 # BILLING
 # =========================
@@ -107,10 +173,47 @@ class Bill(Base):
     status = Column(String, default="unpaid")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_billing_patient_created", "patient_id", "created_at"),
+        Index("ix_billing_status_created", "status", "created_at", "id"),
+        Index("ix_billing_created", "created_at", "id"),
+    )
 
     patient = relationship("Patient", back_populates="bills")
 
 
+# =========================
+# BILLING ROLLUPS
+# (maintained by create_bill / delete_bill in the same transaction)
+# =========================
+class BillingDailyRollup(Base):
+    __tablename__ = "billing_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True)
+    bill_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+
+
+class BillingPatientRollup(Base):
+    __tablename__ = "billing_patient_rollups"
+
+    patient_id = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    bill_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+
+
+class BillingStatusTotal(Base):
+    __tablename__ = "billing_status_totals"
+
+    status = Column(String, primary_key=True)
+    bill_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+
+
 # =========================
 # QUEUE MANAGEMENT
 # =========================
@@ -123,6 +226,16 @@ class QueueToken(Base):
     status = Column(String, default="waiting")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    called_at = Column(DateTime)      # status -> serving
+    completed_at = Column(DateTime)   # status -> done
+
+    __table_args__ = (
+        Index("ix_queue_tokens_appointment", "appointment_id"),
+        Index("ix_queue_tokens_token_number", "token_number"),
+        Index("ix_queue_tokens_created", "created_at"),
+        Index("ix_queue_tokens_status_created", "status", "created_at"),
+        Index("ix_queue_tokens_completed", "completed_at"),
+    )
 
     appointment = relationship("Appointment", back_populates="queue_token")
 
@@ -137,8 +250,37 @@ class AINote(Base):
     patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
     transcript = Column(Text, nullable=False)
     structured_summary = Column(JSON)  # SOAP / EMR structured output
+    job_id = Column(Integer, ForeignKey("background_jobs.id"))  # the job that generated it; one note per job
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ai_notes_patient_created", "patient_id", "created_at"),
+        Index("ix_ai_notes_job", "job_id", unique=True),
+    )
+
+
+# =========================
+# BACKGROUND JOBS
+# (SQL-backed queue worked by app.services.job_queue)
+# =========================
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)                        # e.g. "soap"
+    status = Column(String, nullable=False, default="queued")    # queued | running | done | failed
+    payload = Column(JSON, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
 
 
 
@@ -0,0 +1,61 @@
+# Keyset pagination and NDJSON streaming helpers for list endpoints
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.database import AsyncSessionLocal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """
+    Pack the sort key of the last row into an opaque, URL-safe cursor.
+    """
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    Unpack a cursor produced by encode_cursor, converting each value to
+    the matching type (datetime values are parsed from ISO format).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise ValueError("cursor arity mismatch")
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def stream_ndjson(stmt, schema, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """
+    Stream the rows of a select() as newline-delimited JSON.
+
+    Rows are fetched in batches of batch_size via yield_per (a server-side
+    cursor on Postgres) so memory stays flat regardless of table size. The
+    session is owned by the generator because the response outlives the
+    request's get_async_db dependency.
+    """
+    async def generate():
+        async with AsyncSessionLocal() as db:
+            result = await db.stream_scalars(stmt.execution_options(yield_per=batch_size))
+            async for row in result:
+                yield schema.model_validate(row).model_dump_json() + "\n"
+                # drop the row from the identity map so it can be collected
+                db.expunge(row)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
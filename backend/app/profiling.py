@@ -0,0 +1,183 @@
+# Opt-in per-request SQL profiling with N+1 detection (SQL_PROFILING=1)
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+SQL_PROFILING = os.getenv("SQL_PROFILING", "false").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_PROFILING_N_PLUS_ONE", "5"))
+SLOW_QUERY_COUNT = 5
+PROFILE_HEADER = "X-SQL-Profile"
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+))*\s*\)")
+_current = ContextVar("sql_profile", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement so repeats of the same query compare equal:
+    collapse whitespace and expanded IN (...) parameter lists.
+    """
+    return _IN_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+class RequestProfile:
+    """
+    SQL statements executed while handling one request.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.count = 0
+        self.total = 0.0
+        self.shapes = Counter()
+        self.slowest = []   # (seconds, shape), at most SLOW_QUERY_COUNT
+
+    def record(self, statement: str, seconds: float):
+        shape = statement_shape(statement)
+        self.count += 1
+        self.total += seconds
+        self.shapes[shape] += 1
+        self.slowest.append((seconds, shape))
+        if len(self.slowest) > SLOW_QUERY_COUNT:
+            self.slowest.sort(reverse=True)
+            self.slowest.pop()
+
+    def repeated(self) -> dict:
+        """
+        Statement shapes run at least N_PLUS_ONE_THRESHOLD times (likely N+1).
+        """
+        return {s: n for s, n in self.shapes.items() if n >= N_PLUS_ONE_THRESHOLD}
+
+    def header(self) -> str:
+        return f"queries={self.count}; sql_ms={self.total * 1000:.2f}; n_plus_one={len(self.repeated())}"
+
+
+class ProfileReport:
+    """
+    Rolling, in-memory aggregate of recent request profiles, per route.
+    """
+
+    def __init__(self, history: int = 500):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._recent.append(profile)
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+        routes = defaultdict(lambda: {"requests": 0, "queries": 0, "max_queries": 0, "sql_ms": 0.0})
+        slowest, suspects = [], {}
+        for p in recent:
+            r = routes[p.route]
+            r["requests"] += 1
+            r["queries"] += p.count
+            r["max_queries"] = max(r["max_queries"], p.count)
+            r["sql_ms"] += p.total * 1000
+            slowest.extend((s, shape, p.route) for s, shape in p.slowest)
+            for shape, n in p.repeated().items():
+                key = (p.route, shape)
+                suspects[key] = max(suspects.get(key, 0), n)
+        slowest.sort(reverse=True)
+        return {
+            "requests": len(recent),
+            "routes": {
+                route: {
+                    "requests": r["requests"],
+                    "avg_queries": round(r["queries"] / r["requests"], 2),
+                    "max_queries": r["max_queries"],
+                    "avg_sql_ms": round(r["sql_ms"] / r["requests"], 3),
+                }
+                for route, r in sorted(routes.items())
+            },
+            "slowest": [
+                {"route": route, "ms": round(s * 1000, 3), "statement": shape}
+                for s, shape, route in slowest[:20]
+            ],
+            "n_plus_one": [
+                {"route": route, "repeats": n, "statement": shape}
+                for (route, shape), n in sorted(suspects.items(), key=lambda kv: -kv[1])
+            ],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+
+profile_report = ProfileReport()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profile_start")
+    if profile is not None and starts:
+        profile.record(statement, time.perf_counter() - starts.pop())
+
+
+def instrument_engine(engine):
+    """
+    Attach timing hooks to a sync Engine (use async_engine.sync_engine for async).
+    """
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return f"{scope['method']} {route.path}"
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        return f"{scope['method']} {endpoint.__name__}"
+    return f"{scope['method']} {scope['path']}"
+
+
+class SQLProfilingMiddleware:
+    """
+    ASGI middleware that collects a RequestProfile per HTTP request, adds
+    it as an X-SQL-Profile / Server-Timing header and feeds profile_report.
+    Statements run after the response starts (streamed bodies) are counted
+    in the report but not in the header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(scope["path"])
+        token = _current.set(profile)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_HEADER.lower().encode(), profile.header().encode()))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={profile.total * 1000:.2f};desc="{profile.count} queries"'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current.reset(token)
+            profile.route = _route_name(scope)
+            profile_report.add(profile)
@@ -54,14 +54,33 @@
 
 
 
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import json
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.schemas import (
     DiagnosisRequest,
     PrescriptionSuggestionResponse,
     AIPrescriptionRequest,
     AIPrescriptionResponse,
-    TranscriptionResponse
+    TranscriptionResponse,
+    SOAPJobCreate,
+    SOAPJobOut,
+    AINoteOut
+)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import AINote, BackgroundJob, Patient
+from app.services.ai_cache import prescription_ai_cache, prescription_cache_key
+from app.services.ai_service import ai_service, AIServiceError
+from app.services.job_queue import job_queue
+from app.services.rule_engine import prescription_rules
+from app.services.soap_notes import SOAP_JOB
+from app.services.transcription import (
+    new_workdir,
+    spool_upload,
+    UploadTooLarge,
+    TranscriptionUnavailable
 )
 
 router = APIRouter()
@@ -69,29 +88,18 @@ router = APIRouter()
 
 def fallback_prescription(diagnosis: str, symptoms: str | None = None):
     """
-    Very small rule-based fallback if no AI key is present.
+    Rule-based fallback if no AI key is present: protocol rules from
+    app/data/prescription_rules.json (hot-reloaded), matched in one pass.
     """
-    text = f"{diagnosis} {symptoms or ''}".lower()
-
-    if "fever" in text:
-        return [
-            {"name": "Paracetamol", "dosage": "650 mg", "duration": "3 days"},
-            {"name": "ORS", "dosage": "After meals", "duration": "3 days"}
-        ]
-
-    if "back pain" in text:
-        return [
-            {"name": "Ibuprofen", "dosage": "400 mg", "duration": "5 days"}
-        ]
+    return prescription_rules.medicines(f"{diagnosis} {symptoms or ''}")
 
-    if "diabetes" in text or "sugar" in text:
-        return [
-            {"name": "Metformin", "dosage": "500 mg", "duration": "30 days"}
-        ]
 
-    return [
-        {"name": "Multivitamin", "dosage": "Once daily", "duration": "7 days"}
-    ]
+def _fallback_response(data: AIPrescriptionRequest) -> dict:
+    return {
+        "diagnosis": data.diagnosis,
+        "medicines": fallback_prescription(data.diagnosis, data.symptoms),
+        "notes": "AI-generated (fallback). Please review."
+    }
 
 
 @router.post("/prescription", response_model=AIPrescriptionResponse)
@@ -99,75 +107,151 @@ async def generate_prescription_ai(data: AIPrescriptionRequest):
     """
     Generate a prescription from diagnosis/symptoms.
     If OPENAI_API_KEY is set, attempts LLM; otherwise uses rule-based fallback.
+    LLM answers are cached per normalized diagnosis/symptoms, and identical
+    requests in flight share one upstream call.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-
-    if not api_key:
-        meds = fallback_prescription(data.diagnosis, data.symptoms)
+    if not ai_service.enabled:
+        return _fallback_response(data)
+
+    async def compute():
+        try:
+            content = await ai_service.suggest_prescription(data.diagnosis, data.symptoms)
+        except AIServiceError:
+            return _fallback_response(data), False
+        # Very light parsing: expect the model to return text; fallback if empty
+        if not content:
+            return _fallback_response(data), False
         return {
             "diagnosis": data.diagnosis,
-            "medicines": meds,
-            "notes": "AI-generated (fallback). Please review."
-        }
+            "medicines": fallback_prescription(data.diagnosis, data.symptoms),
+            "notes": content[:200]
+        }, True
 
-    try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        prompt = (
-            "You are a medical assistant. Given a diagnosis and optional symptoms, "
-            "return a JSON with medicines (list of {name,dosage,duration}) and a short note. "
-            f"Diagnosis: {data.diagnosis}. Symptoms: {data.symptoms or 'None'}."
-        )
-        completion = client.responses.create(
-            model="gpt-4o-mini",
-            input=prompt,
-            max_output_tokens=300
-        )
-        content = completion.output_text or ""
-    except Exception:
-        meds = fallback_prescription(data.diagnosis, data.symptoms)
-        return {
-            "diagnosis": data.diagnosis,
-            "medicines": meds,
-            "notes": "AI-generated (fallback). Please review."
-        }
+    key = prescription_cache_key(data.diagnosis, data.symptoms, ai_service.chat_model)
+    response = await prescription_ai_cache.get_or_compute(key, compute)
+    # echo the caller's own wording; the cached answer may come from an equivalent request
+    return {**response, "diagnosis": data.diagnosis}
 
-    # Very light parsing: expect the model to return text; fallback if empty
-    if not content:
-        meds = fallback_prescription(data.diagnosis, data.symptoms)
-        return {
-            "diagnosis": data.diagnosis,
-            "medicines": meds,
-            "notes": "AI-generated (fallback). Please review."
-        }
 
-    meds = fallback_prescription(data.diagnosis, data.symptoms)
-    return {
-        "diagnosis": data.diagnosis,
-        "medicines": meds,
-        "notes": content[:200]
-    }
+@router.get("/prescription/cache")
+def prescription_cache_stats():
+    return prescription_ai_cache.stats()
+
+
+@router.delete("/prescription/cache", status_code=204)
+def clear_prescription_cache():
+    prescription_ai_cache.clear()
+    return
+
+
+@router.get("/prescription/rules")
+def prescription_rules_status():
+    return prescription_rules.stats()
+
+
+@router.post("/prescription/rules/reload")
+def reload_prescription_rules():
+    prescription_rules.reload(force=True)
+    return prescription_rules.stats()
 
 
 @router.post("/transcribe", response_model=TranscriptionResponse)
 async def transcribe_audio(file: UploadFile = File(...)):
     """
-    Transcribe audio via OpenAI Whisper if key is set; otherwise raise 400.
+    Transcribe a recording on the configured backend (AI_TRANSCRIBE_BACKEND).
+    The upload is spooled to disk in chunks, split into segments and the
+    segments transcribed in parallel.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=400, detail="Whisper unavailable: set OPENAI_API_KEY.")
+    with new_workdir() as workdir:
+        try:
+            ai_service.transcription_backend.check()
+            path = await spool_upload(file, workdir)
+            text = await ai_service.transcribe_audio(path, workdir, file.content_type or "audio/wav")
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except TranscriptionUnavailable as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
+
+    return {"text": text}
+
 
+@router.post("/transcribe/stream")
+async def transcribe_audio_stream(file: UploadFile = File(...)):
+    """
+    Like /transcribe, but streams NDJSON: one {index, start, end, text} line
+    per segment as soon as it is ready (in order), then {"done": true, "text"}.
+    A failure mid-stream is reported as an {"error"} line.
+    """
+    workdir = new_workdir()
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        audio_bytes = await file.read()
-        completion = client.audio.transcriptions.create(
-            model="gpt-4o-mini-tts",
-            file=("audio.wav", audio_bytes, file.content_type or "audio/wav")
-        )
-        text = getattr(completion, "text", None) or ""
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {e}")
+        ai_service.transcription_backend.check()
+        path = await spool_upload(file, workdir.name)
+    except (UploadTooLarge, TranscriptionUnavailable) as e:
+        workdir.cleanup()
+        raise HTTPException(status_code=413 if isinstance(e, UploadTooLarge) else 400, detail=str(e))
+    content_type = file.content_type or "audio/wav"
+
+    async def body():
+        texts = []
+        try:
+            async for segment in ai_service.transcribe_segments(path, workdir.name, content_type):
+                texts.append(segment["text"])
+                yield json.dumps(segment) + "\n"
+            yield json.dumps({"done": True, "text": " ".join(t for t in texts if t)}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Transcription failed: {e}"}) + "\n"
+        finally:
+            workdir.cleanup()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _job_out(job: BackgroundJob) -> dict:
+    result = job.result or {}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "note_id": result.get("note_id"),
+        "summary": result.get("summary"),
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
 
-    return {"text": text}
+
+@router.post("/soap", response_model=SOAPJobOut, status_code=202)
+async def submit_soap_notes(data: SOAPJobCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Queue SOAP note generation for a consultation transcript. The AINote is
+    written by a background worker; poll GET /soap/jobs/{job_id}
+    (with ?wait=N to block until it finishes, up to N seconds).
+    """
+    if await db.get(Patient, data.patient_id) is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    job = await job_queue.submit(SOAP_JOB, {"patient_id": data.patient_id, "transcript": data.transcript})
+    return _job_out(job)
+
+
+@router.get("/soap/jobs/{job_id}", response_model=SOAPJobOut)
+async def soap_job_status(job_id: int, wait: float = Query(0, ge=0, le=60)):
+    job = await (job_queue.wait(job_id, wait) if wait else job_queue.get(job_id))
+    if job is None or job.kind != SOAP_JOB:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_out(job)
+
+
+@router.get("/notes/patient/{patient_id}", response_model=list[AINoteOut])
+async def notes_by_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(
+        select(AINote).where(AINote.patient_id == patient_id).order_by(AINote.created_at.desc())
+    )).all()
+
+
+@router.get("/notes/{note_id}", response_model=AINoteOut)
+async def get_note(note_id: int, db: AsyncSession = Depends(get_async_db)):
+    note = await db.get(AINote, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return note
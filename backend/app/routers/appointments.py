@@ -1,43 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Appointment
-from app.schemas import AppointmentCreate, AppointmentResponse
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import patient_summary_cache
+from app.database import get_async_db
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, stream_ndjson
+from app.models import Appointment, User
+from app.schemas import AppointmentCreate, AppointmentResponse, AvailabilityResponse
+from app.services.availability import (
+    APPOINTMENT_DEFAULT_MINUTES, AVAILABILITY_MAX_DAYS, availability_index, find_conflict, lock_calendar, to_utc_naive
+)
 
 
 router = APIRouter()
 
+# check-then-insert per doctor is serialized in this process (doctors share a
+# fixed set of striped locks), so only one waiter per calendar holds a
+# connection; across processes lock_calendar serializes them in the database
+BOOKING_LOCK_STRIPES = 64
+_booking_locks = [asyncio.Lock() for _ in range(BOOKING_LOCK_STRIPES)]
+
+
+def _booking_lock(doctor_id: Optional[int]) -> asyncio.Lock:
+    return _booking_locks[hash(doctor_id) % BOOKING_LOCK_STRIPES]
+
+
 @router.post("/", response_model=AppointmentResponse)
-def create_appointment(data: AppointmentCreate, db: Session = Depends(get_db)):
-    appointment = Appointment(
-        patient_id=data.patient_id,
-        appointment_time=data.appointment_time,
-        status="scheduled"
-    )
-    db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
+async def create_appointment(data: AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
+    start = to_utc_naive(data.appointment_time)
+    duration = data.duration_minutes or APPOINTMENT_DEFAULT_MINUTES
+    end = start + timedelta(minutes=duration)
+    async with _booking_lock(data.doctor_id):
+        await lock_calendar(db, data.doctor_id)
+        if data.doctor_id is not None:
+            doctor = await db.scalar(select(User.id).where(User.id == data.doctor_id))
+            if doctor is None:
+                raise HTTPException(status_code=400, detail="Unknown doctor")
+        conflict = await find_conflict(db, data.doctor_id, start, end)
+        if conflict is not None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Overlaps appointment {conflict.id} at {conflict.appointment_time.isoformat()}"
+            )
+        appointment = Appointment(
+            patient_id=data.patient_id,
+            doctor_id=data.doctor_id,
+            appointment_time=start,
+            duration_minutes=duration,
+            end_time=end,
+            status="scheduled"
+        )
+        db.add(appointment)
+        await db.commit()
+    await db.refresh(appointment)
+    availability_index.invalidate(appointment.doctor_id, start, end)
+    patient_summary_cache.invalidate(appointment.patient_id)
     return appointment
 
 
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+    doctor_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    duration: int = Query(APPOINTMENT_DEFAULT_MINUTES, ge=5, le=240),
+    step: Optional[int] = Query(None, ge=5, le=240),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Free slots of `duration` minutes for a doctor (unassigned calendar when
+    omitted) between `start` and `end` inclusive (default: the next 7 days),
+    within clinic hours, on a grid of `step` minutes (default: duration).
+    """
+    start = start or datetime.utcnow().date()
+    end = end or start + timedelta(days=6)
+    if end < start or (end - start).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1 to {AVAILABILITY_MAX_DAYS} days")
+    slots = await availability_index.free_slots(db, doctor_id, start, end, duration, step or duration)
+    return {
+        "doctor_id": doctor_id,
+        "start": start,
+        "end": end,
+        "duration_minutes": duration,
+        "slots": [{"start": s, "end": e} for s, e in slots],
+    }
+
+
+def _filtered_appointments(
+    patient_id: Optional[int],
+    status: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    doctor_id: Optional[int] = None
+):
+    stmt = select(Appointment)
+    if patient_id is not None:
+        stmt = stmt.where(Appointment.patient_id == patient_id)
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.doctor_id == doctor_id)
+    if status:
+        stmt = stmt.where(Appointment.status == status)
+    if start:
+        stmt = stmt.where(Appointment.appointment_time >= to_utc_naive(start))
+    if end:
+        stmt = stmt.where(Appointment.appointment_time < to_utc_naive(end))
+    return stmt
+
+
 @router.get("/", response_model=list[AppointmentResponse])
-def get_all_appointments(db: Session = Depends(get_db)):
-    return db.query(Appointment).order_by(Appointment.appointment_time.desc()).all()
+async def get_all_appointments(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    patient_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    doctor_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Keyset-paginated appointments, newest first, ordered by (appointment_time, id).
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    stmt = _filtered_appointments(patient_id, status, start, end, doctor_id)
+    if cursor:
+        last_time, last_id = decode_cursor(cursor, datetime, int)
+        stmt = stmt.where(or_(
+            Appointment.appointment_time < last_time,
+            and_(Appointment.appointment_time == last_time, Appointment.id < last_id)
+        ))
+    appointments = (await db.scalars(
+        stmt.order_by(Appointment.appointment_time.desc(), Appointment.id.desc())
+        .limit(limit + 1)
+    )).all()
+    if len(appointments) > limit:
+        appointments = appointments[:limit]
+        last = appointments[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.appointment_time, last.id)
+    return appointments
+
+
+@router.get("/stream")
+async def stream_appointments(
+    patient_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    doctor_id: Optional[int] = None
+):
+    """
+    Stream every matching appointment as NDJSON, newest first.
+    """
+    return stream_ndjson(
+        _filtered_appointments(patient_id, status, start, end, doctor_id)
+        .order_by(Appointment.appointment_time.desc(), Appointment.id.desc()),
+        AppointmentResponse
+    )
 
 
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
-def get_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+async def get_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return appointment
 
 
 @router.delete("/{appointment_id}", status_code=204)
-def delete_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    appointment = await db.get(Appointment, appointment_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    db.delete(appointment)
-    db.commit()
+    await db.delete(appointment)
+    await db.commit()
+    availability_index.invalidate(appointment.doctor_id, appointment.appointment_time, appointment.end_time or appointment.appointment_time)
+    patient_summary_cache.invalidate(appointment.patient_id)
     return
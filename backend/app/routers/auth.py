@@ -1,5 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from sqlalchemy import select, update
+from app.auth_utils import (
+    oauth2_scheme,
+    revoke_token,
+    create_access_token,
+    password_hash_pool,
+    HashPoolBusy
+)
+from app.database import AsyncSessionLocal
+from app.models import User
 
 router = APIRouter()
 
@@ -7,11 +17,51 @@ class LoginRequest(BaseModel):
     email: str
     password: str
 
+
+async def _load_credentials(email: str):
+    """
+    (hashed password, token version), or (None, 0) for an unknown email.
+    """
+    # short-lived session so no connection is held while bcrypt runs
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(User.hashed_password, User.token_version).where(User.email == email)
+        )).first()
+        return (row.hashed_password, row.token_version) if row else (None, 0)
+
+
+async def _store_hash(email: str, hashed_password: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.email == email).values(hashed_password=hashed_password))
+        await db.commit()
+
+
 @router.post("/login")
-def login(data: LoginRequest):
-    if data.email == "doctor@clinic.com" and data.password == "admin":
-        return {
-            "access_token": "fake-jwt-token",
-            "token_type": "bearer"
-        }
-    raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login(data: LoginRequest):
+    """
+    Verify credentials against the users table and issue a JWT.
+    bcrypt runs on the bounded hashing pool; a full pool answers 503.
+    """
+    hashed_password, token_version = await _load_credentials(data.email)
+    try:
+        verified, new_hash = await password_hash_pool.verify_and_update(data.password, hashed_password)
+    except HashPoolBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent logins, please retry",
+            headers={"Retry-After": "1"}
+        )
+    if not verified:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await _store_hash(data.email, new_hash)
+    return {
+        "access_token": create_access_token({"sub": data.email, "ver": token_version}),
+        "token_type": "bearer"
+    }
+
+
+@router.post("/logout", status_code=204)
+def logout(token: str = Depends(oauth2_scheme)):
+    revoke_token(token)
+    return
@@ -1,30 +1,160 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Bill
-from app.schemas import BillCreate, BillResponse
+from datetime import datetime, date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import patient_summary_cache
+from app.database import get_async_db
+from app.models import Bill, Patient, BillingDailyRollup, BillingPatientRollup, BillingStatusTotal
+from app.services.availability import to_utc_naive
+from app.services.export_service import export_service
+from app.services.pdf_service import pdf_service
+from app.schemas import BillCreate, BillResponse, RevenueRow, OutstandingResponse
 
 router = APIRouter()
 
 @router.post("/", response_model=BillResponse)
-def create_bill(data: BillCreate, db: Session = Depends(get_db)):
+async def create_bill(data: BillCreate, db: AsyncSession = Depends(get_async_db)):
     bill = Bill(**data.dict())
     db.add(bill)
-    db.commit()
-    db.refresh(bill)
+    await db.commit()
+    await db.refresh(bill)
+    patient_summary_cache.invalidate(bill.patient_id)
     return bill
 
 
 @router.get("/patient/{patient_id}", response_model=list[BillResponse])
-def bills_by_patient(patient_id: int, db: Session = Depends(get_db)):
-    return db.query(Bill).filter(Bill.patient_id == patient_id).order_by(Bill.created_at.desc()).all()
+async def bills_by_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(
+        select(Bill).where(Bill.patient_id == patient_id).order_by(Bill.created_at.desc())
+    )).all()
+
+
+BILL_EXPORT_COLUMNS = ["bill_id", "patient_id", "created_at", "amount", "status"]
+
+
+def _export_statement(start: Optional[datetime], end: Optional[datetime], status: Optional[str]):
+    stmt = select(Bill.id.label("bill_id"), Bill.patient_id, Bill.created_at, Bill.amount, Bill.status)
+    if start:
+        stmt = stmt.where(Bill.created_at >= to_utc_naive(start))
+    if end:
+        stmt = stmt.where(Bill.created_at < to_utc_naive(end))
+    if status:
+        stmt = stmt.where(Bill.status == status)
+    return stmt.order_by(Bill.created_at, Bill.id)
+
+
+@router.get("/export")
+async def export_bills(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False
+):
+    """
+    Stream every bill created in [start, end), ordered by creation time.
+    """
+    stmt = _export_statement(start, end, status)
+    return export_service.response(stmt, BILL_EXPORT_COLUMNS, "bills", format, gzip)
+
+
+@router.get("/reports/daily", response_model=list[RevenueRow])
+async def daily_revenue(
+    start: date,
+    end: date,
+    status: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bill count and amount per day and status for days in [start, end],
+    read from the daily rollup (one row per day and status).
+    """
+    stmt = select(BillingDailyRollup).where(BillingDailyRollup.day >= start, BillingDailyRollup.day <= end)
+    if status:
+        stmt = stmt.where(BillingDailyRollup.status == status)
+    rows = (await db.scalars(stmt.order_by(BillingDailyRollup.day, BillingDailyRollup.status))).all()
+    return [
+        {"period": r.day.isoformat(), "status": r.status, "bill_count": r.bill_count, "total_amount": r.total_amount}
+        for r in rows
+    ]
+
+
+@router.get("/reports/monthly", response_model=list[RevenueRow])
+async def monthly_revenue(year: int, status: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    Bill count and amount per month and status for one year, summed from
+    at most 366 daily rollup rows per status.
+    """
+    stmt = select(BillingDailyRollup).where(
+        BillingDailyRollup.day >= date(year, 1, 1),
+        BillingDailyRollup.day < date(year + 1, 1, 1)
+    )
+    if status:
+        stmt = stmt.where(BillingDailyRollup.status == status)
+    months = {}
+    for r in (await db.scalars(stmt)).all():
+        key = (f"{r.day.year:04d}-{r.day.month:02d}", r.status)
+        count, total = months.get(key, (0, 0.0))
+        months[key] = (count + r.bill_count, total + r.total_amount)
+    return [
+        {"period": period, "status": s, "bill_count": count, "total_amount": total}
+        for (period, s), (count, total) in sorted(months.items())
+    ]
+
+
+@router.get("/reports/outstanding", response_model=OutstandingResponse)
+async def outstanding_total(
+    patient_id: Optional[int] = None,
+    status: str = "unpaid",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Total of bills in `status` (default unpaid), clinic-wide or for one patient.
+    A single primary-key lookup in the status or patient rollup.
+    """
+    if patient_id is None:
+        row = await db.get(BillingStatusTotal, status)
+    else:
+        row = await db.get(BillingPatientRollup, (patient_id, status))
+    return {
+        "status": status,
+        "patient_id": patient_id,
+        "bill_count": row.bill_count if row else 0,
+        "total_amount": row.total_amount if row else 0.0
+    }
+
+
+@router.get("/{bill_id}/pdf")
+async def bill_pdf(bill_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Printable invoice, ETag-cached on bill id and last update.
+    """
+    row = (await db.execute(
+        select(Bill, Patient).join(Patient, Patient.id == Bill.patient_id).where(Bill.id == bill_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Bill not found")
+    bill, patient = row
+    data = {
+        "id": bill.id,
+        "amount": bill.amount,
+        "status": bill.status,
+        "created_at": bill.created_at,
+        "patient_name": patient.name,
+        "age": patient.age,
+        "gender": patient.gender
+    }
+    etag = pdf_service.etag("invoice", bill.id, bill.updated_at or bill.created_at)
+    return await pdf_service.response(request, etag, f"invoice-{bill.id}.pdf", pdf_service.generate_invoice_pdf, data)
 
 
 @router.delete("/{bill_id}", status_code=204)
-def delete_bill(bill_id: int, db: Session = Depends(get_db)):
-    bill = db.query(Bill).filter(Bill.id == bill_id).first()
+async def delete_bill(bill_id: int, db: AsyncSession = Depends(get_async_db)):
+    bill = await db.get(Bill, bill_id)
     if not bill:
         raise HTTPException(status_code=404, detail="Bill not found")
-    db.delete(bill)
-    db.commit()
+    await db.delete(bill)
+    await db.commit()
+    patient_summary_cache.invalidate(bill.patient_id)
     return
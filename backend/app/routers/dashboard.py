@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import dashboard_stats_cache
+from app.database import get_async_db
+from app.models import Appointment, Patient, QueueToken, BillingStatusTotal
+from app.schemas import DashboardStats
+
+router = APIRouter()
+
+# one recompute at a time; concurrent misses wait and reuse its result
+_refresh_lock = asyncio.Lock()
+
+
+async def _compute_stats(db: AsyncSession, start_of_day: datetime) -> dict:
+    end_of_day = start_of_day + timedelta(days=1)
+    appointments = dict((await db.execute(
+        select(Appointment.status, func.count(Appointment.id))
+        .where(Appointment.appointment_time >= start_of_day, Appointment.appointment_time < end_of_day)
+        .group_by(Appointment.status)
+    )).all())
+    queue = dict((await db.execute(
+        select(QueueToken.status, func.count(QueueToken.id))
+        .where(QueueToken.created_at >= start_of_day)
+        .group_by(QueueToken.status)
+    )).all())
+    unpaid = await db.get(BillingStatusTotal, "unpaid")
+    return {
+        "day": start_of_day.date(),
+        "appointments_today": sum(appointments.values()),
+        "appointments_by_status": {s or "unknown": n for s, n in appointments.items()},
+        "total_patients": await db.scalar(select(func.count(Patient.id))),
+        "queue_waiting": queue.get("waiting", 0),
+        "queue_serving": queue.get("serving", 0),
+        "queue_served": queue.get("done", 0),
+        "unpaid_bills": unpaid.bill_count if unpaid else 0,
+        "unpaid_amount": unpaid.total_amount if unpaid else 0.0,
+        "generated_at": datetime.utcnow()
+    }
+
+
+@router.get("/stats", response_model=DashboardStats)
+async def dashboard_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    Headline numbers for today (UTC): appointments by status, patient count,
+    queue progress and unpaid bills. Built from COUNT / GROUP BY queries and
+    the billing rollups, and cached for DASHBOARD_STATS_CACHE_TTL seconds.
+    """
+    start_of_day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = dashboard_stats_cache.get(start_of_day)
+    if stats is None:
+        async with _refresh_lock:
+            stats = dashboard_stats_cache.get(start_of_day)
+            if stats is None:
+                stats = await _compute_stats(db, start_of_day)
+                dashboard_stats_cache.set(start_of_day, stats)
+    return stats
@@ -0,0 +1,50 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.services.document_batch import KINDS, document_batch
+
+router = APIRouter()
+
+
+@router.get("/daily-pack")
+async def daily_pack(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    kinds: str = Query("invoice,prescription", description="Comma-separated: invoice, prescription")
+):
+    """
+    ZIP of every invoice and/or prescription PDF created from `start` to
+    `end` (inclusive, default today). Entries are streamed as the render
+    pool finishes them; X-Batch-Id identifies the batch for /progress.
+    """
+    start = start or datetime.utcnow().date()
+    end = end or start
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    selected = [k.strip() for k in kinds.split(",") if k.strip()]
+    if not selected or any(k not in KINDS for k in selected):
+        raise HTTPException(status_code=400, detail=f"kinds must be a subset of {', '.join(KINDS)}")
+
+    window_start = datetime.combine(start, time.min)
+    window_end = datetime.combine(end + timedelta(days=1), time.min)
+    total = await document_batch.count(selected, window_start, window_end)
+    batch_id = document_batch.begin(total, window_start, window_end)
+    filename = f"documents-{start.isoformat()}" + (f"-to-{end.isoformat()}" if end != start else "") + ".zip"
+    return StreamingResponse(
+        document_batch.stream_zip(batch_id, selected, window_start, window_end),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Batch-Id": batch_id,
+            "X-Batch-Total": str(total),
+        }
+    )
+
+
+@router.get("/daily-pack/{batch_id}/progress")
+async def daily_pack_progress(batch_id: str):
+    progress = document_batch.progress.get(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired batch")
+    return progress
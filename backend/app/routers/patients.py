@@ -1,49 +1,183 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.cache import patient_summary_cache
+from app.database import get_async_db, engine
+from app.services.search_service import name_prefix, patient_search
+from app.services.import_service import PatientImportService
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, stream_ndjson
 from app.models import Patient, Appointment, Prescription, Bill
-from app.schemas import PatientCreate, PatientOut, PatientSummary, AppointmentResponse, PrescriptionResponse, BillResponse
+from app.schemas import PatientCreate, PatientOut, PatientSummary, PatientImportReport, AppointmentResponse, PrescriptionResponse, BillResponse
 
 router = APIRouter()
+patient_importer = PatientImportService(engine)
 
 @router.post("/", response_model=PatientOut)
-def create_patient(data: PatientCreate, db: Session = Depends(get_db)):
+async def create_patient(data: PatientCreate, db: AsyncSession = Depends(get_async_db)):
     patient = Patient(**data.dict(exclude_none=True))
     db.add(patient)
-    db.commit()
-    db.refresh(patient)
+    await db.commit()
+    await db.refresh(patient)
     return patient
 
+def _filtered_patients(name: Optional[str], phone: Optional[str], gender: Optional[str], ids: Optional[list[int]] = None):
+    stmt = select(Patient)
+    if ids:
+        stmt = stmt.where(Patient.id.in_(ids))
+    if name:
+        stmt = stmt.where(name_prefix(name))
+    if phone:
+        stmt = stmt.where(Patient.phone == phone)
+    if gender:
+        stmt = stmt.where(Patient.gender == gender)
+    return stmt
+
+
 @router.get("/", response_model=list[PatientOut])
-def get_patients(db: Session = Depends(get_db)):
-    return db.query(Patient).all()
+async def get_patients(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    name: Optional[str] = None,
+    phone: Optional[str] = None,
+    gender: Optional[str] = None,
+    ids: Optional[list[int]] = Query(None, max_length=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Keyset-paginated patient list ordered by id.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page;
+    repeat `ids` to fetch specific patients (e.g. names for a page of appointments).
+    """
+    stmt = _filtered_patients(name, phone, gender, ids)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        stmt = stmt.where(Patient.id > last_id)
+    patients = (await db.scalars(stmt.order_by(Patient.id).limit(limit + 1))).all()
+    if len(patients) > limit:
+        patients = patients[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(patients[-1].id)
+    return patients
+
+
+@router.get("/stream")
+async def stream_patients(name: Optional[str] = None, phone: Optional[str] = None, gender: Optional[str] = None):
+    """
+    Stream every matching patient as NDJSON, ordered by id.
+    """
+    return stream_ndjson(_filtered_patients(name, phone, gender).order_by(Patient.id), PatientOut)
+
+
+@router.post("/import", response_model=PatientImportReport)
+async def import_patients(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension")
+):
+    """
+    Bulk-load patients from a CSV (header row: name,age,gender,phone) or
+    NDJSON upload. Rows failing PatientCreate validation are reported by
+    row number and skipped; valid rows are inserted in large batches.
+    """
+    fmt = format
+    if fmt is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith(".csv") or file.content_type == "text/csv":
+            fmt = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")) or file.content_type == "application/x-ndjson":
+            fmt = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Unknown file type; pass format=csv or format=ndjson")
+    return await run_in_threadpool(patient_importer.import_file, file.file, fmt)
+
+
+@router.get("/search", response_model=list[PatientOut])
+async def search_patients(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ranked type-ahead lookup: name prefix, or phone prefix when q is numeric.
+    """
+    return await patient_search.search(db, q, limit)
+
 
 @router.get("/{patient_id}", response_model=PatientOut)
-def get_patient(patient_id: int, db: Session = Depends(get_db)):
-    return db.query(Patient).filter(Patient.id == patient_id).first()
+async def get_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await db.get(Patient, patient_id)
 
 
 @router.delete("/{patient_id}", status_code=204)
-def delete_patient(patient_id: int, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+async def delete_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    db.delete(patient)
-    db.commit()
+    await db.delete(patient)
+    await db.commit()
+    patient_summary_cache.invalidate(patient_id)
     return
 
 
+def summary_version_statement(patient_id: int):
+    """
+    Row count and highest id of each summary section: changes whenever a
+    row is added or removed, whichever worker wrote it.
+    """
+    columns = []
+    for model in (Appointment, Prescription, Bill):
+        where = model.patient_id == patient_id
+        columns += [
+            select(func.count(model.id)).where(where).scalar_subquery(),
+            select(func.max(model.id)).where(where).scalar_subquery(),
+        ]
+    return select(*columns)
+
+
 @router.get("/{patient_id}/summary", response_model=PatientSummary)
-def patient_summary(patient_id: int, db: Session = Depends(get_db)):
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    appointments = db.query(Appointment).filter(Appointment.patient_id == patient_id).order_by(Appointment.appointment_time.desc()).all()
-    prescriptions = db.query(Prescription).filter(Prescription.patient_id == patient_id).order_by(Prescription.created_at.desc()).all()
-    bills = db.query(Bill).filter(Bill.patient_id == patient_id).order_by(Bill.created_at.desc()).all()
-    return {
-        "patient": patient,
-        "appointments": appointments,
-        "prescriptions": prescriptions,
-        "bills": bills
-    }
+async def patient_summary(
+    patient_id: int,
+    limit: Optional[int] = Query(None, ge=1, description="Max rows per section"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Patient with appointments, prescriptions and bills, newest first.
+    The full summary is cached per patient together with the version it
+    was built from (see summary_version_statement), which is re-read on
+    every request, so a write in another worker is seen at once; local
+    writes also invalidate. `limit` trims each section on the way out.
+    """
+    # read before the sections: a write landing in between leaves this
+    # entry under a version that is already outdated
+    version = tuple((await db.execute(summary_version_statement(patient_id))).one())
+    cached = patient_summary_cache.get(patient_id)
+    summary = cached[1] if cached is not None and cached[0] == version else None
+    if summary is None:
+        patient = await db.scalar(
+            select(Patient)
+            .options(
+                selectinload(Patient.appointments),
+                selectinload(Patient.prescriptions),
+                selectinload(Patient.bills)
+            )
+            .where(Patient.id == patient_id)
+        )
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        summary = PatientSummary(
+            patient=PatientOut.model_validate(patient),
+            appointments=[AppointmentResponse.model_validate(a) for a in patient.appointments],
+            prescriptions=[PrescriptionResponse.model_validate(p) for p in patient.prescriptions],
+            bills=[BillResponse.model_validate(b) for b in patient.bills]
+        )
+        patient_summary_cache.set(patient_id, (version, summary))
+    if limit is None:
+        return summary
+    return PatientSummary(
+        patient=summary.patient,
+        appointments=summary.appointments[:limit],
+        prescriptions=summary.prescriptions[:limit],
+        bills=summary.bills[:limit]
+    )
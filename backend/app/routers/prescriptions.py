@@ -1,29 +1,177 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Prescription
-from app.schemas import PrescriptionCreate, PrescriptionResponse
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import patient_summary_cache
+from app.database import get_async_db
+from app.models import Patient, Prescription, PrescriptionMedicine
+from app.services.availability import to_utc_naive
+from app.services.export_service import export_service, flatten_medicines
+from app.services.medicine_index import medicine_key
+from app.services.pdf_service import pdf_service
+from app.schemas import PrescriptionCreate, PrescriptionResponse, PrescribedMedicineOut, MedicinePatientOut
 
 router = APIRouter()
 
 @router.post("/")
-def save_prescription(data: PrescriptionCreate, db: Session = Depends(get_db)):
+async def save_prescription(data: PrescriptionCreate, db: AsyncSession = Depends(get_async_db)):
     p = Prescription(**data.dict())
     db.add(p)
-    db.commit()
+    await db.commit()
+    patient_summary_cache.invalidate(data.patient_id)
     return {"message": "Prescription saved"}
 
 
 @router.get("/patient/{patient_id}", response_model=list[PrescriptionResponse])
-def prescriptions_by_patient(patient_id: int, db: Session = Depends(get_db)):
-    return db.query(Prescription).filter(Prescription.patient_id == patient_id).order_by(Prescription.created_at.desc()).all()
+async def prescriptions_by_patient(patient_id: int, db: AsyncSession = Depends(get_async_db)):
+    return (await db.scalars(
+        select(Prescription).where(Prescription.patient_id == patient_id).order_by(Prescription.created_at.desc())
+    )).all()
+
+
+PRESCRIPTION_EXPORT_COLUMNS = [
+    "prescription_id", "patient_id", "created_at", "diagnosis", "notes",
+    "medicine", "dosage", "duration"
+]
+
+
+def _export_statement(start: Optional[datetime], end: Optional[datetime]):
+    stmt = select(
+        Prescription.id.label("prescription_id"),
+        Prescription.patient_id,
+        Prescription.created_at,
+        Prescription.diagnosis,
+        Prescription.notes,
+        Prescription.medicines
+    )
+    if start:
+        stmt = stmt.where(Prescription.created_at >= to_utc_naive(start))
+    if end:
+        stmt = stmt.where(Prescription.created_at < to_utc_naive(end))
+    return stmt.order_by(Prescription.created_at, Prescription.id)
+
+
+@router.get("/export")
+async def export_prescriptions(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False
+):
+    """
+    Stream every prescription created in [start, end) with one record per
+    medicine, ordered by creation time.
+    """
+    stmt = _export_statement(start, end)
+
+    def expand(row):
+        medicines = row.pop("medicines")
+        return [{**row, **m} for m in flatten_medicines(medicines)]
+
+    return export_service.response(stmt, PRESCRIPTION_EXPORT_COLUMNS, "prescriptions", format, gzip, expand)
+
+
+def _medicine_window(name: str, start: Optional[datetime], end: Optional[datetime], days: Optional[int]):
+    conditions = [PrescriptionMedicine.name_key == medicine_key(name)]
+    start = to_utc_naive(start) if start else None
+    end = to_utc_naive(end) if end else None
+    if days is not None:
+        start = max(start or datetime.min, datetime.utcnow() - timedelta(days=days))
+    if start:
+        conditions.append(PrescriptionMedicine.prescribed_at >= start)
+    if end:
+        conditions.append(PrescriptionMedicine.prescribed_at < end)
+    return conditions
+
+
+@router.get("/medicines", response_model=list[PrescribedMedicineOut])
+async def prescribed_medicine(
+    name: str = Query(..., min_length=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    days: Optional[int] = Query(None, ge=1),
+    patient_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Prescriptions of one medicine (case-insensitive name), newest first,
+    optionally limited to [start, end), the last `days` days or one patient.
+    Served from the (name, date) index on prescription_medicines.
+    """
+    stmt = select(PrescriptionMedicine).where(*_medicine_window(name, start, end, days))
+    if patient_id is not None:
+        stmt = stmt.where(PrescriptionMedicine.patient_id == patient_id)
+    stmt = stmt.order_by(PrescriptionMedicine.prescribed_at.desc(), PrescriptionMedicine.id.desc()).limit(limit)
+    return (await db.scalars(stmt)).all()
+
+
+@router.get("/medicines/patients", response_model=list[MedicinePatientOut])
+async def patients_on_medicine(
+    name: str = Query(..., min_length=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    days: Optional[int] = Query(None, ge=1),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Patients prescribed a medicine in the window, e.g.
+    ?name=Metformin&days=90, most recently prescribed first.
+    """
+    last_prescribed = func.max(PrescriptionMedicine.prescribed_at)
+    rows = (await db.execute(
+        select(
+            PrescriptionMedicine.patient_id,
+            Patient.name.label("patient_name"),
+            func.count(func.distinct(PrescriptionMedicine.prescription_id)).label("prescriptions"),
+            last_prescribed.label("last_prescribed_at")
+        )
+        .join(Patient, Patient.id == PrescriptionMedicine.patient_id)
+        .where(*_medicine_window(name, start, end, days))
+        .group_by(PrescriptionMedicine.patient_id, Patient.name)
+        .order_by(last_prescribed.desc())
+        .limit(limit)
+    )).mappings().all()
+    return rows
+
+
+@router.get("/{prescription_id}/pdf")
+async def prescription_pdf(prescription_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Printable prescription. The ETag changes only when the prescription
+    does, so re-prints are answered from cache (or 304).
+    """
+    row = (await db.execute(
+        select(Prescription, Patient).join(Patient, Patient.id == Prescription.patient_id)
+        .where(Prescription.id == prescription_id)
+    )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Prescription not found")
+    p, patient = row
+    data = {
+        "id": p.id,
+        "diagnosis": p.diagnosis,
+        "medicines": p.medicines,
+        "notes": p.notes,
+        "created_at": p.created_at,
+        "patient_name": patient.name,
+        "age": patient.age,
+        "gender": patient.gender
+    }
+    etag = pdf_service.etag("prescription", p.id, p.updated_at or p.created_at)
+    return await pdf_service.response(
+        request, etag, f"prescription-{p.id}.pdf", pdf_service.generate_prescription_pdf, data
+    )
 
 
 @router.delete("/{prescription_id}", status_code=204)
-def delete_prescription(prescription_id: int, db: Session = Depends(get_db)):
-    p = db.query(Prescription).filter(Prescription.id == prescription_id).first()
+async def delete_prescription(prescription_id: int, db: AsyncSession = Depends(get_async_db)):
+    p = await db.get(Prescription, prescription_id)
     if not p:
         raise HTTPException(status_code=404, detail="Prescription not found")
-    db.delete(p)
-    db.commit()
+    await db.delete(p)
+    await db.commit()
+    patient_summary_cache.invalidate(p.patient_id)
     return
@@ -1,70 +1,227 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, SessionLocal, AsyncSessionLocal
 from app.models import Appointment, QueueToken
+from app.services.broadcast_service import queue_broadcaster, RESYNC
+from app.services.redis_service import redis_service, SERVICE_TIME_WINDOW
 
 router = APIRouter()
 
+
+def _token_out(t: QueueToken) -> dict:
+    return {
+        "token_id": t.id,
+        "token_number": t.token_number,
+        "appointment_id": t.appointment_id,
+        "status": t.status
+    }
+
+
+async def _tokens_on(db: AsyncSession, day: date) -> list[dict]:
+    start_of_day = datetime.combine(day, datetime.min.time())
+    tokens = (await db.scalars(
+        select(QueueToken)
+        # bounded on both sides so the created_at index is used, not a walk of token_number
+        .where(QueueToken.created_at >= start_of_day, QueueToken.created_at < start_of_day + timedelta(days=1))
+        .order_by(QueueToken.token_number)
+    )).all()
+    return [_token_out(t) for t in tokens]
+
+
+async def _today_snapshot() -> list[dict]:
+    """
+    Tokens issued since midnight (UTC), used as the initial state for live clients.
+    """
+    async with AsyncSessionLocal() as db:
+        return await _tokens_on(db, datetime.utcnow().date())
+
+
+async def _doctor_of(db: AsyncSession, appointment_id: int):
+    return await db.scalar(select(Appointment.doctor_id).where(Appointment.id == appointment_id))
+
+
+async def _sync_waiting(t: QueueToken, doctor_id):
+    if t.status == "waiting":
+        await redis_service.call(redis_service.add_to_queue, t.appointment_id, _token_out(t), doctor_id)
+    else:
+        await redis_service.call(redis_service.remove_from_queue, t.appointment_id, doctor_id)
+
+
+def restore_waiting_queue():
+    """
+    Reload waiting tokens from SQL into the queue store and, if the service
+    time windows are empty, warm them with the latest measured consultations
+    (run at startup).
+    """
+    db = SessionLocal()
+    try:
+        waiting = (
+            db.query(QueueToken, Appointment.doctor_id)
+            .join(Appointment, Appointment.id == QueueToken.appointment_id)
+            .filter(QueueToken.status == "waiting")
+            .all()
+        )
+        redis_service.restore_queue((t.appointment_id, _token_out(t), doctor_id) for t, doctor_id in waiting)
+        if not redis_service.has_service_times():
+            recent = (
+                db.query(QueueToken.called_at, QueueToken.completed_at, Appointment.doctor_id)
+                .join(Appointment, Appointment.id == QueueToken.appointment_id)
+                .filter(QueueToken.called_at.isnot(None), QueueToken.completed_at.isnot(None))
+                .order_by(QueueToken.completed_at.desc())
+                .limit(SERVICE_TIME_WINDOW)
+                .all()
+            )
+            for called_at, completed_at, doctor_id in reversed(recent):
+                redis_service.record_service_time((completed_at - called_at).total_seconds(), doctor_id)
+    finally:
+        db.close()
+
+
 @router.get("/")
-def get_queue(db: Session = Depends(get_db)):
-    tokens = db.query(QueueToken).order_by(QueueToken.token_number).all()
-    return [
-        {
-            "token_id": t.id,
-            "token_number": t.token_number,
-            "appointment_id": t.appointment_id,
-            "status": t.status
-        }
-        for t in tokens
-    ]
+async def get_queue(day: Optional[date] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    Tokens issued on `day` (UTC, default today) in token order.
+    """
+    return await _tokens_on(db, day or datetime.utcnow().date())
+
+
+@router.websocket("/ws")
+async def queue_updates(websocket: WebSocket):
+    """
+    Live queue feed: one snapshot message, then created/updated/deleted diffs.
+    """
+    await websocket.accept()
+    updates = queue_broadcaster.subscribe()
+    # clients never send anything; reading only serves to notice disconnects
+    closed = asyncio.create_task(_wait_closed(websocket))
+    try:
+        await websocket.send_json({"type": "snapshot", "tokens": await _today_snapshot()})
+        while True:
+            next_event = asyncio.create_task(updates.get())
+            done, _ = await asyncio.wait({closed, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if closed in done:
+                next_event.cancel()
+                break
+            event = next_event.result()
+            if event is RESYNC:
+                event = {"type": "snapshot", "tokens": await _today_snapshot()}
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        queue_broadcaster.unsubscribe(updates)
+
+
+async def _wait_closed(websocket: WebSocket):
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/appointment/{appointment_id}/position")
+async def queue_position(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Position in the appointment's doctor's queue (clinic-wide if unassigned).
+    """
+    doctor_id = await _doctor_of(db, appointment_id)
+    position = await redis_service.call(redis_service.get_queue_position, appointment_id, doctor_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Appointment is not waiting in the queue")
+    return {
+        "appointment_id": appointment_id,
+        "position": position,
+        "waiting": await redis_service.call(redis_service.queue_length, doctor_id)
+    }
+
+
+@router.get("/{token_id}/eta")
+async def queue_eta(token_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Estimated wait for a waiting token, from the rolling mean consultation time.
+    """
+    token = await db.get(QueueToken, token_id)
+    if not token:
+        raise HTTPException(status_code=404, detail="Token not found")
+    doctor_id = await _doctor_of(db, token.appointment_id)
+    eta = await redis_service.call(redis_service.calculate_eta, token.appointment_id, doctor_id)
+    if eta is None:
+        raise HTTPException(status_code=409, detail="Token is not waiting")
+    return {
+        "token_id": token.id,
+        "token_number": token.token_number,
+        "position": eta["position"],
+        "avg_service_minutes": round(eta["avg_service_seconds"] / 60, 1),
+        "eta_minutes": round(eta["eta_seconds"] / 60, 1)
+    }
 
 
 @router.post("/")
-def create_queue_token(appointment_id: int, db: Session = Depends(get_db)):
+async def create_queue_token(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
     # ensure appointment exists
-    appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    appt = await db.get(Appointment, appointment_id)
     if not appt:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
-    current_max = db.query(func.max(QueueToken.token_number)).scalar() or 0
+    # the aggregate only runs once, to seed the counter after a restart
+    issued = 0
+    if not await redis_service.call(redis_service.has_token_counter):
+        issued = await db.scalar(select(func.max(QueueToken.token_number))) or 0
+    token_number = await redis_service.call(redis_service.next_token_number, lambda: issued)
     token = QueueToken(
         appointment_id=appointment_id,
-        token_number=current_max + 1,
+        token_number=token_number,
         status="waiting"
     )
     db.add(token)
-    db.commit()
-    db.refresh(token)
-    return {
-        "token_id": token.id,
-        "token_number": token.token_number,
-        "appointment_id": token.appointment_id,
-        "status": token.status
-    }
+    await db.commit()
+    await db.refresh(token)
+    await _sync_waiting(token, appt.doctor_id)
+    out = _token_out(token)
+    queue_broadcaster.publish({"type": "created", "token": out})
+    return out
 
 
 @router.patch("/{token_id}")
-def update_queue_token(token_id: int, status: str, db: Session = Depends(get_db)):
-    token = db.query(QueueToken).filter(QueueToken.id == token_id).first()
+async def update_queue_token(token_id: int, status: str, db: AsyncSession = Depends(get_async_db)):
+    token = await db.get(QueueToken, token_id)
     if not token:
         raise HTTPException(status_code=404, detail="Token not found")
+    now = datetime.utcnow()
+    doctor_id = await _doctor_of(db, token.appointment_id)
+    if status == "serving" and token.called_at is None:
+        token.called_at = now
+        await redis_service.call(redis_service.mark_called, time.time(), doctor_id)
+    elif status == "done" and token.completed_at is None:
+        token.completed_at = now
+        if token.called_at is not None:
+            seconds = (now - token.called_at).total_seconds()
+            await redis_service.call(redis_service.record_service_time, seconds, doctor_id)
     token.status = status
-    db.commit()
-    db.refresh(token)
-    return {
-        "token_id": token.id,
-        "token_number": token.token_number,
-        "appointment_id": token.appointment_id,
-        "status": token.status
-    }
+    await db.commit()
+    await db.refresh(token)
+    await _sync_waiting(token, doctor_id)
+    out = _token_out(token)
+    queue_broadcaster.publish({"type": "updated", "token": out})
+    return out
 
 
 @router.delete("/{token_id}", status_code=204)
-def delete_queue_token(token_id: int, db: Session = Depends(get_db)):
-    token = db.query(QueueToken).filter(QueueToken.id == token_id).first()
+async def delete_queue_token(token_id: int, db: AsyncSession = Depends(get_async_db)):
+    token = await db.get(QueueToken, token_id)
     if not token:
         raise HTTPException(status_code=404, detail="Token not found")
-    db.delete(token)
-    db.commit()
+    appointment_id = token.appointment_id
+    doctor_id = await _doctor_of(db, appointment_id)
+    await db.delete(token)
+    await db.commit()
+    await redis_service.call(redis_service.remove_from_queue, appointment_id, doctor_id)
+    queue_broadcaster.publish({"type": "deleted", "token_id": token_id})
     return
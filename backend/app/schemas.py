@@ -1,6 +1,16 @@
-from datetime import datetime
+from datetime import datetime, date
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+
+class UserPrincipal(BaseModel):
+    id: int
+    name: str
+    email: str
+    role: Optional[str] = None
+
+    class Config:
+        from_attributes = True
 
 
 class PatientCreate(BaseModel):
@@ -18,20 +28,47 @@ class PatientOut(PatientCreate):
         from_attributes = True
 
 
+class PatientImportError(BaseModel):
+    row: int
+    error: str
+
+
+class PatientImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[PatientImportError]
+
+
 class AppointmentCreate(BaseModel):
     patient_id: int
     appointment_time: datetime
+    doctor_id: Optional[int] = None
+    duration_minutes: Optional[int] = Field(None, ge=5, le=240)
 
 
 class AppointmentResponse(AppointmentCreate):
     id: int
     status: str
+    end_time: Optional[datetime] = None
     created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class AvailabilitySlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class AvailabilityResponse(BaseModel):
+    doctor_id: Optional[int] = None
+    start: date
+    end: date
+    duration_minutes: int
+    slots: List[AvailabilitySlot]
+
+
 class PrescriptionCreate(BaseModel):
     patient_id: int
     diagnosis: str
@@ -47,6 +84,25 @@ class PrescriptionResponse(PrescriptionCreate):
         from_attributes = True
 
 
+class PrescribedMedicineOut(BaseModel):
+    prescription_id: int
+    patient_id: int
+    name: str
+    dosage: Optional[str] = None
+    duration: Optional[str] = None
+    prescribed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class MedicinePatientOut(BaseModel):
+    patient_id: int
+    patient_name: str
+    prescriptions: int
+    last_prescribed_at: Optional[datetime] = None
+
+
 class BillCreate(BaseModel):
     patient_id: int
     amount: float
@@ -61,6 +117,33 @@ class BillResponse(BillCreate):
         from_attributes = True
 
 
+class RevenueRow(BaseModel):
+    period: str
+    status: str
+    bill_count: int
+    total_amount: float
+
+
+class OutstandingResponse(BaseModel):
+    status: str
+    bill_count: int
+    total_amount: float
+    patient_id: Optional[int] = None
+
+
+class DashboardStats(BaseModel):
+    day: date
+    appointments_today: int
+    appointments_by_status: Dict[str, int]
+    total_patients: int
+    queue_waiting: int
+    queue_serving: int
+    queue_served: int
+    unpaid_bills: int
+    unpaid_amount: float
+    generated_at: datetime
+
+
 # =========================
 # AI Assistant
 # =========================
@@ -89,6 +172,32 @@ class TranscriptionResponse(BaseModel):
     text: str
 
 
+class SOAPJobCreate(BaseModel):
+    patient_id: int
+    transcript: str = Field(..., min_length=1)
+
+
+class SOAPJobOut(BaseModel):
+    job_id: int
+    status: str
+    note_id: Optional[int] = None
+    summary: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class AINoteOut(BaseModel):
+    id: int
+    patient_id: int
+    transcript: str
+    structured_summary: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 class PatientSummary(BaseModel):
     patient: Optional[PatientOut]
     appointments: List[AppointmentResponse]
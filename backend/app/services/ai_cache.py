@@ -0,0 +1,149 @@
+# Response cache with single-flight dedup for AI generation endpoints
+import asyncio
+import hashlib
+import json
+import os
+import re
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.cache import TTLCache
+from app.services.redis_service import redis_service
+
+AI_CACHE_KEY = "ai:cache:{}:{}"
+_PUNCTUATION = re.compile(r"[^\w\s,]")
+
+
+def _normalize(text: str | None) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", (text or "").lower()).split())
+
+
+def prescription_cache_key(diagnosis: str, symptoms: str | None, model: str) -> str:
+    """
+    Same key for requests that differ only in case, punctuation, spacing or
+    the order of comma-separated symptoms ("Fever, cough" == "cough,fever").
+    """
+    symptom_list = sorted(s for s in (_normalize(p) for p in (symptoms or "").split(",")) if s)
+    raw = json.dumps([model, _normalize(diagnosis), symptom_list])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution; every
+    caller awaits the same task. The task is shielded, so a caller that
+    goes away does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._inflight = {}   # key -> asyncio.Task
+
+    async def do(self, key, fn):
+        """
+        Returns (result, shared); shared is True when another caller's call was reused.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+class AIResponseCache:
+    """
+    Bounded LRU + TTL cache in front of an AI call, with single-flight so a
+    burst of identical requests makes one upstream call.
+
+    With persist=True and REDIS_URL set, entries are also written to Redis
+    (SETEX), which survives restarts and is shared by every worker; the
+    in-process LRU stays the first level. The blocking Redis calls run on
+    the threadpool.
+
+    compute() returns (response, cacheable); fallbacks produced because the
+    upstream failed should not be cached.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, persist: bool = False):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flight = SingleFlight()
+        self._redis = redis_service.client if persist else None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def _load(self, key: str):
+        value = self._memory.get(key)
+        if value is not None or self._redis is None:
+            return value
+        try:
+            raw = await run_in_threadpool(self._redis.get, AI_CACHE_KEY.format(self.namespace, key))
+        except Exception:
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self._memory.set(key, value)
+        return value
+
+    async def _store(self, key: str, value):
+        self._memory.set(key, value)
+        if self._redis is not None:
+            try:
+                await run_in_threadpool(
+                    self._redis.setex, AI_CACHE_KEY.format(self.namespace, key), int(self.ttl), json.dumps(value)
+                )
+            except Exception:
+                pass   # persistence is best effort; the in-process copy still serves
+
+    async def get_or_compute(self, key: str, compute):
+        value = await self._load(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        async def fill():
+            # re-check: an identical call may have finished while we were scheduled
+            cached = await self._load(key)
+            if cached is not None:
+                return cached
+            self.misses += 1
+            response, cacheable = await compute()
+            if cacheable:
+                await self._store(key, response)
+            return response
+
+        value, shared = await self._flight.do(key, fill)
+        if shared:
+            self.coalesced += 1
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._memory),
+            "maxsize": self._memory.maxsize,
+            "ttl": self.ttl,
+            "persistent": self._redis is not None,
+            "in_flight": len(self._flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    def clear(self):
+        self._memory.clear()
+        self.hits = self.misses = self.coalesced = 0
+
+
+prescription_ai_cache = AIResponseCache(
+    "prescription",
+    maxsize=int(os.getenv("AI_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AI_CACHE_TTL", "21600")),
+    persist=os.getenv("AI_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+)
@@ -1,24 +1,201 @@
 # AI Service for Whisper, LLM, and other AI features
+import asyncio
 import os
+import random
+
+import httpx
 from dotenv import load_dotenv
 
+from app.services.transcription import create_backend, split_audio
+
 load_dotenv()
 
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AIServiceError(Exception):
+    """
+    The upstream AI API failed (after retries) or is not configured.
+    """
+
+
 class AIService:
-    def __init__(self):
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-    
-    def transcribe_audio(self, audio_data):
-        # Whisper transcription implementation
-        pass
-    
-    def generate_soap_notes(self, consultation_data):
+    """
+    Shared async client for the OpenAI-compatible HTTP API.
+
+    One pooled httpx.AsyncClient per process (keep-alive connections are
+    reused across requests), a per-call timeout, a semaphore bounding
+    concurrent upstream calls, and retries with full-jitter exponential
+    backoff on timeouts, connection errors, 429 and 5xx (Retry-After is
+    honoured). The semaphore is released while backing off.
+
+    base_url is configurable (OPENAI_BASE_URL), so the service can be
+    pointed at a local stub server, e.g. benchmarks/ai_stub.py.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        timeout: float | None = None,
+        max_concurrency: int | None = None,
+        max_retries: int | None = None,
+        backoff: float | None = None
+    ):
+        self.openai_api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).rstrip("/")
+        self.timeout = timeout if timeout is not None else float(os.getenv("AI_TIMEOUT", "30"))
+        self.max_concurrency = max_concurrency or int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("AI_MAX_RETRIES", "2"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("AI_RETRY_BACKOFF", "0.5"))
+        self.chat_model = os.getenv("AI_CHAT_MODEL", "gpt-4o-mini")
+        self.transcribe_model = os.getenv("AI_TRANSCRIBE_MODEL", "whisper-1")
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._transcription = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.openai_api_key)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.openai_api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        return self._client
+
+    @property
+    def transcription_backend(self):
+        if self._transcription is None:
+            self._transcription = create_backend(os.getenv("AI_TRANSCRIBE_BACKEND", "auto"), self)
+        return self._transcription
+
+    @transcription_backend.setter
+    def transcription_backend(self, backend):
+        if self._transcription is not None:
+            self._transcription.shutdown()
+        self._transcription = backend
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._transcription is not None:
+            self._transcription.shutdown()
+
+    def _retry_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), 30.0)
+                except ValueError:
+                    pass
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def _post(self, path: str, timeout: float | None = None, **kwargs) -> dict:
+        if not self.enabled:
+            raise AIServiceError("AI unavailable: set OPENAI_API_KEY.")
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            response, error = None, None
+            async with self._semaphore:
+                try:
+                    response = await client.post(path, timeout=timeout or self.timeout, **kwargs)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    error = e
+            if response is not None:
+                if response.status_code < 400:
+                    try:
+                        return response.json()
+                    except ValueError:   # e.g. a proxy's HTML error page with a 200
+                        raise AIServiceError(f"{path} returned a non-JSON body: {response.text[:200]}")
+                if response.status_code not in RETRY_STATUSES:
+                    raise AIServiceError(f"{path} returned {response.status_code}: {response.text[:200]}")
+                error = AIServiceError(f"{path} returned {response.status_code}")
+            if attempt == self.max_retries:
+                raise AIServiceError(f"{path} failed after {attempt + 1} attempts: {error}") from error
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def complete(self, prompt: str, max_tokens: int = 300, timeout: float | None = None) -> str:
+        data = await self._post(
+            "/chat/completions",
+            timeout=timeout,
+            json={
+                "model": self.chat_model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens
+            }
+        )
+        try:
+            return data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise AIServiceError("Unexpected completion payload")
+
+    async def transcribe_remote(self, audio_data: bytes, filename: str = "audio.wav", content_type: str = "audio/wav") -> str:
+        # Whisper transcription over the API
+        data = await self._post(
+            "/audio/transcriptions",
+            timeout=max(self.timeout, 120.0),
+            data={"model": self.transcribe_model},
+            files={"file": (filename, audio_data, content_type)}
+        )
+        return data.get("text") or ""
+
+    async def transcribe_segments(self, path: str, workdir: str, content_type: str = "audio/wav"):
+        """
+        Split a spooled recording into segments, transcribe them in parallel
+        on the configured backend and yield {index, start, end, text} in
+        order as soon as each one (and all before it) is done.
+        """
+        backend = self.transcription_backend
+        segments = await asyncio.to_thread(split_audio, path, workdir)
+        if len(segments) == 1 and segments[0]["path"] == path:
+            content = content_type     # unsplit original upload
+        else:
+            content = "audio/wav"
+        tasks = [
+            asyncio.ensure_future(backend.transcribe_segment(segment["path"], content))
+            for segment in segments
+        ]
+        try:
+            for segment, task in zip(segments, tasks):
+                text = await task
+                yield {"index": segment["index"], "start": segment["start"], "end": segment["end"], "text": text}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def transcribe_audio(self, path: str, workdir: str, content_type: str = "audio/wav") -> str:
+        # Whisper transcription (any backend), whole recording
+        texts = [s["text"] async for s in self.transcribe_segments(path, workdir, content_type)]
+        return " ".join(t for t in texts if t)
+
+    async def generate_soap_notes(self, consultation_data: str) -> str:
         # LLM SOAP note generation
-        pass
-    
-    def suggest_prescription(self, diagnosis):
-        # Prescription auto-completion
-        pass
+        prompt = (
+            "You are a clinical documentation assistant. Write concise SOAP notes for this "
+            "consultation transcript. Reply with only a JSON object with the string keys "
+            "subjective, objective, assessment and plan.\n"
+            f"Transcript:\n{consultation_data}"
+        )
+        return await self.complete(prompt, max_tokens=600)
 
+    async def suggest_prescription(self, diagnosis: str, symptoms: str | None = None) -> str:
+        # Prescription auto-completion
+        prompt = (
+            "You are a medical assistant. Given a diagnosis and optional symptoms, "
+            "return a JSON with medicines (list of {name,dosage,duration}) and a short note. "
+            f"Diagnosis: {diagnosis}. Symptoms: {symptoms or 'None'}."
+        )
+        return await self.complete(prompt, max_tokens=300)
 
 
+ai_service = AIService()
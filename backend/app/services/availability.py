@@ -0,0 +1,196 @@
+# Doctor calendars: booking conflict checks and free-slot search
+import bisect
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import select, text
+
+from app.cache import TTLCache
+from app.models import Appointment
+
+APPOINTMENT_DEFAULT_MINUTES = int(os.getenv("APPOINTMENT_DEFAULT_MINUTES", "15"))
+APPOINTMENT_MAX_MINUTES = int(os.getenv("APPOINTMENT_MAX_MINUTES", "240"))
+CLINIC_OPEN = time.fromisoformat(os.getenv("CLINIC_OPEN", "09:00"))
+CLINIC_CLOSE = time.fromisoformat(os.getenv("CLINIC_CLOSE", "17:00"))
+AVAILABILITY_MAX_DAYS = 62
+
+# first key of the Postgres advisory lock taken per calendar while booking
+BOOKING_LOCK_CLASS = 7101
+
+# appointments in these states no longer hold their slot
+NON_BLOCKING_STATUSES = ("cancelled", "no_show")
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """
+    Stored times are naive UTC; clients may send offsets.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _doctor_clause(doctor_id: int | None):
+    # unassigned appointments share one calendar
+    return Appointment.doctor_id.is_(None) if doctor_id is None else Appointment.doctor_id == doctor_id
+
+
+def _blocking(stmt, doctor_id: int | None, start: datetime, end: datetime):
+    """
+    Appointments of the doctor overlapping [start, end). Durations are
+    capped at APPOINTMENT_MAX_MINUTES, so anything overlapping must start in
+    (start - max, end): a range scan on ix_appointments_doctor_time.
+    """
+    return stmt.where(
+        _doctor_clause(doctor_id),
+        Appointment.appointment_time > start - timedelta(minutes=APPOINTMENT_MAX_MINUTES),
+        Appointment.appointment_time < end,
+        Appointment.status.notin_(NON_BLOCKING_STATUSES)
+    )
+
+
+def _end_of(appointment_time: datetime, end_time: datetime | None, duration: int | None) -> datetime:
+    # rows booked before durations existed have no end_time
+    return end_time or appointment_time + timedelta(minutes=duration or APPOINTMENT_DEFAULT_MINUTES)
+
+
+async def lock_calendar(db, doctor_id: int | None):
+    """
+    Hold one calendar's bookings until the transaction ends, across server
+    processes: a transaction-scoped advisory lock on Postgres (keyed by
+    doctor, 0 for the shared unassigned calendar), so no doctor row is
+    needed; on SQLite a write transaction started up front, because
+    aiosqlite otherwise defers BEGIN to the INSERT, after the conflict check.
+    Call it before find_conflict, as the first statement of the transaction.
+    """
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:cls, :key)"),
+            {"cls": BOOKING_LOCK_CLASS, "key": doctor_id or 0}
+        )
+    elif dialect == "sqlite":
+        await db.execute(text("BEGIN IMMEDIATE"))
+
+
+async def find_conflict(db, doctor_id: int | None, start: datetime, end: datetime, exclude_id: int | None = None):
+    """
+    The first booked appointment overlapping [start, end), or None. Reads
+    the database, not the in-memory calendar, so it is authoritative.
+    """
+    stmt = _blocking(select(Appointment), doctor_id, start, end).order_by(Appointment.appointment_time)
+    if exclude_id is not None:
+        stmt = stmt.where(Appointment.id != exclude_id)
+    for appointment in (await db.scalars(stmt)).all():
+        if _end_of(appointment.appointment_time, appointment.end_time, appointment.duration_minutes) > start:
+            return appointment
+    return None
+
+
+class DayCalendar:
+    """
+    One doctor's busy time on one day as sorted, merged, non-overlapping
+    intervals; overlap tests and slot search are binary searches and a
+    single sweep.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals):
+        self.starts, self.ends = [], []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        i = bisect.bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return False
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def free_slots(self, open_at: datetime, close_at: datetime, duration: timedelta, step: timedelta) -> list:
+        """
+        Slots of `duration` on the `step` grid from open_at that fit before
+        close_at without touching a busy interval.
+        """
+        slots = []
+        i = bisect.bisect_right(self.ends, open_at)
+        t = open_at
+        while t + duration <= close_at:
+            while i < len(self.ends) and self.ends[i] <= t:
+                i += 1
+            if i < len(self.starts) and self.starts[i] < t + duration:
+                # jump to the first grid point after this busy interval
+                t = open_at + -(-(self.ends[i] - open_at) // step) * step
+                continue
+            slots.append((t, t + duration))
+            t += step
+        return slots
+
+
+class AvailabilityIndex:
+    """
+    Per-process cache of DayCalendars keyed by (doctor, day), loaded for
+    all missing days of a request with one indexed query. Bookings made
+    here invalidate the days they touch; other workers' bookings show up
+    after AVAILABILITY_CACHE_TTL seconds (booking itself re-checks the
+    database, so a stale calendar can offer a slot but never double-book it).
+    """
+
+    def __init__(self, ttl: float = float(os.getenv("AVAILABILITY_CACHE_TTL", "60"))):
+        self._days = TTLCache(maxsize=4096, ttl=ttl)
+
+    def invalidate(self, doctor_id: int | None, start: datetime, end: datetime):
+        day = start.date()
+        while day <= end.date():
+            self._days.invalidate((doctor_id, day))
+            day += timedelta(days=1)
+
+    async def calendars(self, db, doctor_id: int | None, first: date, last: date) -> dict:
+        days = [first + timedelta(days=n) for n in range((last - first).days + 1)]
+        calendars = {day: self._days.get((doctor_id, day)) for day in days}
+        missing = [day for day, calendar in calendars.items() if calendar is None]
+        if missing:
+            window_start = datetime.combine(missing[0], time.min)
+            window_end = datetime.combine(missing[-1] + timedelta(days=1), time.min)
+            rows = (await db.execute(_blocking(
+                select(Appointment.appointment_time, Appointment.end_time, Appointment.duration_minutes),
+                doctor_id, window_start, window_end
+            ))).all()
+            busy = {day: [] for day in missing}
+            for start, end_time, duration in rows:
+                end = _end_of(start, end_time, duration)
+                day = start.date()
+                while day <= end.date():   # an interval can spill into the next day
+                    if day in busy:
+                        busy[day].append((start, end))
+                    day += timedelta(days=1)
+            for day in missing:
+                calendars[day] = DayCalendar(busy[day])
+                self._days.set((doctor_id, day), calendars[day])
+        return calendars
+
+    async def free_slots(
+        self,
+        db,
+        doctor_id: int | None,
+        first: date,
+        last: date,
+        duration_minutes: int,
+        step_minutes: int,
+        now: datetime | None = None
+    ) -> list:
+        now = now or datetime.utcnow()
+        duration, step = timedelta(minutes=duration_minutes), timedelta(minutes=step_minutes)
+        slots = []
+        for day, calendar in (await self.calendars(db, doctor_id, first, last)).items():
+            open_at = datetime.combine(day, CLINIC_OPEN)
+            close_at = datetime.combine(day, CLINIC_CLOSE)
+            slots += [s for s in calendar.free_slots(open_at, close_at, duration, step) if s[0] >= now]
+        return slots
+
+
+availability_index = AvailabilityIndex()
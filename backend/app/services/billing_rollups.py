@@ -0,0 +1,118 @@
+# Incrementally maintained billing rollups (day x status, patient x status, status)
+from sqlalchemy import event, func, cast, Date, select, insert, update, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import attributes
+
+from app.models import Bill, BillingDailyRollup, BillingPatientRollup, BillingStatusTotal
+
+def _keys(bill_values: dict) -> list[tuple]:
+    """
+    (rollup model, primary-key values) touched by a bill.
+    """
+    status = bill_values["status"]
+    keys = [
+        (BillingPatientRollup, {"patient_id": bill_values["patient_id"], "status": status}),
+        (BillingStatusTotal, {"status": status}),
+    ]
+    # an undated bill belongs to no day; it still counts towards the totals
+    if bill_values["created_at"] is not None:
+        keys.insert(0, (BillingDailyRollup, {"day": bill_values["created_at"].date(), "status": status}))
+    return keys
+
+
+def _apply(connection, model, key: dict, count: int, amount: float):
+    table = model.__table__
+    dialect = connection.dialect.name
+    if count > 0 and dialect in ("sqlite", "postgresql"):
+        insert_fn = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert_fn(table).values(**key, bill_count=count, total_amount=amount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                "bill_count": table.c.bill_count + stmt.excluded.bill_count,
+                "total_amount": table.c.total_amount + stmt.excluded.total_amount,
+            }
+        )
+        connection.execute(stmt)
+        return
+    where = [table.c[k] == v for k, v in key.items()]
+    updated = connection.execute(
+        update(table).where(*where).values(
+            bill_count=table.c.bill_count + count,
+            total_amount=table.c.total_amount + amount
+        )
+    ).rowcount
+    if not updated and count > 0:
+        connection.execute(insert(table).values(**key, bill_count=count, total_amount=amount))
+    elif model is BillingPatientRollup:
+        # patients come and go; don't keep empty rows around for them
+        connection.execute(delete(table).where(*where, table.c.bill_count <= 0))
+
+
+def _add(connection, values: dict, sign: int):
+    for model, key in _keys(values):
+        _apply(connection, model, key, sign, sign * values["amount"])
+
+
+def _values(bill: Bill) -> dict:
+    return {
+        "created_at": bill.created_at,
+        # status may be explicitly null; count those with the column default
+        "status": bill.status or "unpaid",
+        "patient_id": bill.patient_id,
+        "amount": bill.amount,
+    }
+
+
+@event.listens_for(Bill, "after_insert")
+def _rollup_insert(mapper, connection, target):
+    _add(connection, _values(target), +1)
+
+
+@event.listens_for(Bill, "after_delete")
+def _rollup_delete(mapper, connection, target):
+    _add(connection, _values(target), -1)
+
+
+@event.listens_for(Bill, "after_update")
+def _rollup_update(mapper, connection, target):
+    old = _values(target)
+    changed = False
+    for name in old:
+        history = attributes.get_history(target, name)
+        if history.deleted:
+            old[name] = history.deleted[0]
+            changed = True
+    if changed:
+        _add(connection, old, -1)
+        _add(connection, _values(target), +1)
+
+
+def backfill_rollups(engine):
+    """
+    Build the rollups from the billing table when they are empty but bills
+    exist, e.g. after bulk inserts that bypass the mapper events. One GROUP
+    BY per rollup. Not safe to run from several processes at once; existing
+    databases are backfilled by migration 0006 instead.
+    """
+    with engine.begin() as conn:
+        if conn.execute(select(BillingStatusTotal.status).limit(1)).first():
+            return
+        if not conn.execute(select(Bill.id).limit(1)).first():
+            return
+        day = func.date(Bill.created_at) if conn.dialect.name == "sqlite" else cast(Bill.created_at, Date)
+        # same defaults as _values(): null status counts as unpaid, undated bills skip the daily rollup
+        status = func.coalesce(Bill.status, "unpaid")
+        count, total = func.count(Bill.id), func.sum(Bill.amount)
+        conn.execute(insert(BillingDailyRollup).from_select(
+            ["day", "status", "bill_count", "total_amount"],
+            select(day, status, count, total).where(Bill.created_at.isnot(None)).group_by(day, status)
+        ))
+        conn.execute(insert(BillingPatientRollup).from_select(
+            ["patient_id", "status", "bill_count", "total_amount"],
+            select(Bill.patient_id, status, count, total).group_by(Bill.patient_id, status)
+        ))
+        conn.execute(insert(BillingStatusTotal).from_select(
+            ["status", "bill_count", "total_amount"],
+            select(status, count, total).group_by(status)
+        ))
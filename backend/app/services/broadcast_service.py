@@ -0,0 +1,126 @@
+# Broadcast hub for live queue updates, shared across workers through Redis pub/sub
+import asyncio
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"type": "resync"}
+QUEUE_EVENTS_CHANNEL = "queue:events"
+RECONNECT_MAX_SECONDS = 30
+
+
+class QueueBroadcaster:
+    """
+    Fan-out of queue change events to connected WebSocket clients.
+
+    Queue endpoints publish from the event loop; calls from other threads
+    are handed over with call_soon_threadsafe. Each subscriber has
+    a bounded buffer; a client that falls behind gets its backlog replaced
+    by a single RESYNC marker and is sent a fresh snapshot instead.
+
+    With REDIS_URL set and start() called, events go out on a Redis channel
+    (in publish order, from one sender task) and every worker process,
+    this one included, delivers what it receives to its own subscribers.
+    If the subscription drops it is re-established with backoff and every
+    subscriber is resynced, since events may have been missed meanwhile.
+    Without Redis, subscribers only see events from their own process.
+    """
+
+    def __init__(self, max_pending: int = 256, redis_url: str | None = None):
+        self.max_pending = max_pending
+        self.redis_url = redis_url
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client = None
+        self._outbox: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        if not self.redis_url or self._client is not None:
+            return
+        import redis.asyncio as aioredis
+        self._loop = asyncio.get_running_loop()
+        self._client = aioredis.from_url(self.redis_url)
+        self._outbox = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._send()), asyncio.create_task(self._listen())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._outbox = [], None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        loop = self._loop
+        shared = self._outbox is not None
+        if loop is None or loop.is_closed() or not (shared or self._subscribers):
+            return
+        deliver = self._outbox.put_nowait if shared else self._fanout
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            deliver(event)
+        else:
+            loop.call_soon_threadsafe(deliver, event)
+
+    async def _send(self):
+        while True:
+            event = await self._outbox.get()
+            try:
+                await self._client.publish(QUEUE_EVENTS_CHANNEL, json.dumps(event))
+            except Exception as e:
+                # receivers resync when their own subscription recovers; this
+                # process's clients are told now
+                logger.warning("Publishing queue event failed: %s", e)
+                self._fanout(RESYNC)
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(QUEUE_EVENTS_CHANNEL)
+                if delay > 1:
+                    self._fanout(RESYNC)
+                delay = 1
+                async for message in pubsub.listen():
+                    self._fanout(json.loads(message["data"]))
+                raise ConnectionError("subscription closed")
+            except Exception as e:
+                logger.warning("Queue event subscription lost, retrying in %ss: %s", delay, e)
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def _fanout(self, event: dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+
+queue_broadcaster = QueueBroadcaster(redis_url=os.getenv("REDIS_URL"))
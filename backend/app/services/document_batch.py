@@ -0,0 +1,195 @@
+# End-of-day document packs: PDFs rendered on a process pool, zipped as they finish
+import asyncio
+import json
+import multiprocessing
+import os
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.cache import TTLCache
+from app.database import AsyncSessionLocal
+from app.models import Bill, Patient, Prescription
+from app.services.pdf_service import render_document
+
+PDF_BATCH_WORKERS = int(os.getenv("PDF_BATCH_WORKERS", str(os.cpu_count() or 1)))
+FETCH_BATCH_SIZE = 500
+KINDS = ("invoice", "prescription")
+
+
+class _ZipSink:
+    """
+    Unseekable write target for ZipFile: whatever has been written since
+    the last take() is handed to the response. ZipFile notices there is no
+    tell()/seek() and writes data descriptors instead of seeking back.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _patient_columns():
+    return (Patient.name.label("patient_name"), Patient.age, Patient.gender)
+
+
+def _statement(kind: str, start: datetime, end: datetime):
+    if kind == "invoice":
+        return (
+            select(Bill.id, Bill.amount, Bill.status, Bill.created_at, *_patient_columns())
+            .join(Patient, Patient.id == Bill.patient_id)
+            .where(Bill.created_at >= start, Bill.created_at < end)
+            .order_by(Bill.created_at, Bill.id)
+        )
+    return (
+        select(
+            Prescription.id, Prescription.diagnosis, Prescription.medicines,
+            Prescription.notes, Prescription.created_at, *_patient_columns()
+        )
+        .join(Patient, Patient.id == Prescription.patient_id)
+        .where(Prescription.created_at >= start, Prescription.created_at < end)
+        .order_by(Prescription.created_at, Prescription.id)
+    )
+
+
+class DocumentBatchService:
+    """
+    Renders every invoice / prescription in a date range on a process pool
+    (PDF_BATCH_WORKERS, default one per core) and streams one ZIP whose
+    entries are appended in completion order. Rows are read from a
+    server-side cursor and at most `workers * 4` documents are in flight,
+    so memory stays flat for large days. Progress per batch id is kept in
+    this process for an hour.
+    """
+
+    def __init__(self, workers: int = PDF_BATCH_WORKERS):
+        self.workers = workers
+        self._pool = None
+        self.progress = TTLCache(maxsize=128, ttl=3600)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def resize(self, workers: int):
+        self.shutdown()
+        self.workers = workers
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        # a worker died (OOM kill, crash in reportlab): the pool is unusable,
+        # so the next batch builds a fresh one. Its queued futures are failed by
+        # the pool itself; cancelling them as well races with that.
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False)
+
+    async def count(self, kinds, start: datetime, end: datetime) -> int:
+        total = 0
+        async with AsyncSessionLocal() as db:
+            for kind in kinds:
+                total += await db.scalar(select(func.count()).select_from(_statement(kind, start, end).subquery()))
+        return total
+
+    def begin(self, total: int, start: datetime, end: datetime) -> str:
+        batch_id = uuid.uuid4().hex
+        self.progress.set(batch_id, {
+            "batch_id": batch_id,
+            "status": "running",
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "total": total,
+            "rendered": 0,
+            "failed": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+        })
+        return batch_id
+
+    async def _documents(self, kinds, start: datetime, end: datetime):
+        async with AsyncSessionLocal() as db:
+            for kind in kinds:
+                result = await db.stream(_statement(kind, start, end).execution_options(yield_per=FETCH_BATCH_SIZE))
+                async for row in result.mappings():
+                    yield kind, dict(row)
+
+    async def stream_zip(self, batch_id: str, kinds, start: datetime, end: datetime):
+        progress = self.progress.get(batch_id)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        sink = _ZipSink()
+        # reportlab already compresses page streams; deflating again buys nothing
+        archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+        documents = self._documents(kinds, start, end)
+        pending, done, exhausted, errors = set(), set(), False, []
+        try:
+            try:
+                while True:
+                    while not exhausted and len(pending) < self.workers * 4:
+                        try:
+                            kind, data = await documents.__anext__()
+                        except StopAsyncIteration:
+                            exhausted = True
+                            break
+                        pending.add(loop.run_in_executor(pool, render_document, kind, data))
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        name, pdf, error = future.result()
+                        if error:
+                            errors.append({"document": name, "error": error})
+                            progress["failed"] += 1
+                        else:
+                            archive.writestr(name, pdf)
+                            progress["rendered"] += 1
+                    chunk = sink.take()
+                    if chunk:
+                        yield chunk
+                status = "done"
+            except BrokenProcessPool as e:
+                # the documents rendered so far are kept; the manifest says the pack is incomplete
+                self._discard(pool)
+                for future in done | pending:   # all failed alike; don't warn about each
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                pending = set()
+                status = "failed"
+                progress["error"] = f"Render pool crashed: {e}"
+            archive.writestr("manifest.json", json.dumps({**progress, "status": status, "errors": errors}, indent=2))
+            archive.close()
+            progress["status"] = status
+            yield sink.take()
+        except BaseException:
+            # includes the client going away mid-download (GeneratorExit / cancellation)
+            progress["status"] = "failed"
+            raise
+        finally:
+            progress["finished_at"] = datetime.utcnow().isoformat()
+            for future in pending:
+                future.cancel()
+            await documents.aclose()
+
+
+document_batch = DocumentBatchService()
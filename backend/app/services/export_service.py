@@ -0,0 +1,102 @@
+# Streaming CSV / NDJSON exports for audit and accounting dumps
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+
+from app.database import AsyncSessionLocal
+
+EXPORT_BATCH_SIZE = 2000
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def flatten_medicines(medicines) -> list[dict]:
+    """
+    Normalize Prescription.medicines (list of dicts or of plain names)
+    into name / dosage / duration records; never empty.
+    """
+    flat = []
+    for m in medicines or []:
+        if isinstance(m, dict):
+            flat.append({
+                "medicine": m.get("name"),
+                "dosage": m.get("dosage"),
+                "duration": m.get("duration"),
+            })
+        else:
+            flat.append({"medicine": str(m), "dosage": None, "duration": None})
+    return flat or [{"medicine": None, "dosage": None, "duration": None}]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ExportService:
+    """
+    Streams a select() of plain columns straight from a server-side cursor
+    (yield_per) to the client, never materializing the result set.
+    Output is buffered into ~64 KB chunks and optionally gzip-compressed
+    on the fly.
+    """
+
+    async def _records(self, stmt, expand):
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for row in result.mappings():
+                for record in expand(dict(row)):
+                    yield record
+
+    async def _encoded(self, stmt, columns, expand, fmt):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        if fmt == "csv":
+            writer.writeheader()
+        async for record in self._records(stmt, expand):
+            if fmt == "csv":
+                writer.writerow({k: v.isoformat() if isinstance(v, datetime) else v for k, v in record.items()})
+            else:
+                buffer.write(json.dumps({c: record.get(c) for c in columns}, default=_json_default))
+                buffer.write("\n")
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    async def _gzipped(self, chunks):
+        compressor = zlib.compressobj(wbits=31)   # gzip container
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def response(self, stmt, columns, filename: str, fmt: str = "csv", gzip: bool = False, expand=None):
+        """
+        expand turns one row mapping into zero or more output records;
+        by default each row is one record.
+        """
+        body = self._encoded(stmt, columns, expand or (lambda row: [row]), fmt)
+        filename = f"{filename}.{fmt}"
+        media_type = MEDIA_TYPES[fmt]
+        if gzip:
+            body = self._gzipped(body)
+            filename += ".gz"
+            media_type = "application/gzip"
+        return StreamingResponse(
+            body,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+
+export_service = ExportService()
@@ -0,0 +1,204 @@
+# SQL-backed background job queue with an in-process async worker pool
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from app.database import AsyncSessionLocal
+from app.models import BackgroundJob
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+FINISHED = ("done", "failed")
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Jobs live in the background_jobs table, so no external broker is needed
+    and queued work survives restarts. Each API process runs `workers`
+    asyncio tasks that claim jobs with a conditional UPDATE (safe with
+    several processes on one database) and run the handler registered for
+    the job's kind; the handler's return value is stored as the result.
+
+    A running job whose lease (JOB_LEASE_SECONDS) expires, e.g. because
+    its process died, is claimed again, up to JOB_MAX_ATTEMPTS times.
+    Submissions wake local workers immediately; other processes pick work
+    up within JOB_POLL_INTERVAL. Waiters in this process are woken on
+    completion; others re-check the row every poll interval.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self._handlers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._finished = {}   # job id -> asyncio.Event, for local waiters
+
+    def register(self, kind: str, handler):
+        """
+        handler: async (payload: dict, job_id: int) -> JSON-serializable result.
+        A job can run more than once (lease expiry, a failure after the
+        handler's own commit), so handlers key what they write on job_id.
+        """
+        self._handlers[kind] = handler
+
+    # ---- producer side ----
+
+    async def submit(self, kind: str, payload: dict) -> BackgroundJob:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        async with AsyncSessionLocal() as db:
+            job = BackgroundJob(kind=kind, status="queued", payload=payload)
+            db.add(job)
+            await db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: int) -> BackgroundJob | None:
+        async with AsyncSessionLocal() as db:
+            return await db.get(BackgroundJob, job_id)
+
+    async def wait(self, job_id: int, timeout: float) -> BackgroundJob | None:
+        """
+        The job once it has finished, or as it stands after `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await self.get(job_id)
+                remaining = deadline - loop.time()
+                if job is None or job.status in FINISHED or remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if not event.is_set():
+                self._finished.pop(job_id, None)
+
+    # ---- worker side ----
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _claimable(self, now: datetime):
+        stale = and_(
+            BackgroundJob.status == "running",
+            BackgroundJob.started_at < now - self.lease,
+            BackgroundJob.attempts < self.max_attempts
+        )
+        return and_(BackgroundJob.kind.in_(list(self._handlers)), or_(BackgroundJob.status == "queued", stale))
+
+    async def _claim(self) -> BackgroundJob | None:
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            claimable = self._claimable(now)
+            job_id = await db.scalar(
+                select(BackgroundJob.id).where(claimable).order_by(BackgroundJob.created_at, BackgroundJob.id).limit(1)
+            )
+            if job_id is None:
+                await self._abandon_exhausted(db, now)
+                return None
+            claimed = await db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id, claimable)
+                .values(status="running", started_at=now, attempts=BackgroundJob.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if claimed.rowcount != 1:
+                return None   # another worker won the race
+            return await db.get(BackgroundJob, job_id)
+
+    async def _abandon_exhausted(self, db, now: datetime):
+        await db.execute(
+            update(BackgroundJob)
+            .where(
+                BackgroundJob.status == "running",
+                BackgroundJob.started_at < now - self.lease,
+                BackgroundJob.attempts >= self.max_attempts
+            )
+            .values(status="failed", error="Abandoned: lease expired too many times", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    async def _finish(self, job_id: int, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.id == job_id)
+                .values(finished_at=datetime.utcnow(), **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _run(self, job: BackgroundJob):
+        try:
+            result = await self._handlers[job.kind](job.payload, job.id)
+        except asyncio.CancelledError:
+            raise   # shutting down: the lease lets another worker retry it
+        except Exception as e:
+            await self._finish(job.id, status="failed", error=f"{type(e).__name__}: {e}")
+        else:
+            await self._finish(job.id, status="done", result=result)
+
+    async def _worker(self):
+        while True:
+            # cleared before looking, so a submit during the claim still wakes us
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Claiming a background job failed")
+                job = None   # database hiccup; retry after the poll interval
+            if job is not None:
+                try:
+                    await self._run(job)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # e.g. the result could not be saved; the lease expiry retries the job
+                    logger.exception("Background job %s could not be finished", job.id)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_queue = JobQueue()
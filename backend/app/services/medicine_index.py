@@ -0,0 +1,96 @@
+# Inverted index over prescribed medicines (prescription_medicines side table)
+from sqlalchemy import event, exists, select, insert, delete
+
+from app.models import Prescription, PrescriptionMedicine
+from app.services.export_service import flatten_medicines
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def medicine_key(name: str) -> str:
+    """
+    Lookup key for a medicine name: case- and whitespace-insensitive.
+    """
+    return " ".join(name.split()).lower()
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def medicine_rows(prescription_id: int, patient_id: int, prescribed_at, medicines) -> list[dict]:
+    rows = []
+    for m in flatten_medicines(medicines):
+        name = (m["medicine"] or "").strip()
+        if not name:
+            continue
+        rows.append({
+            "prescription_id": prescription_id,
+            "patient_id": patient_id,
+            "name": name,
+            "name_key": medicine_key(name),
+            "dosage": _text(m["dosage"]),
+            "duration": _text(m["duration"]),
+            "prescribed_at": prescribed_at,
+        })
+    return rows
+
+
+def _index(connection, p: Prescription):
+    rows = medicine_rows(p.id, p.patient_id, p.created_at, p.medicines)
+    if rows:
+        connection.execute(insert(PrescriptionMedicine), rows)
+
+
+def _unindex(connection, prescription_id: int):
+    connection.execute(delete(PrescriptionMedicine).where(PrescriptionMedicine.prescription_id == prescription_id))
+
+
+# Mapper events run on the flush's connection, so the side table commits
+# (or rolls back) together with the prescription itself.
+@event.listens_for(Prescription, "after_insert")
+def _index_insert(mapper, connection, target):
+    _index(connection, target)
+
+
+@event.listens_for(Prescription, "after_update")
+def _index_update(mapper, connection, target):
+    _unindex(connection, target.id)
+    _index(connection, target)
+
+
+@event.listens_for(Prescription, "before_delete")
+def _index_delete(mapper, connection, target):
+    # before the parent row goes, so the FK holds even without ON DELETE CASCADE
+    _unindex(connection, target.id)
+
+
+def backfill_medicine_index(engine, batch_size: int = BACKFILL_BATCH_SIZE, progress=None) -> int:
+    """
+    Index prescriptions that have no prescription_medicines rows yet, in
+    id order, one transaction per batch. Safe to re-run or interrupt.
+    Returns the number of prescriptions indexed.
+    """
+    indexed = exists().where(PrescriptionMedicine.prescription_id == Prescription.id)
+    last_id, done = 0, 0
+    while True:
+        with engine.begin() as conn:
+            batch = conn.execute(
+                select(Prescription.id, Prescription.patient_id, Prescription.created_at, Prescription.medicines)
+                .where(Prescription.id > last_id, ~indexed)
+                .order_by(Prescription.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                return done
+            rows = [
+                row
+                for p in batch
+                for row in medicine_rows(p.id, p.patient_id, p.created_at, p.medicines)
+            ]
+            if rows:
+                conn.execute(insert(PrescriptionMedicine), rows)
+        last_id = batch[-1].id
+        done += len(batch)
+        if progress:
+            progress(done)
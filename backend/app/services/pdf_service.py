@@ -1,15 +1,225 @@
 # PDF Generation Service for prescriptions and invoices
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import hashlib
+import io
+import os
+import threading
+from xml.sax.saxutils import escape
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from app.cache import TTLCache
+from app.services.export_service import flatten_medicines
+
+# bump when the layout changes so cached PDFs and client ETags are invalidated
+TEMPLATE_VERSION = "1"
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class PDFTemplate:
+    """
+    Everything that is the same for every document: fonts, paragraph
+    styles, the decoded logo and the letterhead text. Built once per
+    process; building styles and registering TTF fonts is the expensive
+    part of a small document.
+    """
+
+    def __init__(self):
+        self.font, self.bold_font = "Helvetica", "Helvetica-Bold"
+        font_path = os.getenv("PDF_FONT_PATH")
+        if font_path:
+            pdfmetrics.registerFont(TTFont("ClinicFont", font_path))
+            bold_path = os.getenv("PDF_BOLD_FONT_PATH", font_path)
+            pdfmetrics.registerFont(TTFont("ClinicFont-Bold", bold_path))
+            self.font, self.bold_font = "ClinicFont", "ClinicFont-Bold"
+
+        base = getSampleStyleSheet()
+        self.styles = {
+            "title": ParagraphStyle("title", parent=base["Title"], fontName=self.bold_font, fontSize=16, spaceAfter=4 * mm),
+            "heading": ParagraphStyle("heading", parent=base["Heading3"], fontName=self.bold_font, spaceBefore=4 * mm),
+            "body": ParagraphStyle("body", parent=base["BodyText"], fontName=self.font, fontSize=10, leading=14),
+            "small": ParagraphStyle("small", parent=base["BodyText"], fontName=self.font, fontSize=8, textColor=colors.grey),
+        }
+        self.table_style = TableStyle([
+            ("FONTNAME", (0, 0), (-1, 0), self.bold_font),
+            ("FONTNAME", (0, 1), (-1, -1), self.font),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8f1fb")),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#b0bec5")),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ])
+
+        self.clinic_name = os.getenv("CLINIC_NAME", "Clinic")
+        self.clinic_lines = [
+            line for line in (os.getenv("CLINIC_ADDRESS"), os.getenv("CLINIC_PHONE")) if line
+        ]
+        logo_path = os.getenv("PDF_LOGO_PATH")
+        self.logo = ImageReader(logo_path) if logo_path else None
+
+    def letterhead(self, canvas, doc):
+        width, height = doc.pagesize
+        top = height - 15 * mm
+        canvas.saveState()
+        x = doc.leftMargin
+        if self.logo is not None:
+            canvas.drawImage(self.logo, x, top - 14 * mm, width=14 * mm, height=14 * mm, preserveAspectRatio=True, mask="auto")
+            x += 18 * mm
+        canvas.setFont(self.bold_font, 14)
+        canvas.drawString(x, top - 5 * mm, self.clinic_name)
+        canvas.setFont(self.font, 8)
+        for i, line in enumerate(self.clinic_lines):
+            canvas.drawString(x, top - (10 + 4 * i) * mm, line)
+        canvas.setStrokeColor(colors.HexColor("#1976d2"))
+        canvas.setLineWidth(1)
+        canvas.line(doc.leftMargin, top - 17 * mm, width - doc.rightMargin, top - 17 * mm)
+        canvas.setFont(self.font, 7)
+        canvas.setFillColor(colors.grey)
+        canvas.drawRightString(width - doc.rightMargin, 10 * mm, f"Page {doc.page}")
+        canvas.restoreState()
+
 
 class PDFService:
-    def generate_prescription_pdf(self, prescription_data):
+    """
+    Renders prescriptions and invoices. generate_* methods are CPU-bound
+    and meant for the threadpool; response() wraps them with ETag handling and
+    an LRU of rendered documents so a re-print neither re-renders nor,
+    when the client still has it, re-downloads.
+    """
+
+    def __init__(self):
+        self._template = None
+        self._lock = threading.Lock()
+        self._rendered = TTLCache(
+            maxsize=int(os.getenv("PDF_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("PDF_CACHE_TTL", "3600"))
+        )
+
+    @property
+    def template(self) -> PDFTemplate:
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    self._template = PDFTemplate()
+        return self._template
+
+    def _build(self, title: str, story: list) -> bytes:
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            title=title,
+            topMargin=40 * mm,
+            bottomMargin=18 * mm,
+            leftMargin=18 * mm,
+            rightMargin=18 * mm,
+            invariant=1   # byte-identical output for identical input
+        )
+        letterhead = self.template.letterhead
+        doc.build(story, onFirstPage=letterhead, onLaterPages=letterhead)
+        return buffer.getvalue()
+
+    def _patient_block(self, data: dict) -> list:
+        t = self.template
+        details = [f"<b>Patient:</b> {escape(data.get('patient_name') or '-')}"]
+        if data.get("age") is not None:
+            details.append(f"<b>Age:</b> {data['age']}")
+        if data.get("gender"):
+            details.append(f"<b>Gender:</b> {escape(data['gender'])}")
+        date = data.get("created_at")
+        details.append(f"<b>Date:</b> {date.strftime('%d %b %Y') if date else '-'}")
+        return [Paragraph(" &nbsp;&nbsp; ".join(details), t.styles["body"])]
+
+    def generate_prescription_pdf(self, prescription_data: dict) -> bytes:
         # Generate prescription PDF
-        pass
-    
-    def generate_invoice_pdf(self, bill_data):
+        t = self.template
+        story = [Paragraph(f"Prescription #{prescription_data['id']}", t.styles["title"])]
+        story += self._patient_block(prescription_data)
+        story.append(Paragraph("Diagnosis", t.styles["heading"]))
+        story.append(Paragraph(escape(prescription_data.get("diagnosis") or "-"), t.styles["body"]))
+        story.append(Paragraph("Rx", t.styles["heading"]))
+        rows = [["#", "Medicine", "Dosage", "Duration"]]
+        for i, m in enumerate(flatten_medicines(prescription_data.get("medicines")), start=1):
+            rows.append([str(i)] + [str(m[k]) if m[k] is not None else "" for k in ("medicine", "dosage", "duration")])
+        story.append(Table(rows, colWidths=[10 * mm, 70 * mm, 50 * mm, 40 * mm], style=t.table_style, repeatRows=1))
+        if prescription_data.get("notes"):
+            story.append(Paragraph("Notes", t.styles["heading"]))
+            story.append(Paragraph(escape(prescription_data["notes"]).replace("\n", "<br/>"), t.styles["body"]))
+        story += [Spacer(1, 20 * mm), Paragraph("Doctor's signature", t.styles["small"])]
+        return self._build(f"Prescription {prescription_data['id']}", story)
+
+    def generate_invoice_pdf(self, bill_data: dict) -> bytes:
         # Generate invoice PDF
-        pass
+        t = self.template
+        story = [Paragraph(f"Invoice #{bill_data['id']}", t.styles["title"])]
+        story += self._patient_block(bill_data)
+        rows = [
+            ["Description", "Amount"],
+            ["Consultation and services", f"{bill_data['amount']:.2f}"],
+            ["Total", f"{bill_data['amount']:.2f}"],
+        ]
+        style = TableStyle(t.table_style.getCommands() + [
+            ("FONTNAME", (0, -1), (-1, -1), t.bold_font),
+            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+        ])
+        story += [Spacer(1, 6 * mm), Table(rows, colWidths=[120 * mm, 50 * mm], style=style)]
+        story.append(Paragraph(f"<b>Status:</b> {escape((bill_data.get('status') or 'unpaid').title())}", t.styles["body"]))
+        return self._build(f"Invoice {bill_data['id']}", story)
+
+    @staticmethod
+    def etag(kind: str, record_id: int, updated_at) -> str:
+        version = f"{kind}:{record_id}:{updated_at.isoformat() if updated_at else ''}:{TEMPLATE_VERSION}"
+        return '"' + hashlib.sha1(version.encode()).hexdigest() + '"'
+
+    async def response(self, request, etag: str, filename: str, render, data: dict):
+        """
+        304 if the client's copy is current; otherwise the cached or freshly
+        rendered (off the event loop) document, streamed in chunks.
+        """
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        pdf = self._rendered.get(etag)
+        if pdf is None:
+            pdf = await run_in_threadpool(render, data)
+            self._rendered.set(etag, pdf)
+
+        def chunks():
+            for start in range(0, len(pdf), STREAM_CHUNK_BYTES):
+                yield pdf[start:start + STREAM_CHUNK_BYTES]
+
+        headers["Content-Length"] = str(len(pdf))
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+        return StreamingResponse(chunks(), media_type="application/pdf", headers=headers)
+
+
+pdf_service = PDFService()
+
+
+# ---- process-pool entry point (module level so it can be pickled) ----
 
+_worker_service = None
 
 
+def render_document(kind: str, data: dict):
+    """
+    Render one document in a worker process; the worker keeps its own
+    PDFService, so the template is built once per process.
+    Returns (archive name, pdf bytes or None, error or None).
+    """
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = PDFService()
+    name = f"{kind}s/{kind}-{data['id']}.pdf"
+    render = _worker_service.generate_invoice_pdf if kind == "invoice" else _worker_service.generate_prescription_pdf
+    try:
+        return name, render(data), None
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {e}"
@@ -1,26 +1,364 @@
 # Redis Service for queue management and ETA calculation
-import redis
+import bisect
+import json
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
 
 load_dotenv()
 
+TOKEN_COUNTER_KEY = "queue:token_counter"
+WAITING_QUEUE_KEY = "queue:waiting"
+TOKEN_DATA_KEY = "queue:token:{}"
+DURATIONS_KEY = "queue:durations:{}"
+DURATIONS_SUM_KEY = "queue:durations_sum:{}"
+LAST_CALLED_KEY = "queue:last_called:{}"
+ACTIVE_DOCTORS_KEY = "queue:active_doctors"
+
+SERVICE_TIME_WINDOW = int(os.getenv("QUEUE_SERVICE_TIME_WINDOW", "50"))
+DEFAULT_SERVICE_SECONDS = float(os.getenv("QUEUE_DEFAULT_SERVICE_MINUTES", "10")) * 60
+# a doctor who called a patient in this window counts as seeing the unassigned queue
+ACTIVE_DOCTOR_SECONDS = float(os.getenv("QUEUE_ACTIVE_DOCTOR_MINUTES", "60")) * 60
+
+# Push a duration onto a capped list while keeping a running sum, atomically
+RECORD_DURATION_SCRIPT = """
+local n = redis.call('LPUSH', KEYS[1], ARGV[1])
+redis.call('INCRBYFLOAT', KEYS[2], ARGV[1])
+if n > tonumber(ARGV[2]) then
+    local old = redis.call('RPOP', KEYS[1])
+    redis.call('INCRBYFLOAT', KEYS[2], -tonumber(old))
+end
+return n
+"""
+
+
+def estimator_key(doctor_id=None) -> str:
+    return "clinic" if doctor_id is None else f"doctor:{doctor_id}"
+
+
+def waiting_key(doctor_id=None) -> str:
+    """
+    Every waiting token is in the clinic-wide set; assigned ones are also
+    in their doctor's set, which is what their position is counted in.
+    """
+    return WAITING_QUEUE_KEY if doctor_id is None else f"{WAITING_QUEUE_KEY}:{estimator_key(doctor_id)}"
+
+
+class ServiceTimeEstimator:
+    """
+    Rolling mean of the last `window` consultation durations.
+    A running sum is kept alongside the window so reads are O(1).
+    """
+
+    def __init__(self, window: int = SERVICE_TIME_WINDOW):
+        self._durations = deque(maxlen=window)
+        self._sum = 0.0
+        self.last_called_at = None
+
+    def record(self, seconds: float):
+        if len(self._durations) == self._durations.maxlen:
+            self._sum -= self._durations[0]
+        self._durations.append(seconds)
+        self._sum += seconds
+
+    def mean(self):
+        if not self._durations:
+            return None
+        return self._sum / len(self._durations)
+
+
+class _SortedSet:
+    def __init__(self):
+        self.entries = []       # sorted list of (score, member)
+        self.scores = {}        # member -> score
+
+    def add(self, member: str, score: float):
+        self.remove(member)
+        bisect.insort(self.entries, (score, member))
+        self.scores[member] = score
+
+    def remove(self, member: str):
+        score = self.scores.pop(member, None)
+        if score is not None:
+            del self.entries[bisect.bisect_left(self.entries, (score, member))]
+
+    def rank(self, member: str):
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.entries, (score, member))
+
+
+class LocalQueueStore:
+    """
+    In-process stand-in for the Redis structures used by RedisService:
+    an integer counter and sorted sets kept as sorted lists, so rank
+    lookups are a binary search. Only safe within a single worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = None
+        self._sets = {}         # waiting key -> _SortedSet
+        self._data = {}         # member -> json payload
+        self._estimators = {}   # estimator key -> ServiceTimeEstimator
+
+    def has_counter(self) -> bool:
+        with self._lock:
+            return self._counter is not None
+
+    def incr_counter(self, seed) -> int:
+        with self._lock:
+            if self._counter is None:
+                self._counter = seed()
+            self._counter += 1
+            return self._counter
+
+    def add(self, keys, member: str, score: float, payload: str):
+        with self._lock:
+            for key in keys:
+                self._sets.setdefault(key, _SortedSet()).add(member, score)
+            self._data[member] = payload
+
+    def remove(self, keys, member: str):
+        with self._lock:
+            for key in keys:
+                if key in self._sets:
+                    self._sets[key].remove(member)
+            self._data.pop(member, None)
+
+    def rank(self, key: str, member: str):
+        with self._lock:
+            return self._sets[key].rank(member) if key in self._sets else None
+
+    def size(self, key: str) -> int:
+        with self._lock:
+            return len(self._sets[key].entries) if key in self._sets else 0
+
+    def get(self, member: str):
+        with self._lock:
+            return self._data.get(member)
+
+    def estimator(self, key: str) -> ServiceTimeEstimator:
+        with self._lock:
+            return self._estimator_locked(key)
+
+    def record_duration(self, key: str, seconds: float):
+        with self._lock:
+            self._estimator_locked(key).record(seconds)
+
+    def _estimator_locked(self, key: str) -> ServiceTimeEstimator:
+        if key not in self._estimators:
+            self._estimators[key] = ServiceTimeEstimator()
+        return self._estimators[key]
+
+    def active_doctors(self, since: float) -> int:
+        with self._lock:
+            return sum(
+                1 for key, e in self._estimators.items()
+                if key != estimator_key() and e.last_called_at is not None and e.last_called_at >= since
+            )
+
+
 class RedisService:
+    """
+    Queue bookkeeping for token allocation and position lookups.
+
+    Token numbers come from an atomic counter (Redis INCR) and waiting
+    appointments live in sorted sets scored by token number (clinic-wide
+    and per doctor), so position is an O(log n) rank query. Consultation
+    durations feed capped windows with running sums, so ETA reads never
+    scan history. The SQL queue_tokens table remains the durable record;
+    the counter is seeded from it on first use and the sorted sets can be
+    rebuilt from it with restore_queue. Without REDIS_URL an in-process
+    LocalQueueStore is used instead.
+    """
+
     def __init__(self):
-        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        self.client = redis.from_url(self.redis_url)
-    
-    def add_to_queue(self, appointment_id, data):
-        # Add appointment to queue
-        pass
-    
-    def get_queue_position(self, appointment_id):
-        # Get queue position
-        pass
-    
-    def calculate_eta(self, token_number):
-        # Calculate estimated wait time
-        pass
+        self.redis_url = os.getenv("REDIS_URL")
+        if self.redis_url:
+            import redis
+            self.client = redis.from_url(self.redis_url)
+            self.local = None
+            self._record_duration = self.client.register_script(RECORD_DURATION_SCRIPT)
+        else:
+            self.client = None
+            self.local = LocalQueueStore()
+
+    async def call(self, fn, *args):
+        """
+        Run one of these (blocking) methods from async code: on the
+        threadpool when it talks to Redis, inline for the in-process store.
+        """
+        if self.client is None:
+            return fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+    def has_token_counter(self) -> bool:
+        if self.client is None:
+            return self.local.has_counter()
+        return bool(self.client.exists(TOKEN_COUNTER_KEY))
+
+    def next_token_number(self, seed) -> int:
+        """
+        Atomically allocate the next token number.
+        seed() returns the highest number already issued and is only called
+        when the counter does not exist yet.
+        """
+        if self.client is None:
+            return self.local.incr_counter(seed)
+        if not self.client.exists(TOKEN_COUNTER_KEY):
+            # NX keeps a concurrent seeder from rolling the counter back
+            self.client.set(TOKEN_COUNTER_KEY, seed(), nx=True)
+        return int(self.client.incr(TOKEN_COUNTER_KEY))
+
+    def add_to_queue(self, appointment_id, data, doctor_id=None):
+        member = str(appointment_id)
+        payload = json.dumps(data)
+        score = data["token_number"]
+        keys = {waiting_key(), waiting_key(doctor_id)}
+        if self.client is None:
+            self.local.add(keys, member, score, payload)
+            return
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.zadd(key, {member: score})
+        pipe.set(TOKEN_DATA_KEY.format(member), payload)
+        pipe.execute()
+
+    def remove_from_queue(self, appointment_id, doctor_id=None):
+        member = str(appointment_id)
+        keys = {waiting_key(), waiting_key(doctor_id)}
+        if self.client is None:
+            self.local.remove(keys, member)
+            return
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.zrem(key, member)
+        pipe.delete(TOKEN_DATA_KEY.format(member))
+        pipe.execute()
+
+    def restore_queue(self, entries):
+        """
+        Rebuild the waiting sets from (appointment_id, data, doctor_id)
+        tuples loaded from SQL.
+        """
+        for appointment_id, data, doctor_id in entries:
+            self.add_to_queue(appointment_id, data, doctor_id)
+
+    def get_queue_position(self, appointment_id, doctor_id=None):
+        """
+        1-based position among the doctor's waiting appointments (the whole
+        clinic's for unassigned ones), or None if not waiting.
+        """
+        member = str(appointment_id)
+        if self.client is None:
+            rank = self.local.rank(waiting_key(doctor_id), member)
+        else:
+            rank = self.client.zrank(waiting_key(doctor_id), member)
+        return None if rank is None else rank + 1
+
+    def queue_length(self, doctor_id=None) -> int:
+        if self.client is None:
+            return self.local.size(waiting_key(doctor_id))
+        return int(self.client.zcard(waiting_key(doctor_id)))
+
+    def mark_called(self, called_at: float, doctor_id=None):
+        """
+        Note when a patient was last called in, for the remaining-time
+        estimate, and that the doctor is currently seeing patients.
+        """
+        for key in {estimator_key(), estimator_key(doctor_id)}:
+            if self.client is None:
+                self.local.estimator(key).last_called_at = called_at
+            else:
+                self.client.set(LAST_CALLED_KEY.format(key), called_at)
+        if doctor_id is not None and self.client is not None:
+            pipe = self.client.pipeline()
+            pipe.zadd(ACTIVE_DOCTORS_KEY, {str(doctor_id): called_at})
+            pipe.zremrangebyscore(ACTIVE_DOCTORS_KEY, "-inf", called_at - ACTIVE_DOCTOR_SECONDS)
+            pipe.execute()
+
+    def active_doctors(self) -> int:
+        """
+        Doctors who called a patient within QUEUE_ACTIVE_DOCTOR_MINUTES (at least 1).
+        """
+        since = time.time() - ACTIVE_DOCTOR_SECONDS
+        if self.client is None:
+            count = self.local.active_doctors(since)
+        else:
+            count = self.client.zcount(ACTIVE_DOCTORS_KEY, since, "+inf")
+        return max(1, int(count))
+
+    def record_service_time(self, seconds: float, doctor_id=None):
+        """
+        Feed a measured consultation duration into the clinic-wide window
+        and, when known, the doctor's own window.
+        """
+        for key in {estimator_key(), estimator_key(doctor_id)}:
+            if self.client is None:
+                self.local.record_duration(key, seconds)
+            else:
+                self._record_duration(
+                    keys=[DURATIONS_KEY.format(key), DURATIONS_SUM_KEY.format(key)],
+                    args=[seconds, SERVICE_TIME_WINDOW]
+                )
+
+    def has_service_times(self) -> bool:
+        return self._mean_for(estimator_key()) is not None
+
+    def _mean_for(self, key: str):
+        if self.client is None:
+            return self.local.estimator(key).mean()
+        pipe = self.client.pipeline()
+        pipe.llen(DURATIONS_KEY.format(key))
+        pipe.get(DURATIONS_SUM_KEY.format(key))
+        count, total = pipe.execute()
+        return float(total) / count if count else None
+
+    def _last_called_for(self, key: str):
+        if self.client is None:
+            return self.local.estimator(key).last_called_at
+        value = self.client.get(LAST_CALLED_KEY.format(key))
+        return float(value) if value is not None else None
+
+    def mean_service_time(self, doctor_id=None) -> float:
+        """
+        Rolling mean consultation time in seconds: the doctor's own window if
+        it has data, else the clinic's, else the configured default.
+        """
+        for key in (estimator_key(doctor_id), estimator_key()):
+            mean = self._mean_for(key)
+            if mean is not None:
+                return mean
+        return DEFAULT_SERVICE_SECONDS
 
+    def calculate_eta(self, appointment_id, doctor_id=None):
+        """
+        Estimated seconds until the appointment is called, or None if it is
+        not waiting. An assigned appointment waits for the patients ahead of
+        it in its doctor's queue, each taking that doctor's rolling mean; an
+        unassigned one is ranked clinic-wide and the active doctors work
+        through that queue in parallel. The patient currently being seen is
+        assumed to need whatever is left of one consultation.
+        """
+        position = self.get_queue_position(appointment_id, doctor_id)
+        if position is None:
+            return None
+        mean = self.mean_service_time(doctor_id)
+        step = mean if doctor_id is not None else mean / self.active_doctors()
+        remaining = step
+        last_called = self._last_called_for(estimator_key(doctor_id))
+        if last_called is not None:
+            remaining = max(0.0, step - (time.time() - last_called))
+        return {
+            "position": position,
+            "avg_service_seconds": mean,
+            "eta_seconds": (position - 1) * step + remaining
+        }
 
 
+redis_service = RedisService()
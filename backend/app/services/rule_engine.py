@@ -0,0 +1,202 @@
+# Data-driven prescription rules compiled into an Aho-Corasick matcher
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "prescription_rules.json")
+RULES_RELOAD_INTERVAL = float(os.getenv("PRESCRIPTION_RULES_RELOAD_INTERVAL", "2"))
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lower-case and collapse every run of non-word characters to one space,
+    padded so that word boundaries are simply spaces.
+    """
+    return f" {' '.join(_NON_WORD.sub(' ', text.lower()).split())} "
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every occurrence of
+    every pattern, in O(len(text) + matches) regardless of pattern count.
+    Patterns are mapped to arbitrary values (here, rule indexes).
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]       # state -> {char: state}
+        self._fail = [0]
+        self._out = [[]]        # state -> [(pattern length, value)]
+        for pattern, value in patterns:
+            self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append((len(pattern), value))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text: str):
+        """
+        Yield (end index, pattern length, value) for each occurrence.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, value in out[state]:
+                yield i, length, value
+
+
+class RuleSet:
+    """
+    Rules compiled once. A rule matches when any of its patterns occurs as
+    whole words in the diagnosis/symptom text; a pattern ending in "*" also
+    matches longer words ("fever*" covers "fevers", "feverish"). Matches are
+    returned by descending priority (file order breaks ties). A matched rule
+    with "stop": true hides every lower-priority match.
+
+    A rule's optional "examples" are texts it must match; one that does not
+    fails the load, so a pattern edit cannot silently drop known inputs.
+    """
+
+    def __init__(self, data: dict):
+        self.default = data.get("default", [])
+        self.rules = []
+        patterns = []
+        for order, raw in enumerate(data.get("rules", [])):
+            rule = {
+                "id": raw.get("id", str(order)),
+                "priority": int(raw.get("priority", 0)),
+                "order": order,
+                "stop": bool(raw.get("stop", False)),
+                "medicines": raw["medicines"],
+            }
+            index = len(self.rules)
+            self.rules.append(rule)
+            for pattern in raw["patterns"]:
+                prefix = pattern.rstrip().endswith("*")
+                normalized = normalize_text(pattern).strip()
+                if normalized:
+                    # match " pattern " so only whole words count; without the
+                    # trailing space, words that merely start with it count too
+                    patterns.append((f" {normalized}" if prefix else f" {normalized} ", index))
+        self._matcher = AhoCorasick(patterns)
+        for index, raw in enumerate(data.get("rules", [])):
+            for example in raw.get("examples", []):
+                if index not in self._hits(example):
+                    raise ValueError(f"rule {self.rules[index]['id']!r} does not match its example {example!r}")
+
+    def _hits(self, text: str) -> set[int]:
+        return {value for _, _, value in self._matcher.iter(normalize_text(text))}
+
+    def match(self, text: str) -> list[dict]:
+        hits = self._hits(text)
+        matched = sorted((self.rules[i] for i in hits), key=lambda r: (-r["priority"], r["order"]))
+        for n, rule in enumerate(matched):
+            if rule["stop"]:
+                return matched[:n + 1]
+        return matched
+
+    def medicines(self, text: str) -> list[dict]:
+        """
+        Medicines of every matched rule, highest priority first and
+        de-duplicated by name; the default list when nothing matches.
+        """
+        seen, medicines = set(), []
+        for rule in self.match(text):
+            for medicine in rule["medicines"]:
+                key = medicine["name"].lower()
+                if key not in seen:
+                    seen.add(key)
+                    medicines.append(dict(medicine))
+        return medicines or [dict(m) for m in self.default]
+
+
+class PrescriptionRuleEngine:
+    """
+    Loads the rules file and recompiles it when its mtime changes (checked
+    at most every RULES_RELOAD_INTERVAL seconds, on use). A file that fails
+    to load leaves the previous rules in place and is reported in stats().
+    """
+
+    def __init__(self, path: str | None = None, reload_interval: float = RULES_RELOAD_INTERVAL):
+        self.path = path or os.getenv("PRESCRIPTION_RULES_PATH", DEFAULT_RULES_PATH)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._ruleset = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.last_error = None
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Recompile if the file changed (or force); returns True when reloaded.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if not force and mtime == self._mtime:
+                    return False
+                with open(self.path, encoding="utf-8") as f:
+                    ruleset = RuleSet(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if self._ruleset is None:
+                    self._ruleset = RuleSet({})
+                return False
+            self._ruleset, self._mtime = ruleset, mtime
+            self.loaded_at = time.time()
+            self.last_error = None
+            return True
+
+    def _current(self) -> RuleSet:
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self._ruleset
+
+    def medicines(self, text: str) -> list[dict]:
+        return self._current().medicines(text)
+
+    def match(self, text: str) -> list[dict]:
+        return self._current().match(text)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "rules": len(self._ruleset.rules),
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+        }
+
+
+prescription_rules = PrescriptionRuleEngine()
@@ -0,0 +1,185 @@
+# Patient search index: FTS5 on SQLite, pg_trgm on Postgres
+import re
+from sqlalchemy import event, text, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Patient
+
+NON_DIGITS = re.compile(r"\D")
+PHONE_QUERY = re.compile(r"^[\d\s()+\-.]+$")
+WORD = re.compile(r"\w")
+REBUILD_BATCH_SIZE = 5000
+FTS_QUERY = text(
+    "SELECT rowid FROM patient_search WHERE patient_search MATCH :match "
+    "ORDER BY bm25(patient_search), rowid LIMIT :limit"
+)
+
+
+def normalize_phone(phone: str | None) -> str:
+    return NON_DIGITS.sub("", phone or "")
+
+
+def name_prefix(prefix: str):
+    """
+    Patient.name LIKE 'prefix%' with the pattern as one bound value; SQLite
+    only uses an index for LIKE when the pattern is not an expression
+    (startswith() renders `:p || '%'`).
+    """
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return Patient.name.like(escaped + "%", escape="\\")
+
+
+class PatientSearchService:
+    """
+    Type-ahead patient lookup by name prefix or phone-digit prefix.
+
+    SQLite keeps a patient_search FTS5 table (rowid = patients.id) in sync
+    through mapper events; Postgres relies on a pg_trgm GIN index on
+    lower(name) and a text_pattern_ops index on the phone digits, both
+    maintained by the database itself. Both also get an index serving the
+    list endpoint's `name LIKE 'prefix%'` filter (see name_prefix).
+    """
+
+    def ensure_index(self, engine):
+        dialect = engine.dialect.name
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                # LIKE is case-insensitive on SQLite, so only a NOCASE index can serve it
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_name_nocase ON patients (name COLLATE NOCASE)"
+                ))
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'patient_search'"
+                )).first()
+                if exists:
+                    return
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE patient_search USING fts5("
+                    "name, phone_digits, tokenize = 'unicode61', prefix = '1 2 3')"
+                ))
+                self._rebuild_sqlite(conn)
+            elif dialect == "postgresql":
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_name_pattern ON patients (name text_pattern_ops)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_name_trgm "
+                    "ON patients USING gin (lower(name) gin_trgm_ops)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_patients_phone_digits "
+                    "ON patients ((regexp_replace(phone, '\\D', '', 'g')) text_pattern_ops)"
+                ))
+
+    def _rebuild_sqlite(self, conn):
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, name, phone FROM patients WHERE id > :last ORDER BY id LIMIT :n"),
+                {"last": last_id, "n": REBUILD_BATCH_SIZE}
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                text("INSERT INTO patient_search (rowid, name, phone_digits) VALUES (:id, :name, :digits)"),
+                [{"id": r.id, "name": r.name, "digits": normalize_phone(r.phone)} for r in rows]
+            )
+            last_id = rows[-1].id
+
+    async def search(self, db: AsyncSession, q: str, limit: int = 20):
+        q = q.strip()
+        if not q:
+            return []
+        dialect = db.bind.dialect.name
+        is_phone = bool(PHONE_QUERY.match(q)) and bool(normalize_phone(q))
+        if dialect == "sqlite":
+            return await self._search_sqlite(db, q, is_phone, limit)
+        if dialect == "postgresql":
+            stmt = self._postgres_query(q, is_phone, limit)
+        else:
+            stmt = self._generic_query(q, is_phone, limit)
+        return (await db.scalars(stmt)).all()
+
+    @staticmethod
+    def fts_match(q: str, is_phone: bool) -> str | None:
+        """
+        FTS5 query for q, or None when q has nothing the tokenizer would index.
+        """
+        if is_phone:
+            return f'phone_digits : "{normalize_phone(q)}"*'
+        # terms without a letter or digit tokenize to nothing, and "()" is a syntax error
+        terms = [t.replace('"', '""') for t in q.split() if WORD.search(t)]
+        if not terms:
+            return None
+        return "name : (" + " AND ".join(f'"{t}"*' for t in terms) + ")"
+
+    async def _search_sqlite(self, db: AsyncSession, q: str, is_phone: bool, limit: int):
+        match = self.fts_match(q, is_phone)
+        if match is None:
+            return []
+        ids = (await db.execute(FTS_QUERY, {"match": match, "limit": limit})).scalars().all()
+        if not ids:
+            return []
+        by_id = {p.id: p for p in (await db.scalars(select(Patient).where(Patient.id.in_(ids)))).all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def _postgres_query(self, q: str, is_phone: bool, limit: int):
+        if is_phone:
+            # inline constants so the expression matches ix_patients_phone_digits
+            digits = func.regexp_replace(
+                Patient.phone, literal_column(r"'\D'"), literal_column("''"), literal_column("'g'")
+            )
+            return (
+                select(Patient)
+                .where(digits.like(normalize_phone(q) + "%"))
+                .order_by(func.length(digits), Patient.id)
+                .limit(limit)
+            )
+        name = func.lower(Patient.name)
+        needle = q.lower()
+        return (
+            select(Patient)
+            .where(or_(name.like(needle + "%"), name.op("%")(needle)))
+            .order_by(name.like(needle + "%").desc(), func.similarity(name, needle).desc(), Patient.id)
+            .limit(limit)
+        )
+
+    def _generic_query(self, q: str, is_phone: bool, limit: int):
+        stmt = select(Patient)
+        if is_phone:
+            stmt = stmt.where(Patient.phone.startswith(q))
+        else:
+            stmt = stmt.where(Patient.name.ilike(q + "%"))
+        return stmt.order_by(Patient.id).limit(limit)
+
+
+def _is_sqlite(connection) -> bool:
+    return connection.dialect.name == "sqlite"
+
+
+@event.listens_for(Patient, "after_insert")
+def _index_patient(mapper, connection, target):
+    if _is_sqlite(connection):
+        connection.execute(
+            text("INSERT INTO patient_search (rowid, name, phone_digits) VALUES (:id, :name, :digits)"),
+            {"id": target.id, "name": target.name, "digits": normalize_phone(target.phone)}
+        )
+
+
+@event.listens_for(Patient, "after_update")
+def _reindex_patient(mapper, connection, target):
+    if _is_sqlite(connection):
+        connection.execute(
+            text("UPDATE patient_search SET name = :name, phone_digits = :digits WHERE rowid = :id"),
+            {"id": target.id, "name": target.name, "digits": normalize_phone(target.phone)}
+        )
+
+
+@event.listens_for(Patient, "after_delete")
+def _unindex_patient(mapper, connection, target):
+    if _is_sqlite(connection):
+        connection.execute(text("DELETE FROM patient_search WHERE rowid = :id"), {"id": target.id})
+
+
+patient_search = PatientSearchService()
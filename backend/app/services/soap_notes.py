@@ -0,0 +1,86 @@
+# SOAP note generation for AINote, run as background jobs
+import json
+import re
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.models import AINote
+from app.services.ai_service import ai_service
+from app.services.job_queue import job_queue
+
+SOAP_SECTIONS = ("subjective", "objective", "assessment", "plan")
+SOAP_JOB = "soap"
+
+_HEADING = re.compile(r"^\s*(?:\*\*|#+\s*)?(subjective|objective|assessment|plan)\b\W*", re.IGNORECASE | re.MULTILINE)
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_soap(text: str) -> dict:
+    """
+    Model output -> {subjective, objective, assessment, plan}: a JSON object
+    if the model returned one, else sections split on their headings, else
+    the raw text under "text".
+    """
+    cleaned = _FENCE.sub("", text.strip())
+    try:
+        data = json.loads(cleaned)
+        if isinstance(data, dict):
+            return {k: str(data.get(k) or "") for k in SOAP_SECTIONS}
+    except ValueError:
+        pass
+    headings = list(_HEADING.finditer(cleaned))
+    if headings:
+        sections = dict.fromkeys(SOAP_SECTIONS, "")
+        for m, nxt in zip(headings, headings[1:] + [None]):
+            body = cleaned[m.end(): nxt.start() if nxt else len(cleaned)]
+            sections[m.group(1).lower()] = body.strip()
+        return sections
+    return {**dict.fromkeys(SOAP_SECTIONS, ""), "text": cleaned}
+
+
+def fallback_soap(transcript: str) -> dict:
+    """
+    Without an AI key the transcript is filed as the subjective section for
+    the doctor to complete.
+    """
+    return {**dict.fromkeys(SOAP_SECTIONS, ""), "subjective": transcript.strip()}
+
+
+async def _saved_note(db, job_id: int) -> AINote | None:
+    return await db.scalar(select(AINote).where(AINote.job_id == job_id))
+
+
+async def run_soap_job(payload: dict, job_id: int) -> dict:
+    """
+    Generate and save the note; a retry of a job whose note was already
+    saved returns that note instead of generating a second one.
+    """
+    async with AsyncSessionLocal() as db:
+        note = await _saved_note(db, job_id)
+    if note is not None:
+        return {"note_id": note.id, "summary": note.structured_summary}
+    transcript = payload["transcript"]
+    if ai_service.enabled:
+        summary = parse_soap(await ai_service.generate_soap_notes(transcript))
+        summary["generated_by"] = "ai"
+    else:
+        summary = fallback_soap(transcript)
+        summary["generated_by"] = "fallback"
+    async with AsyncSessionLocal() as db:
+        note = AINote(patient_id=payload["patient_id"], transcript=transcript, structured_summary=summary, job_id=job_id)
+        db.add(note)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # a concurrent run of the same job (its lease expired) saved first
+            await db.rollback()
+            note = await _saved_note(db, job_id)
+            if note is None:
+                raise
+            summary = note.structured_summary
+        return {"note_id": note.id, "summary": summary}
+
+
+job_queue.register(SOAP_JOB, run_soap_job)
@@ -0,0 +1,246 @@
+# Spooled audio uploads, segmenting, and pluggable transcription backends
+import asyncio
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import aiofiles
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("TRANSCRIBE_MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+SEGMENT_SECONDS = float(os.getenv("TRANSCRIBE_SEGMENT_SECONDS", "30"))
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+WHISPER_MODEL = os.getenv("AI_WHISPER_MODEL", "base")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class TranscriptionUnavailable(Exception):
+    """
+    The configured backend cannot run here (missing key, package or ffmpeg).
+    """
+
+
+async def spool_upload(upload, directory: str, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    Copy an UploadFile to disk in UPLOAD_CHUNK_BYTES chunks; memory use
+    stays at one chunk whatever the recording length.
+    """
+    suffix = os.path.splitext(upload.filename or "")[1] or ".bin"
+    path = os.path.join(directory, f"upload{suffix}")
+    size = 0
+    async with aiofiles.open(path, "wb") as out:
+        while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Recording exceeds {max_bytes // (1024 * 1024)} MB")
+            await out.write(chunk)
+    return path
+
+
+def _as_wav(path: str, directory: str) -> str | None:
+    """
+    Return a WAV version of the file: itself if it already is one,
+    otherwise a 16 kHz mono conversion via ffmpeg, or None without ffmpeg.
+    """
+    try:
+        with wave.open(path, "rb"):
+            return path
+    except (wave.Error, EOFError):
+        pass
+    if shutil.which("ffmpeg") is None:
+        return None
+    out = os.path.join(directory, "converted.wav")
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", path, "-ac", "1", "-ar", "16000", out],
+        check=True
+    )
+    return out
+
+
+def split_audio(path: str, directory: str, seconds: float = SEGMENT_SECONDS) -> list[dict]:
+    """
+    Split a recording into consecutive WAV segments of `seconds` each,
+    streaming frames from disk. Formats that cannot be read as WAV (and
+    cannot be converted) are passed through as a single segment.
+    """
+    wav_path = _as_wav(path, directory)
+    if wav_path is None:
+        return [{"index": 0, "path": path, "start": 0.0, "end": None}]
+    segments = []
+    with wave.open(wav_path, "rb") as source:
+        params = source.getparams()
+        frames_per_segment = max(1, int(params.framerate * seconds))
+        start = 0
+        while True:
+            frames = source.readframes(frames_per_segment)
+            if not frames:
+                break
+            count = len(frames) // (params.sampwidth * params.nchannels)
+            segment_path = os.path.join(directory, f"segment-{len(segments):05d}.wav")
+            with wave.open(segment_path, "wb") as out:
+                out.setparams(params)
+                out.writeframes(frames)
+            segments.append({
+                "index": len(segments),
+                "path": segment_path,
+                "start": round(start / params.framerate, 3),
+                "end": round((start + count) / params.framerate, 3),
+            })
+            start += count
+    return segments
+
+
+# ---- process-pool workers (module level so they can be pickled) ----
+
+_whisper_model = None
+
+
+def _load_whisper(model_name: str):
+    global _whisper_model
+    import whisper
+    if not hasattr(whisper, "load_model"):
+        raise RuntimeError("Local transcription needs the openai-whisper package")
+    _whisper_model = whisper.load_model(model_name)
+
+
+def _whisper_transcribe(path: str) -> str:
+    return _whisper_model.transcribe(path, fp16=False)["text"].strip()
+
+
+def _stub_transcribe(path: str) -> str:
+    try:
+        with wave.open(path, "rb") as w:
+            return f"[{w.getnframes() / w.getframerate():.1f}s of audio]"
+    except (wave.Error, EOFError):
+        return f"[{os.path.getsize(path)} bytes of audio]"
+
+
+class TranscriptionBackend:
+    """
+    Transcribes one segment file. Backends that run on a process pool keep
+    heavy models out of the API process and transcribe segments in parallel.
+    """
+
+    name = "base"
+
+    def check(self):
+        """
+        Raise TranscriptionUnavailable if this backend cannot run.
+        """
+
+    async def transcribe_segment(self, path: str, content_type: str) -> str:
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class ProcessPoolBackend(TranscriptionBackend):
+    def __init__(self, fn, workers: int = TRANSCRIBE_WORKERS, initializer=None, initargs=()):
+        self._fn = fn
+        self._workers = workers
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer,
+                initargs=self._initargs
+            )
+        return self._pool
+
+    async def transcribe_segment(self, path: str, content_type: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._get_pool(), self._fn, path)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class WhisperBackend(ProcessPoolBackend):
+    """
+    Local openai-whisper; each worker process loads the model once.
+    """
+
+    name = "whisper"
+
+    def __init__(self, model_name: str = WHISPER_MODEL, workers: int = TRANSCRIBE_WORKERS):
+        super().__init__(_whisper_transcribe, workers, initializer=_load_whisper, initargs=(model_name,))
+
+    def check(self):
+        if not _whisper_installed():
+            raise TranscriptionUnavailable("Local Whisper unavailable: install openai-whisper.")
+
+
+class StubBackend(ProcessPoolBackend):
+    """
+    Deterministic placeholder text; exercises the pool without a model.
+    """
+
+    name = "stub"
+
+    def __init__(self, workers: int = TRANSCRIBE_WORKERS):
+        super().__init__(_stub_transcribe, workers)
+
+
+class RemoteBackend(TranscriptionBackend):
+    """
+    The OpenAI transcription endpoint via AIService's shared client;
+    concurrency is bounded by the client's semaphore.
+    """
+
+    name = "openai"
+
+    def __init__(self, ai_service):
+        self._ai_service = ai_service
+
+    def check(self):
+        if not self._ai_service.enabled:
+            raise TranscriptionUnavailable("Whisper unavailable: set OPENAI_API_KEY.")
+
+    async def transcribe_segment(self, path: str, content_type: str) -> str:
+        self.check()
+        async with aiofiles.open(path, "rb") as f:
+            audio = await f.read()
+        return await self._ai_service.transcribe_remote(audio, os.path.basename(path), content_type)
+
+
+def _whisper_installed() -> bool:
+    try:
+        import whisper
+    except ImportError:
+        return False
+    return hasattr(whisper, "load_model")
+
+
+def create_backend(name: str, ai_service) -> TranscriptionBackend:
+    """
+    AI_TRANSCRIBE_BACKEND: openai | whisper | stub | auto (openai with a
+    key, else local whisper when installed).
+    """
+    if name == "auto":
+        name = "openai" if ai_service.enabled or not _whisper_installed() else "whisper"
+    if name == "whisper":
+        return WhisperBackend()
+    if name == "stub":
+        return StubBackend()
+    if name == "openai":
+        return RemoteBackend(ai_service)
+    raise ValueError(f"Unknown transcription backend: {name}")
+
+
+def new_workdir() -> tempfile.TemporaryDirectory:
+    return tempfile.TemporaryDirectory(prefix="transcribe-")
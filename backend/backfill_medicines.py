@@ -0,0 +1,25 @@
+"""
+Populate prescription_medicines from existing prescriptions
+
+Usage: python backfill_medicines.py [--batch-size N]
+
+Only prescriptions without index rows are touched, so the command can be
+interrupted and re-run. New prescriptions are indexed on save.
+"""
+import argparse
+
+from app.database import engine, upgrade_database
+from app.services.medicine_index import backfill_medicine_index, BACKFILL_BATCH_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the prescribed-medicine index")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    upgrade_database()
+    total = backfill_medicine_index(
+        engine,
+        batch_size=args.batch_size,
+        progress=lambda n: print(f"indexed {n} prescriptions", flush=True)
+    )
+    print(f"Done: {total} prescriptions indexed")
@@ -0,0 +1,85 @@
+"""
+Local stub of the OpenAI-compatible endpoints used by AIService
+
+Answers /v1/chat/completions and /v1/audio/transcriptions after a fixed
+latency, failing a configurable share of calls with 503 (or stalling past
+the client timeout), so concurrency limits, timeouts and retries can be
+exercised without network access or an API key.
+
+Usage: python -m benchmarks.ai_stub [--port 9100] [--latency 0.5] [--fail-rate 0.1] [--stall-rate 0]
+Then:  OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency: float = 0.5, fail_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 600.0):
+    app = FastAPI(title="AI stub")
+    app.state.calls = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+
+    async def respond(payload: dict):
+        app.state.calls += 1
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            roll = random.random()
+            if roll < stall_rate:
+                await asyncio.sleep(stall)
+            await asyncio.sleep(latency)
+            if roll < stall_rate + fail_rate:
+                return JSONResponse({"error": {"message": "stub overloaded"}}, status_code=503)
+            return payload
+        finally:
+            app.state.in_flight -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        return await respond({
+            "id": f"stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"Stub answer for: {prompt[-80:]}"},
+                "finish_reason": "stop"
+            }]
+        })
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        audio = await form["file"].read()
+        return await respond({"text": f"stub transcript of {len(audio)} bytes"})
+
+    @app.get("/stats")
+    def stats():
+        return {"calls": app.state.calls, "in_flight": app.state.in_flight, "max_in_flight": app.state.max_in_flight}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.latency, args.fail_rate, args.stall_rate),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning"
+    )
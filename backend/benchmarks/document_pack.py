@@ -0,0 +1,97 @@
+"""
+Document pack throughput benchmark
+
+Seeds a throwaway SQLite database with one day of bills and prescriptions,
+then downloads GET /api/documents/daily-pack in-process (httpx + ASGI
+transport) once per render pool size and reports documents/second. Each
+pool is warmed with a small pack first so process start-up is not timed.
+Throughput should grow with workers up to the number of CPU cores.
+
+Usage: python -m benchmarks.document_pack [--documents 400] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "document_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+
+from app.main import app, prepare_database  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models import Bill, Patient, Prescription  # noqa: E402
+from app.services.document_batch import document_batch  # noqa: E402
+
+MEDICINES = [
+    {"name": "Paracetamol", "dosage": "500 mg twice daily", "duration": "5 days"},
+    {"name": "Cetirizine", "dosage": "10 mg at night", "duration": "3 days"},
+    {"name": "ORS", "dosage": "1 sachet after each loose stool", "duration": "as needed"},
+]
+
+
+def seed(documents: int) -> tuple[str, str]:
+    """
+    Half bills, half prescriptions on "today"; a handful of the same
+    documents dated yesterday form the warm-up pack.
+    """
+    today = datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0)
+    yesterday = today - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        patients = [Patient(name=f"Bench Patient {i}", age=20 + i % 50, gender="MF"[i % 2]) for i in range(50)]
+        db.add_all(patients)
+        db.flush()
+        for i in range(documents // 2 + 4):
+            day = yesterday if i < 4 else today
+            patient = patients[i % len(patients)]
+            db.add(Bill(patient_id=patient.id, amount=250 + i % 7 * 50, status="paid", created_at=day))
+            db.add(Prescription(
+                patient_id=patient.id, diagnosis="Viral fever", medicines=MEDICINES,
+                notes="Plenty of fluids.\nReview after five days.", created_at=day
+            ))
+        db.commit()
+    finally:
+        db.close()
+    return yesterday.date().isoformat(), today.date().isoformat()
+
+
+async def download(client: httpx.AsyncClient, day: str) -> tuple[int, float]:
+    start = time.perf_counter()
+    response = await client.get("/api/documents/daily-pack", params={"start": day})
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    entries = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    return len(entries) - 1, elapsed   # minus manifest.json
+
+
+async def run(workers: int, warmup_day: str, day: str) -> dict:
+    document_batch.resize(workers)
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        await download(client, warmup_day)
+        count, elapsed = await download(client, day)
+    document_batch.shutdown()
+    return {"workers": workers, "documents": count, "seconds": elapsed, "docs_per_sec": count / elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    args = parser.parse_args()
+
+    prepare_database()
+    warmup_day, day = seed(args.documents)
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'workers':>8} {'docs':>6} {'seconds':>9} {'docs/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        result = asyncio.run(run(workers, warmup_day, day))
+        baseline = baseline or result["docs_per_sec"]
+        print(f"{result['workers']:>8} {result['documents']:>6} {result['seconds']:>9.2f} "
+              f"{result['docs_per_sec']:>9.1f} {result['docs_per_sec'] / baseline:>7.2f}x")
@@ -0,0 +1,496 @@
+"""
+API load test
+
+Drives the routers mounted in app/main.py with concurrent async httpx
+clients, using a weighted mix of front-desk traffic (dashboards,
+look-ups, bookings, billing, PDFs, the queue's issue / call / complete
+cycle, rule-based AI suggestions), and reports the request count,
+throughput and p50/p95/p99 latency per endpoint. Results can be saved
+as JSON and compared between runs. Everything runs offline: in-process
+against SQLite or a local PostgreSQL, or over HTTP against a locally
+running server. AI calls use the rule-based fallback unless
+--ai-stub-url points at `python -m benchmarks.ai_stub`.
+
+Not exercised: the queue WebSocket, audio transcription uploads and
+DELETE endpoints.
+
+Usage:
+  python -m benchmarks.load_test [--duration 30] [--concurrency 32] [--output run.json]
+      in-process on a temporary SQLite database seeded by benchmarks.seed_data
+  python -m benchmarks.load_test --database-url postgresql://localhost/clinic_loadtest
+      in-process on a local PostgreSQL database (seeded when empty)
+  python -m benchmarks.load_test --url http://127.0.0.1:8000
+      a running server, e.g. uvicorn --workers 4 on a database seeded with benchmarks.seed_data
+  python -m benchmarks.load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=None, help="base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--database-url", default=None, help="in-process database (default: temporary SQLite)")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and request mix")
+    parser.add_argument("--patients", type=int, default=5000, help="seed volume when the database is empty")
+    parser.add_argument("--years", type=float, default=3, help="seed volume when the database is empty")
+    parser.add_argument("--only", nargs="+", default=None, help="run only endpoints whose name contains one of these")
+    parser.add_argument("--ai-stub-url", default=None, help="OPENAI_BASE_URL of a local AI stub (in-process only)")
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files and exit")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None and ARGS.url is None and ARGS.compare is None:
+    os.environ["DATABASE_URL"] = ARGS.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "loadtest.db")
+    # offline: never reach the real AI API, whatever .env says
+    os.environ["OPENAI_API_KEY"] = "stub" if ARGS.ai_stub_url else ""
+    if ARGS.ai_stub_url:
+        os.environ["OPENAI_BASE_URL"] = ARGS.ai_stub_url
+
+import httpx  # noqa: E402
+
+LOGIN_EMAIL = "loadtest@clinic.local"
+LOGIN_PASSWORD = "loadtest-password"
+OK = (200,)
+
+
+# ---- traffic mix ----
+
+SCENARIOS = []
+
+
+def scenario(name: str, weight: int, expect=OK, after=None):
+    """
+    Register a request builder: (rng, ctx) -> (method, path, httpx kwargs).
+    after(ctx, response), if given, sees each expected response, e.g. to
+    remember ids created during the run.
+    """
+    def register(build):
+        SCENARIOS.append({"name": name, "weight": weight, "expect": set(expect), "build": build, "after": after})
+        return build
+    return register
+
+
+@scenario("GET /api/dashboard/stats", 8)
+def _(rng, ctx):
+    return "GET", "/api/dashboard/stats", {}
+
+
+@scenario("GET /api/appointments/ (today)", 8)
+def _(rng, ctx):
+    today = datetime.combine(ctx["today"], datetime.min.time())
+    return "GET", "/api/appointments/", {"params": {"start": today.isoformat(), "end": (today + timedelta(days=1)).isoformat()}}
+
+
+@scenario("GET /api/appointments/ (patient)", 5)
+def _(rng, ctx):
+    return "GET", "/api/appointments/", {"params": {"patient_id": rng.choice(ctx["patients"]), "limit": 20}}
+
+
+@scenario("GET /api/appointments/availability", 6)
+def _(rng, ctx):
+    start = ctx["today"] + timedelta(days=rng.randint(0, 7))
+    params = {"doctor_id": rng.choice(ctx["doctors"]), "start": start.isoformat(), "end": (start + timedelta(days=6)).isoformat()}
+    return "GET", "/api/appointments/availability", {"params": params}
+
+
+@scenario("GET /api/appointments/{id}", 3)
+def _(rng, ctx):
+    return "GET", f"/api/appointments/{rng.choice(ctx['appointments'])}", {}
+
+
+@scenario("POST /api/appointments/", 2, expect=(200, 409))
+def _(rng, ctx):
+    day = ctx["today"] + timedelta(days=rng.randint(1, 14))
+    at = datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=15 * rng.randrange(32))
+    return "POST", "/api/appointments/", {"json": {
+        "patient_id": rng.choice(ctx["patients"]), "doctor_id": rng.choice(ctx["doctors"]),
+        "appointment_time": at.isoformat(), "duration_minutes": 15,
+    }}
+
+
+@scenario("GET /api/patients/", 3)
+def _(rng, ctx):
+    return "GET", "/api/patients/", {"params": {"limit": 50}}
+
+
+@scenario("GET /api/patients/search", 8)
+def _(rng, ctx):
+    return "GET", "/api/patients/search", {"params": {"q": rng.choice(ctx["name_prefixes"])}}
+
+
+@scenario("GET /api/patients/{id}", 3)
+def _(rng, ctx):
+    return "GET", f"/api/patients/{rng.choice(ctx['patients'])}", {}
+
+
+@scenario("GET /api/patients/{id}/summary", 6)
+def _(rng, ctx):
+    return "GET", f"/api/patients/{rng.choice(ctx['patients'])}/summary", {}
+
+
+@scenario("POST /api/patients/", 1)
+def _(rng, ctx):
+    return "POST", "/api/patients/", {"json": {
+        "name": f"Walk-in {rng.randrange(10 ** 6)}", "age": rng.randint(1, 90),
+        "gender": rng.choice("MF"), "phone": f"8{rng.randint(100000000, 999999999)}",
+    }}
+
+
+@scenario("GET /api/prescriptions/patient/{id}", 4)
+def _(rng, ctx):
+    return "GET", f"/api/prescriptions/patient/{rng.choice(ctx['patients'])}", {}
+
+
+@scenario("GET /api/prescriptions/medicines", 2)
+def _(rng, ctx):
+    return "GET", "/api/prescriptions/medicines", {"params": {"name": rng.choice(ctx["medicines"]), "days": 90}}
+
+
+@scenario("GET /api/prescriptions/{id}/pdf", 2)
+def _(rng, ctx):
+    return "GET", f"/api/prescriptions/{rng.choice(ctx['prescriptions'])}/pdf", {}
+
+
+@scenario("POST /api/prescriptions/", 2)
+def _(rng, ctx):
+    return "POST", "/api/prescriptions/", {"json": {
+        "patient_id": rng.choice(ctx["patients"]), "diagnosis": "Viral fever",
+        "medicines": [{"name": "Paracetamol", "dosage": "500 mg three times daily", "duration": "5 days"}],
+    }}
+
+
+@scenario("GET /api/billing/patient/{id}", 4)
+def _(rng, ctx):
+    return "GET", f"/api/billing/patient/{rng.choice(ctx['patients'])}", {}
+
+
+@scenario("GET /api/billing/reports/daily", 2)
+def _(rng, ctx):
+    end = ctx["today"] - timedelta(days=rng.randint(0, 300))
+    return "GET", "/api/billing/reports/daily", {"params": {"start": (end - timedelta(days=30)).isoformat(), "end": end.isoformat()}}
+
+
+@scenario("GET /api/billing/reports/monthly", 1)
+def _(rng, ctx):
+    return "GET", "/api/billing/reports/monthly", {"params": {"year": ctx["today"].year - rng.randint(0, 2)}}
+
+
+@scenario("GET /api/billing/reports/outstanding", 2)
+def _(rng, ctx):
+    params = {"patient_id": rng.choice(ctx["patients"])} if rng.random() < 0.5 else {}
+    return "GET", "/api/billing/reports/outstanding", {"params": params}
+
+
+@scenario("GET /api/billing/export (one day)", 1)
+def _(rng, ctx):
+    day = datetime.combine(ctx["today"] - timedelta(days=rng.randint(1, 300)), datetime.min.time())
+    return "GET", "/api/billing/export", {"params": {"start": day.isoformat(), "end": (day + timedelta(days=1)).isoformat()}}
+
+
+@scenario("GET /api/billing/{id}/pdf", 2)
+def _(rng, ctx):
+    return "GET", f"/api/billing/{rng.choice(ctx['bills'])}/pdf", {}
+
+
+@scenario("POST /api/billing/", 2)
+def _(rng, ctx):
+    return "POST", "/api/billing/", {"json": {"patient_id": rng.choice(ctx["patients"]), "amount": 500.0, "status": "unpaid"}}
+
+
+@scenario("GET /api/documents/daily-pack", 1)
+def _(rng, ctx):
+    return "GET", "/api/documents/daily-pack", {"params": {"start": ctx["pack_day"].isoformat(), "kinds": "invoice"}}
+
+
+@scenario("GET /api/queue/", 4)
+def _(rng, ctx):
+    return "GET", "/api/queue/", {}
+
+
+@scenario("GET /api/queue/{id}/eta", 3, expect=(200, 404, 409))
+def _(rng, ctx):
+    return "GET", f"/api/queue/{rng.choice(ctx['tokens'])}/eta", {}
+
+
+@scenario("GET /api/queue/appointment/{id}/position", 2, expect=(200, 404))
+def _(rng, ctx):
+    return "GET", f"/api/queue/appointment/{rng.choice(ctx['queued_appointments'])}/position", {}
+
+
+def _issued(ctx, response):
+    ctx["waiting"].append(response.json()["token_id"])
+
+
+@scenario("POST /api/queue/", 2, after=_issued)
+def _(rng, ctx):
+    return "POST", "/api/queue/", {"params": {"appointment_id": rng.choice(ctx["today_appointments"])}}
+
+
+@scenario("PATCH /api/queue/{id}", 3)
+def _(rng, ctx):
+    # walk tokens through waiting -> serving -> done, which feeds the ETA estimator
+    if ctx["serving"] and (rng.random() < 0.5 or not ctx["waiting"]):
+        token_id, status = ctx["serving"].pop(rng.randrange(len(ctx["serving"]))), "done"
+    elif ctx["waiting"]:
+        token_id, status = ctx["waiting"].pop(0), "serving"
+        ctx["serving"].append(token_id)
+    else:
+        token_id, status = rng.choice(ctx["tokens"]), "done"
+    return "PATCH", f"/api/queue/{token_id}", {"params": {"status": status}}
+
+
+@scenario("POST /api/ai/prescription", 3)
+def _(rng, ctx):
+    diagnosis = rng.choice(["Viral fever", "Type 2 diabetes", "Lower back pain", "Allergic rhinitis", "Gastritis"])
+    return "POST", "/api/ai/prescription", {"json": {"diagnosis": diagnosis, "symptoms": "since two days"}}
+
+
+@scenario("GET /api/ai/notes/patient/{id}", 2)
+def _(rng, ctx):
+    return "GET", f"/api/ai/notes/patient/{rng.choice(ctx['patients'])}", {}
+
+
+@scenario("POST /api/ai/soap", 1, expect=(202,))
+def _(rng, ctx):
+    return "POST", "/api/ai/soap", {"json": {
+        "patient_id": rng.choice(ctx["patients"]),
+        "transcript": "Fever for two days with body ache. Temperature 101F. Advised paracetamol and fluids.",
+    }}
+
+
+@scenario("POST /api/auth/login", 1, expect=(200, 503))   # 503: hashing pool full, by design
+def _(rng, ctx):
+    return "POST", "/api/auth/login", {"json": {"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD}}
+
+
+# ---- discovery ----
+
+async def discover(client: httpx.AsyncClient) -> dict:
+    """
+    Ids and dates to build requests from, read through the API itself so
+    the same code works in-process and against a remote server.
+    """
+    async def get(path, **params):
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    patients = await get("/api/patients/", limit=1000)
+    appointments = await get("/api/appointments/", limit=1000)
+    if not patients or not appointments:
+        sys.exit("The database has no data; seed it with `python -m benchmarks.seed_data`")
+    today = datetime.utcnow().date()
+    prescriptions, bills, medicines = [], [], set()
+    for patient in patients[:40]:
+        for p in await get(f"/api/prescriptions/patient/{patient['id']}"):
+            prescriptions.append(p["id"])
+            medicines.update(m["name"] for m in p["medicines"] if isinstance(m, dict) and m.get("name"))
+        bills += [b["id"] for b in await get(f"/api/billing/patient/{patient['id']}")]
+    tokens = await get("/api/queue/")
+    midnight = datetime.combine(today, datetime.min.time())
+    today_appointments = await get(
+        "/api/appointments/", start=midnight.isoformat(), end=(midnight + timedelta(days=1)).isoformat(), limit=1000
+    )
+    past = [datetime.fromisoformat(a["appointment_time"]).date() for a in appointments]
+    past = [d for d in past if d < today]
+    return {
+        "today": today,
+        "pack_day": max(past) if past else today,
+        "patients": [p["id"] for p in patients],
+        "name_prefixes": sorted({p["name"][:3] for p in patients}),
+        "appointments": [a["id"] for a in appointments],
+        "doctors": sorted({a["doctor_id"] for a in appointments if a.get("doctor_id")}) or [None],
+        "prescriptions": prescriptions or [1],
+        "bills": bills or [1],
+        "medicines": sorted(medicines) or ["Paracetamol"],
+        "tokens": [t["token_id"] for t in tokens] or [1],
+        "today_appointments": [a["id"] for a in today_appointments] or [appointments[0]["id"]],
+        # queue state shared by all clients; the PATCH scenario moves tokens along
+        "waiting": [t["token_id"] for t in tokens if t["status"] == "waiting"],
+        "serving": [t["token_id"] for t in tokens if t["status"] == "serving"],
+        "queued_appointments": [t["appointment_id"] for t in tokens] or [1],
+    }
+
+
+# ---- runner ----
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, status, ok: bool):
+        self.latencies.setdefault(name, []).append(seconds)
+        counts = self.statuses.setdefault(name, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile_summary(latencies: list, elapsed: float, errors: int) -> dict:
+    ordered = sorted(latencies)
+    if len(ordered) > 1:
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ordered[0]
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def drive(client, ctx, scenarios, concurrency: int, seconds: float, seed: int) -> tuple:
+    recorder = Recorder()
+    weights = [s["weight"] for s in scenarios]
+    deadline = time.perf_counter() + seconds
+
+    async def user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            chosen = rng.choices(scenarios, weights)[0]
+            method, path, kwargs = chosen["build"](rng, ctx)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            ok = status in chosen["expect"]
+            recorder.record(chosen["name"], time.perf_counter() - start, status, ok)
+            if ok and chosen["after"]:
+                chosen["after"](ctx, response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return recorder, time.perf_counter() - start
+
+
+async def run(args) -> dict:
+    scenarios = [s for s in SCENARIOS if not args.only or any(term in s["name"] for term in args.only)]
+    if not scenarios:
+        sys.exit("No endpoints match --only")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    meta = {
+        "started_at": datetime.utcnow().isoformat(),
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "warmup_s": args.warmup,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": _git_commit(),
+    }
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=60, limits=limits)
+        app = None
+    else:
+        from app.database import engine, upgrade_database
+        from app.main import app
+        from benchmarks.seed_data import seed
+
+        upgrade_database()
+        try:
+            meta["seeded"] = seed(args.patients, args.years, seed=args.seed)
+        except RuntimeError:
+            meta["seeded"] = "reused existing data"
+        meta["database"] = engine.dialect.name
+        await app.router.startup()   # httpx's ASGI transport does not send lifespan events
+        client = httpx.AsyncClient(app=app, base_url="http://loadtest", timeout=60, limits=limits)
+
+    try:
+        ctx = await discover(client)
+        if args.warmup:
+            await drive(client, ctx, scenarios, args.concurrency, args.warmup, args.seed + 1)
+        recorder, elapsed = await drive(client, ctx, scenarios, args.concurrency, args.duration, args.seed)
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+    endpoints = {
+        name: {**percentile_summary(latencies, elapsed, recorder.errors.get(name, 0)), "statuses": recorder.statuses[name]}
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    everything = [t for latencies in recorder.latencies.values() for t in latencies]
+    total = percentile_summary(everything, elapsed, sum(recorder.errors.values())) if everything else {}
+    return {"meta": {**meta, "elapsed_s": round(elapsed, 2)}, "total": total, "endpoints": endpoints}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ---- output ----
+
+def print_report(result: dict):
+    header = f"{'endpoint':<44} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + ([("TOTAL", result["total"])] if result["total"] else [])
+    for name, r in rows:
+        print(f"{name:<44} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    for label, run_ in (("before", before), ("after", after)):
+        m = run_["meta"]
+        print(f"{label}: {m.get('git_commit')} {m['target']} {m.get('database', '')} "
+              f"concurrency={m['concurrency']} duration={m['duration_s']}s")
+    print(f"{'endpoint':<44} {'req/s':>16} {'p95 ms':>20} {'p99 ms':>20}")
+    rows = [(n, before["endpoints"][n], r) for n, r in after["endpoints"].items() if n in before["endpoints"]]
+    rows.append(("TOTAL", before["total"], after["total"]))
+    for name, old, new in rows:
+        print(f"{name:<44} {new['rps']:>8.1f} {change(old['rps'], new['rps']):>7} "
+              f"{new['p95_ms']:>10.1f} {change(old['p95_ms'], new['p95_ms']):>9} "
+              f"{new['p99_ms']:>10.1f} {change(old['p99_ms'], new['p99_ms']):>9}")
+
+
+if __name__ == "__main__":
+    if ARGS.compare:
+        compare(*ARGS.compare)
+        sys.exit(0)
+    result = asyncio.run(run(ARGS))
+    print_report(result)
+    if ARGS.output:
+        with open(ARGS.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {ARGS.output}")
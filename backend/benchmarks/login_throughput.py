@@ -0,0 +1,85 @@
+"""
+Login throughput benchmark
+
+Drives POST /api/auth/login in-process (httpx + ASGI transport) against a
+throwaway SQLite database and reports logins/second and latency for each
+hashing pool size, plus how many requests were shed with 503.
+
+Usage: python -m benchmarks.login_throughput [--requests 200] [--concurrency 32] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "login_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx  # noqa: E402
+
+from app.main import app, prepare_database  # noqa: E402
+from app.auth_utils import PasswordHashPool, get_password_hash  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.models import User  # noqa: E402
+from app.routers import auth as auth_router  # noqa: E402
+
+EMAIL = "bench@clinic.local"
+PASSWORD = "bench-password"
+
+
+def seed_user():
+    db = SessionLocal()
+    try:
+        db.add(User(name="Bench", email=EMAIL, hashed_password=get_password_hash(PASSWORD)))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run(total: int, concurrency: int, workers: int, max_pending: int):
+    auth_router.password_hash_pool = PasswordHashPool(workers=workers, max_pending=max_pending)
+    gate = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], []
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                r = await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+                latencies.append(time.perf_counter() - start)
+                statuses.append(r.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+
+    ok = statuses.count(200)
+    latencies.sort()
+    return {
+        "workers": workers,
+        "ok": ok,
+        "shed_503": statuses.count(503),
+        "logins_per_sec": ok / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 4])
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="pool backlog limit (default: workers * 4)")
+    args = parser.parse_args()
+
+    prepare_database()
+    seed_user()
+    print(f"{'workers':>8} {'ok':>6} {'503':>6} {'login/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for workers in sorted(set(args.workers)):
+        result = asyncio.run(run(args.requests, args.concurrency, workers, args.max_pending or workers * 4))
+        print(f"{result['workers']:>8} {result['ok']:>6} {result['shed_503']:>6} "
+              f"{result['logins_per_sec']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f}")
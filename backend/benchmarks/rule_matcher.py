@@ -0,0 +1,72 @@
+"""
+Prescription rule matcher micro-benchmark
+
+Times the compiled Aho-Corasick RuleSet against the old approach (one
+substring check per pattern) as the number of synthetic rules grows.
+Compiled matching should stay roughly flat; the naive scan grows linearly.
+
+Usage: python -m benchmarks.rule_matcher [--rules 10 100 1000 5000] [--iterations 2000]
+"""
+import argparse
+import random
+import string
+import time
+
+from app.services.rule_engine import RuleSet, normalize_text
+
+TEXTS = [
+    "High fever with chills and body ache since two days",
+    "Chronic lower back pain, worse in the morning",
+    "Known diabetes, sugar levels uncontrolled; mild headache",
+    "Dry cough, sore throat and runny nose",
+]
+
+
+def synthetic_rules(count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    rules = [
+        {"id": "fever", "patterns": ["fever"], "priority": 30, "medicines": [{"name": "Paracetamol"}]},
+        {"id": "back-pain", "patterns": ["back pain"], "priority": 20, "medicines": [{"name": "Ibuprofen"}]},
+        {"id": "diabetes", "patterns": ["diabetes", "sugar"], "priority": 10, "medicines": [{"name": "Metformin"}]},
+    ]
+    while len(rules) < count:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(rng.randint(1, 2))]
+        rules.append({
+            "id": f"r{len(rules)}",
+            "patterns": [" ".join(words)],
+            "priority": rng.randint(0, 100),
+            "medicines": [{"name": f"Drug{len(rules)}"}]
+        })
+    return {"rules": rules[:count]}
+
+
+def naive_match(data: dict, text: str) -> list[str]:
+    lowered = text.lower()
+    return [r["id"] for r in data["rules"] for p in r["patterns"] if p in lowered]
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(TEXTS[i % len(TEXTS)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prescription rule matcher")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'rules':>7} {'compile ms':>11} {'compiled us':>12} {'naive us':>10}")
+    for count in args.rules:
+        data = synthetic_rules(count)
+        start = time.perf_counter()
+        ruleset = RuleSet(data)
+        compile_ms = (time.perf_counter() - start) * 1000
+        for text in TEXTS:
+            # whole-word matching is stricter than substring checks, never looser
+            assert {r["id"] for r in ruleset.match(text)} <= set(naive_match(data, normalize_text(text)))
+        compiled = per_call_us(ruleset.match, args.iterations)
+        naive = per_call_us(lambda text: naive_match(data, text), args.iterations)
+        print(f"{count:>7} {compile_ms:>11.1f} {compiled:>12.1f} {naive:>10.1f}")
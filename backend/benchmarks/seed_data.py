@@ -0,0 +1,215 @@
+"""
+Seed a database with realistic clinic volumes for load testing
+
+Patients, doctors and several years of appointments (in 15-minute slots
+within clinic hours, six days a week), with prescriptions, bills and AI
+notes for completed visits, two weeks of upcoming bookings and today's
+queue. Rows are bulk-inserted with explicit ids and a fixed random seed,
+so runs with the same arguments produce the same data relative to today;
+derived tables (search index, billing rollups, medicine index) are built
+afterwards.
+
+Usage: python -m benchmarks.seed_data --database-url sqlite:///./loadtest.db [--patients 5000] [--years 3] [--per-day 40]
+Login for the seeded data: loadtest@clinic.local / loadtest-password
+"""
+import argparse
+import os
+import random
+import sys
+import time as clock
+from datetime import datetime, time, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="target database (default: DATABASE_URL)")
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--per-day", type=int, default=40, help="appointments per clinic day")
+    parser.add_argument("--doctors", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None and ARGS.database_url:
+    os.environ["DATABASE_URL"] = ARGS.database_url
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+
+from app.auth_utils import get_password_hash  # noqa: E402
+from app.database import engine, upgrade_database  # noqa: E402
+from app.models import AINote, Appointment, Bill, Patient, Prescription, QueueToken, User  # noqa: E402
+from app.services.billing_rollups import backfill_rollups  # noqa: E402
+from app.services.medicine_index import backfill_medicine_index  # noqa: E402
+from app.services.search_service import patient_search  # noqa: E402
+
+LOGIN_EMAIL = "loadtest@clinic.local"
+LOGIN_PASSWORD = "loadtest-password"
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 32     # 09:00 - 17:00
+INSERT_CHUNK = 5000
+
+FIRST_NAMES = [
+    "Aarav", "Aisha", "Ananya", "Arjun", "Chen", "Daniel", "Fatima", "Grace", "Hiro", "Isabel",
+    "Kavya", "Leila", "Lucas", "Maria", "Mohammed", "Nadia", "Noah", "Olivia", "Priya", "Rahul",
+    "Sara", "Sofia", "Tariq", "Vikram", "Wei", "Yusuf", "Zara",
+]
+LAST_NAMES = [
+    "Ahmed", "Brown", "Das", "Fernandes", "Garcia", "Gupta", "Iyer", "Khan", "Kim", "Kumar",
+    "Lee", "Martin", "Mehta", "Nair", "Patel", "Rao", "Reddy", "Singh", "Smith", "Wang",
+]
+# diagnosis, weight, medicines
+PROTOCOLS = [
+    ("Viral fever", 20, [("Paracetamol", "500 mg three times daily", "5 days")]),
+    ("Upper respiratory infection", 15, [("Amoxicillin", "500 mg three times daily", "7 days"),
+                                         ("Cetirizine", "10 mg at night", "5 days")]),
+    ("Hypertension", 12, [("Amlodipine", "5 mg once daily", "30 days")]),
+    ("Type 2 diabetes", 12, [("Metformin", "500 mg twice daily", "30 days")]),
+    ("Gastritis", 10, [("Pantoprazole", "40 mg before breakfast", "14 days")]),
+    ("Lower back pain", 8, [("Ibuprofen", "400 mg twice daily", "5 days"),
+                            ("Thiocolchicoside", "4 mg twice daily", "5 days")]),
+    ("Allergic rhinitis", 8, [("Cetirizine", "10 mg at night", "10 days")]),
+    ("Migraine", 5, [("Sumatriptan", "50 mg at onset", "as needed")]),
+    ("Routine check-up", 10, []),
+]
+
+
+def _insert(conn, model, rows: list):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(insert(model.__table__), rows[start:start + INSERT_CHUNK])
+
+
+def _reset_sequences(conn):
+    # ids were supplied explicitly; move PostgreSQL sequences past them
+    if conn.dialect.name != "postgresql":
+        return
+    for model in (User, Patient, Appointment, Prescription, Bill, QueueToken, AINote):
+        table = model.__tablename__
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def seed(patients: int = 5000, years: float = 3, per_day: int = 40, doctors: int = 5, seed: int = 42,
+         now: datetime | None = None) -> dict:
+    """
+    Fill an empty, migrated database. Returns the row counts.
+    """
+    rng = random.Random(seed)
+    now = (now or datetime.utcnow()).replace(second=0, microsecond=0)
+    today = now.date()
+    created = {}
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count(Patient.id))).scalar():
+            raise RuntimeError("Database already has patients; seed an empty database")
+
+        password = get_password_hash(LOGIN_PASSWORD)
+        users = [{"id": 1, "name": "Load Test", "email": LOGIN_EMAIL, "role": "admin", "hashed_password": password}]
+        users += [
+            {"id": i + 2, "name": f"Dr. {rng.choice(LAST_NAMES)}", "email": f"doctor{i + 1}@clinic.local",
+             "role": "doctor", "hashed_password": password}
+            for i in range(doctors)
+        ]
+        doctor_ids = [u["id"] for u in users[1:]]
+        first_day = today - timedelta(days=int(years * 365))
+        patient_rows = [
+            {
+                "id": i + 1,
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "age": rng.randint(1, 90),
+                "gender": rng.choice("MF"),
+                "phone": f"9{rng.randint(100000000, 999999999)}",
+                "created_at": datetime.combine(first_day, time(9)) + timedelta(minutes=i),
+            }
+            for i in range(patients)
+        ]
+        _insert(conn, User, users)
+        _insert(conn, Patient, patient_rows)
+
+        appointments, prescriptions, bills, notes, tokens = [], [], [], [], []
+        protocols = [p for p in PROTOCOLS for _ in range(p[1])]
+        day = first_day
+        while day <= today + timedelta(days=14):
+            if day.weekday() != 6 or day == today:   # closed on Sundays; today always has a queue
+                future = day > today
+                count = per_day // 2 if future else per_day
+                for slot in sorted(rng.sample(range(doctors * SLOTS_PER_DAY), min(count, doctors * SLOTS_PER_DAY))):
+                    doctor_id = doctor_ids[slot // SLOTS_PER_DAY]
+                    at = datetime.combine(day, time(9)) + timedelta(minutes=SLOT_MINUTES * (slot % SLOTS_PER_DAY))
+                    patient_id = rng.randint(1, patients)
+                    if at >= now:
+                        status = "scheduled"
+                    else:
+                        status = rng.choices(["completed", "cancelled", "no_show"], [85, 8, 7])[0]
+                    appointment_id = len(appointments) + 1
+                    appointments.append({
+                        "id": appointment_id, "patient_id": patient_id, "doctor_id": doctor_id,
+                        "appointment_time": at, "duration_minutes": SLOT_MINUTES,
+                        "end_time": at + timedelta(minutes=SLOT_MINUTES), "status": status,
+                        "created_at": at - timedelta(days=rng.randint(0, 10)),
+                    })
+                    if day == today and status in ("scheduled", "completed"):
+                        tokens.append({
+                            "id": len(tokens) + 1, "appointment_id": appointment_id, "token_number": len(tokens) + 1,
+                            "status": "done" if status == "completed" else "waiting",
+                            "created_at": min(at, now) - timedelta(minutes=30),
+                            "called_at": at if status == "completed" else None,
+                            "completed_at": at + timedelta(minutes=rng.randint(8, 20)) if status == "completed" else None,
+                        })
+                    if status != "completed":
+                        continue
+                    diagnosis, _, medicines = rng.choice(protocols)
+                    if medicines or rng.random() < 0.3:
+                        prescriptions.append({
+                            "id": len(prescriptions) + 1, "patient_id": patient_id, "diagnosis": diagnosis,
+                            "medicines": [{"name": n, "dosage": d, "duration": t} for n, d, t in medicines],
+                            "notes": "Review if symptoms persist." if rng.random() < 0.4 else None,
+                            "created_at": at + timedelta(minutes=10), "updated_at": at + timedelta(minutes=10),
+                        })
+                    if rng.random() < 0.9:
+                        unpaid = rng.random() < (0.3 if (today - day).days < 30 else 0.03)
+                        bills.append({
+                            "id": len(bills) + 1, "patient_id": patient_id,
+                            "amount": float(rng.choice([300, 500, 500, 800, 1200])),
+                            "status": "unpaid" if unpaid else "paid",
+                            "created_at": at + timedelta(minutes=20), "updated_at": at + timedelta(minutes=20),
+                        })
+                    if rng.random() < 0.1:
+                        notes.append({
+                            "id": len(notes) + 1, "patient_id": patient_id,
+                            "transcript": f"Patient reports symptoms consistent with {diagnosis.lower()}.",
+                            "structured_summary": {"assessment": diagnosis, "plan": "As prescribed."},
+                            "created_at": at + timedelta(minutes=12),
+                        })
+            day += timedelta(days=1)
+
+        _insert(conn, Appointment, appointments)
+        _insert(conn, Prescription, prescriptions)
+        _insert(conn, Bill, bills)
+        _insert(conn, AINote, notes)
+        _insert(conn, QueueToken, tokens)
+        _reset_sequences(conn)
+        created = {
+            "users": len(users), "patients": patients, "appointments": len(appointments),
+            "prescriptions": len(prescriptions), "bills": len(bills), "ai_notes": len(notes), "queue_tokens": len(tokens),
+        }
+
+    # bulk inserts bypass the mapper events that maintain these
+    patient_search.ensure_index(engine)
+    backfill_rollups(engine)
+    backfill_medicine_index(engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return created
+
+
+if __name__ == "__main__":
+    upgrade_database()
+    start = clock.perf_counter()
+    try:
+        counts = seed(ARGS.patients, ARGS.years, ARGS.per_day, ARGS.doctors, ARGS.seed)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(", ".join(f"{n} {name}" for name, n in counts.items()) + f" in {clock.perf_counter() - start:.1f}s")
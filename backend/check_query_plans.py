@@ -0,0 +1,275 @@
+"""
+Query-plan regression check for the routers' hot queries
+
+Migrates a scratch database to head, seeds it, runs EXPLAIN on each query
+the routers issue and exits non-zero if any plan reads a whole table or
+index (SQLite "SCAN", PostgreSQL "Seq Scan" / unconditioned index scans)
+or sorts (temp B-tree / "Sort" nodes), unless that query is listed as
+allowed to, with the reason next to it.
+
+Usage: python check_query_plans.py [--rows 2000] [--database-url postgresql://.../scratch_db] [--verbose]
+
+Without --database-url a temporary SQLite file is used. The database is
+written to; never point this at real data.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="EXPLAIN the routers' queries and fail on scans or sorts")
+    parser.add_argument("--rows", type=int, default=2000, help="seeded appointments / prescriptions / bills")
+    parser.add_argument("--database-url", default=None, help="scratch database (default: temporary SQLite)")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    return parser.parse_args()
+
+
+ARGS = parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    os.environ["DATABASE_URL"] = ARGS.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "plans.db")
+
+from datetime import date  # noqa: E402
+
+from sqlalchemy import func, select, text  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.sql.expression import ClauseElement, Executable  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import prepare_database  # noqa: E402
+from app.models import (  # noqa: E402
+    AINote, Appointment, Bill, BillingDailyRollup, BillingPatientRollup, BillingStatusTotal, Patient, Prescription,
+    PrescriptionMedicine, QueueToken, User,
+)
+from app.routers.appointments import _filtered_appointments  # noqa: E402
+from app.routers.billing import _export_statement as bill_export  # noqa: E402
+from app.routers.patients import _filtered_patients, summary_version_statement  # noqa: E402
+from app.routers.prescriptions import _export_statement as prescription_export, _medicine_window  # noqa: E402
+from app.services.availability import _blocking  # noqa: E402
+from app.services.document_batch import _statement as pack_statement  # noqa: E402
+from app.services.search_service import FTS_QUERY, patient_search  # noqa: E402
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+
+def explain_rows(conn, stmt) -> list:
+    # read the DBAPI rows: the result would apply the explained query's column types to them
+    return conn.execute(Explain(stmt)).cursor.fetchall()
+
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.stmt, **kw)
+
+
+@compiles(Explain, "postgresql")
+def _explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.stmt, **kw)
+
+
+# "SCAN CONSTANT ROW" is the one-row FROM-less select wrapping scalar subqueries
+SQLITE_SCAN = re.compile(r"^SCAN (TABLE )?(?!CONSTANT ROW)\w+")
+SQLITE_SORT = re.compile(r"USE TEMP B-TREE FOR")
+# FTS5 reports a MATCH lookup as a "SCAN" of the virtual table with an M(atch) constraint
+SQLITE_FTS_MATCH = re.compile(r"VIRTUAL TABLE INDEX \d+:\S*M")
+
+
+def sqlite_findings(conn, stmt):
+    lines = [row[3] for row in explain_rows(conn, stmt)]
+    findings = set()
+    for line in lines:
+        if SQLITE_SCAN.match(line) and not SQLITE_FTS_MATCH.search(line):
+            findings.add("scan")
+        if SQLITE_SORT.search(line):
+            findings.add("sort")
+    return findings, lines
+
+
+def postgresql_findings(conn, stmt):
+    plan = explain_rows(conn, stmt)[0][0][0]["Plan"]
+    findings, lines = set(), []
+
+    def walk(node, depth):
+        kind = node["Node Type"]
+        lines.append("  " * depth + kind + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+                     + (f" using {node['Index Name']}" if "Index Name" in node else ""))
+        if kind == "Seq Scan" or (kind in ("Index Scan", "Index Only Scan") and "Index Cond" not in node):
+            findings.add("scan")
+        if kind in ("Sort", "Incremental Sort"):
+            findings.add("sort")
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan, 0)
+    return findings, lines
+
+
+def seed(rows: int):
+    """
+    Enough rows that the planner prefers indexes, spread over 90 days,
+    200 patients and 5 doctors.
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    db = SessionLocal()
+    try:
+        doctors = [User(name=f"Doctor {i}", email=f"doctor{i}@plans.local", hashed_password="x") for i in range(5)]
+        patients = [Patient(name=f"Patient {i}", age=20 + i % 60, gender="MF"[i % 2], phone=f"555{i:07d}") for i in range(200)]
+        db.add_all(doctors + patients)
+        db.flush()
+        for i in range(rows):
+            at = now - timedelta(days=i % 90, minutes=15 * (i % 32))
+            patient = patients[i % len(patients)]
+            appointment = Appointment(
+                patient_id=patient.id, doctor_id=doctors[i % len(doctors)].id, appointment_time=at,
+                duration_minutes=15, end_time=at + timedelta(minutes=15), status=("scheduled", "completed", "cancelled")[i % 3]
+            )
+            db.add(appointment)
+            db.flush()
+            db.add(QueueToken(appointment_id=appointment.id, token_number=i + 1, status=("waiting", "serving", "done")[i % 3],
+                              created_at=at, called_at=at, completed_at=at + timedelta(minutes=10) if i % 3 == 2 else None))
+            db.add(Prescription(patient_id=patient.id, diagnosis="Fever", created_at=at,
+                                medicines=[{"name": ("Paracetamol", "Metformin", "Cetirizine")[i % 3], "dosage": "1-0-1"}]))
+            db.add(Bill(patient_id=patient.id, amount=100 + i % 50, status=("paid", "unpaid")[i % 2], created_at=at))
+            db.add(AINote(patient_id=patient.id, transcript="...", created_at=at))
+        db.commit()
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def checks(dialect: str):
+    """
+    (name, statement, allowed findings): one entry per router query.
+    """
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago, tomorrow = today - timedelta(days=7), today + timedelta(days=1)
+    page = 51
+
+    def newest_first(stmt):
+        return stmt.order_by(Appointment.appointment_time.desc(), Appointment.id.desc()).limit(page)
+
+    yield "appointments: first page", newest_first(_filtered_appointments(None, None, None, None)), {"scan"}
+    # ^ reads the (appointment_time, id) index backwards and stops after one page
+    yield "appointments: by patient", newest_first(_filtered_appointments(7, None, None, None)), set()
+    yield "appointments: by doctor", newest_first(_filtered_appointments(None, None, None, None, 2)), set()
+    yield "appointments: by status", newest_first(_filtered_appointments(None, "scheduled", None, None)), set()
+    yield "appointments: date range", newest_first(_filtered_appointments(None, None, today, tomorrow)), set()
+    yield "appointments: stream by patient", _filtered_appointments(7, None, None, None).order_by(
+        Appointment.appointment_time.desc(), Appointment.id.desc()), set()
+    yield "appointments: booking conflict", _blocking(select(Appointment), 2, now, now + timedelta(minutes=30)).order_by(
+        Appointment.appointment_time), set()
+    yield "appointments: availability window", _blocking(
+        select(Appointment.appointment_time, Appointment.end_time, Appointment.duration_minutes), 2, week_ago, tomorrow), set()
+    yield "dashboard: appointments by status", select(Appointment.status, func.count(Appointment.id)).where(
+        Appointment.appointment_time >= today, Appointment.appointment_time < tomorrow
+    ).group_by(Appointment.status), set()
+    yield "dashboard: queue by status", select(QueueToken.status, func.count(QueueToken.id)).where(
+        QueueToken.created_at >= today).group_by(QueueToken.status), set()
+    yield "dashboard: patient count", select(func.count(Patient.id)), {"scan"}
+    # ^ counting every row reads a whole index; the stats are cached for DASHBOARD_STATS_CACHE_TTL
+    yield "queue: today's snapshot", select(QueueToken).where(
+        QueueToken.created_at >= today, QueueToken.created_at < tomorrow
+    ).order_by(QueueToken.token_number), {"sort"}
+    # ^ one day of tokens, sorted in memory
+    yield "queue: restore waiting", select(QueueToken, Appointment.doctor_id).join(
+        Appointment, Appointment.id == QueueToken.appointment_id
+    ).where(QueueToken.status == "waiting"), set()
+    yield "queue: recent service times", select(QueueToken.called_at, QueueToken.completed_at, Appointment.doctor_id).join(
+        Appointment, Appointment.id == QueueToken.appointment_id
+    ).where(
+        QueueToken.called_at.isnot(None), QueueToken.completed_at.isnot(None)
+    ).order_by(QueueToken.completed_at.desc()).limit(50), set()
+    yield "queue: next token number", select(func.max(QueueToken.token_number)), set()
+    yield "queue: token of appointment", select(QueueToken).where(QueueToken.appointment_id == 11), set()
+    yield "queue: doctor of appointment", select(Appointment.doctor_id).where(Appointment.id == 11), set()
+
+    yield "prescriptions: by patient", select(Prescription).where(Prescription.patient_id == 7).order_by(
+        Prescription.created_at.desc()), set()
+    yield "prescriptions: export range", prescription_export(week_ago, tomorrow), set()
+    yield "prescriptions: medicine lookup", select(PrescriptionMedicine).where(
+        *_medicine_window("Metformin", None, None, 30)
+    ).order_by(PrescriptionMedicine.prescribed_at.desc(), PrescriptionMedicine.id.desc()).limit(100), set()
+    yield "billing: by patient", select(Bill).where(Bill.patient_id == 7).order_by(Bill.created_at.desc()), set()
+    yield "billing: export range", bill_export(week_ago, tomorrow, None), set()
+    yield "billing: export range by status", bill_export(week_ago, tomorrow, "unpaid"), set()
+    first_of_year = date(today.year, 1, 1)
+    yield "billing: daily report", select(BillingDailyRollup).where(
+        BillingDailyRollup.day >= week_ago.date(), BillingDailyRollup.day <= today.date()
+    ).order_by(BillingDailyRollup.day, BillingDailyRollup.status), set()
+    yield "billing: daily report by status", select(BillingDailyRollup).where(
+        BillingDailyRollup.day >= week_ago.date(), BillingDailyRollup.day <= today.date(),
+        BillingDailyRollup.status == "unpaid"
+    ).order_by(BillingDailyRollup.day, BillingDailyRollup.status), set()
+    yield "billing: monthly report", select(BillingDailyRollup).where(
+        BillingDailyRollup.day >= first_of_year, BillingDailyRollup.day < date(today.year + 1, 1, 1)), set()
+    yield "billing: outstanding total", select(BillingStatusTotal).where(BillingStatusTotal.status == "unpaid"), set()
+    yield "billing: outstanding by patient", select(BillingPatientRollup).where(
+        BillingPatientRollup.patient_id == 7, BillingPatientRollup.status == "unpaid"), set()
+    yield "documents: invoices of a day", pack_statement("invoice", today, tomorrow), set()
+    yield "documents: prescriptions of a day", pack_statement("prescription", today, tomorrow), set()
+    yield "ai notes: by patient", select(AINote).where(AINote.patient_id == 7).order_by(AINote.created_at.desc()), set()
+    yield "patients: keyset page", _filtered_patients(None, None, None).where(Patient.id > 100).order_by(
+        Patient.id).limit(page), set()
+    yield "patients: summary version", summary_version_statement(7), set()
+    yield "patients: by phone", _filtered_patients(None, "5550000007", None).order_by(Patient.id).limit(page), set()
+    yield "patients: by name prefix", _filtered_patients("Patient 1", None, None).order_by(Patient.id).limit(page), {"sort"}
+    # ^ range of the name index, matches sorted by id in memory
+    yield "patients: by gender", _filtered_patients(None, None, "F").order_by(Patient.id).limit(page), {"scan"}
+    # ^ two or three values are not worth an index: reads in id order until a page matches
+    if dialect == "sqlite":
+        yield "patients: search by name", FTS_QUERY.bindparams(
+            match=patient_search.fts_match("pat", False), limit=20), {"sort"}
+        yield "patients: search by phone", FTS_QUERY.bindparams(
+            match=patient_search.fts_match("5550", True), limit=20), {"sort"}
+        # ^ FTS index lookups, ranked by bm25 in memory
+        yield "patients: search results", select(Patient).where(Patient.id.in_([3, 5, 8])), set()
+    yield "auth: user by email", select(User.hashed_password).where(User.email == "doctor1@plans.local"), set()
+
+    if dialect == "postgresql":
+        yield "patients: search by name", patient_search._postgres_query("pat", False, 20), {"sort"}
+        # ^ trigram index lookup, ranked by similarity in memory
+        yield "patients: search by phone", patient_search._postgres_query("5550000", True, 20), {"sort"}
+        # ^ range scan of ix_patients_phone_digits, matches ranked by length in memory
+
+
+def run(verbose: bool) -> int:
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        print(f"Unsupported database: {dialect}")
+        return 2
+    failures = 0
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            # tiny tables make sequential scans cheapest; ask whether an index could be used at all
+            conn.execute(text("SET enable_seqscan = off"))
+            conn.execute(text("SET enable_sort = off"))
+            findings_of = postgresql_findings
+        else:
+            findings_of = sqlite_findings
+        for name, stmt, allowed in checks(dialect):
+            findings, lines = findings_of(conn, stmt)
+            unexpected = findings - allowed
+            failures += bool(unexpected)
+            status = "FAIL " + ", ".join(sorted(unexpected)) if unexpected else "ok"
+            print(f"{status:<12} {name}")
+            if verbose or unexpected:
+                for line in lines:
+                    print(f"{'':<12}   {line}")
+    print(f"{failures} failing quer{'y' if failures == 1 else 'ies'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    prepare_database()
+    seed(ARGS.rows)
+    sys.exit(run(ARGS.verbose))
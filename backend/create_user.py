@@ -0,0 +1,40 @@
+"""
+Create (or reset the password of) a login account
+
+Usage: python create_user.py <email> <password> [--name NAME] [--role ROLE]
+"""
+import argparse
+
+from app.database import SessionLocal, upgrade_database
+from app import models
+from app.auth_utils import get_password_hash, revoke_user_tokens
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or update a clinic user")
+    parser.add_argument("email")
+    parser.add_argument("password")
+    parser.add_argument("--name", default="Doctor")
+    parser.add_argument("--role", default="doctor")
+    args = parser.parse_args()
+
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == args.email).first()
+        if user:
+            user.hashed_password = get_password_hash(args.password)
+            user.role = args.role
+            # signs out every session of the old password / role
+            revoke_user_tokens(args.email, db)
+            print(f"Updated {args.email}")
+        else:
+            db.add(models.User(
+                name=args.name,
+                email=args.email,
+                role=args.role,
+                hashed_password=get_password_hash(args.password)
+            ))
+            print(f"Created {args.email}")
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,70 @@
+import { useEffect, useState } from 'react'
+import { searchPatients } from '../services/api'
+
+/**
+ * Patient select backed by the type-ahead search (name or phone prefix),
+ * so forms never load the whole patient table. onChange receives the id.
+ */
+function PatientPicker({ value, onChange, placeholder = 'Search name or phone' }) {
+  const [query, setQuery] = useState('')
+  const [matches, setMatches] = useState([])
+  const [picked, setPicked] = useState(null)
+
+  // the parent cleared the form
+  useEffect(() => {
+    if (!value) {
+      setQuery('')
+      setPicked(null)
+    }
+  }, [value])
+
+  useEffect(() => {
+    const q = query.trim()
+    if (!q) {
+      setMatches([])
+      return
+    }
+    let stale = false
+    const timer = setTimeout(async () => {
+      try {
+        const res = await searchPatients(q)
+        if (!stale) setMatches(res.data || [])
+      } catch {
+        if (!stale) setMatches([])
+      }
+    }, 250)
+    return () => {
+      stale = true
+      clearTimeout(timer)
+    }
+  }, [query])
+
+  // keep the chosen patient selectable while the search moves on
+  const options = picked && !matches.some((p) => p.id === picked.id) ? [picked, ...matches] : matches
+
+  const pick = (id) => {
+    setPicked(options.find((p) => String(p.id) === id) || null)
+    onChange(id)
+  }
+
+  return (
+    <>
+      <input
+        type="search"
+        placeholder={placeholder}
+        value={query}
+        onChange={(e) => setQuery(e.target.value)}
+      />
+      <select value={value} onChange={(e) => pick(e.target.value)}>
+        <option value="">{query.trim() ? `${matches.length} matches` : 'Type to search patients'}</option>
+        {options.map((p) => (
+          <option key={p.id} value={p.id}>
+            {p.name} (#{p.id}){p.phone ? ` · ${p.phone}` : ''}
+          </option>
+        ))}
+      </select>
+    </>
+  )
+}
+
+export default PatientPicker
@@ -1,11 +1,14 @@
 import { useEffect, useMemo, useState } from 'react'
 import { getDoctorOnLeave } from '../utils/doctorStatus'
-import { getAppointments, createAppointment, getPatients, getQueueStatus, createQueueToken, updateQueueToken, deleteAppointment, deleteQueueToken } from '../services/api'
+import { getAppointments, createAppointment, getPatientsByIds, createQueueToken, updateQueueToken, deleteAppointment, deleteQueueToken, subscribeQueue, applyQueueEvent } from '../services/api'
+import PatientPicker from '../components/PatientPicker'
 import './Appointments.css'
 
 function Appointments() {
   const [appointments, setAppointments] = useState([])
-  const [patients, setPatients] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  // names of the patients on the loaded pages, by id
+  const [patientNames, setPatientNames] = useState({})
   const [queue, setQueue] = useState([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
@@ -24,24 +27,30 @@ function Appointments() {
   useEffect(() => {
     setIsOnLeave(getDoctorOnLeave())
     loadData()
-    const interval = setInterval(() => {
-      refreshQueue()
-    }, 10000)
-    return () => clearInterval(interval)
+    // Live queue: server pushes a snapshot, then only the changes
+    const socket = subscribeQueue((event) => {
+      setQueue((prev) => applyQueueEvent(prev, event))
+    })
+    return () => socket.close()
   }, [])
 
-  const loadData = async () => {
+  // first page replaces the list; passing a cursor appends the next one
+  const loadData = async (cursor) => {
     try {
       setLoading(true)
       setError('')
-      const [aptRes, patientRes, queueRes] = await Promise.all([
-        getAppointments(),
-        getPatients(),
-        getQueueStatus()
-      ])
-      setAppointments(aptRes.data || [])
-      setPatients(patientRes.data || [])
-      setQueue(queueRes.data || [])
+      const aptRes = await getAppointments({ cursor: cursor || undefined })
+      const page = aptRes.data || []
+      setAppointments((prev) => (cursor ? [...prev, ...page] : page))
+      setNextCursor(aptRes.nextCursor)
+      const ids = [...new Set(page.map((a) => a.patient_id))]
+      if (ids.length) {
+        const patientRes = await getPatientsByIds(ids)
+        setPatientNames((prev) => ({
+          ...prev,
+          ...Object.fromEntries(patientRes.data.map((p) => [p.id, p.name]))
+        }))
+      }
     } catch (err) {
       setError('Could not load appointments. Please try again.')
     } finally {
@@ -79,7 +88,9 @@ function Appointments() {
       setForm({ patientId: '', reason: '', date: '', time: '' })
       loadData()
     } catch (err) {
-      setError('Failed to create appointment.')
+      setError(err.response?.status === 409
+        ? 'That time overlaps an existing appointment.'
+        : 'Failed to create appointment.')
     }
   }
 
@@ -87,7 +98,6 @@ function Appointments() {
     setError('')
     try {
       await createQueueToken({ appointment_id: appointmentId })
-      await refreshQueue()
     } catch (err) {
       setError('Failed to add to queue.')
     }
@@ -97,21 +107,11 @@ function Appointments() {
     setError('')
     try {
       await updateQueueToken(tokenId, status)
-      await refreshQueue()
     } catch (err) {
       setError('Failed to update queue.')
     }
   }
 
-  const refreshQueue = async () => {
-    try {
-      const queueRes = await getQueueStatus()
-      setQueue(queueRes.data || [])
-    } catch {
-      /* silent poll */
-    }
-  }
-
   const inQueueCount = useMemo(
     () => appointments.filter((a) => a.status === 'in-queue' || a.status === 'In Queue').length,
     [appointments]
@@ -121,10 +121,7 @@ function Appointments() {
     [appointments]
   )
 
-  const patientNameById = (id) => {
-    const p = patients.find((x) => x.id === id)
-    return p ? p.name : `Patient #${id}`
-  }
+  const patientNameById = (id) => patientNames[id] || `Patient #${id}`
 
   return (
     <div className="appointments-page">
@@ -147,10 +144,10 @@ function Appointments() {
         <div className="appointments-card">
           <div className="card-top">
             <h2 className="card-title">Upcoming Appointments</h2>
-            <span className="badge">{appointments.length} total</span>
+            <span className="badge">{appointments.length} shown</span>
           </div>
 
-          {loading ? (
+          {loading && appointments.length === 0 ? (
             <div className="loading">Loading...</div>
           ) : (
             <div className="appointments-list">
@@ -209,6 +206,11 @@ function Appointments() {
                 )
               })}
               {appointments.length === 0 && <div className="empty">No appointments yet.</div>}
+              {nextCursor && (
+                <button className="small-btn" type="button" disabled={loading} onClick={() => loadData(nextCursor)}>
+                  {loading ? 'Loading...' : 'Load more'}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -238,18 +240,10 @@ function Appointments() {
             <form className="appointment-form" onSubmit={handleSubmit}>
               <label className="form-label">
                 Patient
-                <select
-                  name="patientId"
+                <PatientPicker
                   value={form.patientId}
-                  onChange={handleChange}
-                >
-                  <option value="">Select patient</option>
-                  {patients.map((p) => (
-                    <option key={p.id} value={p.id}>
-                      {p.name} (#{p.id})
-                    </option>
-                  ))}
-                </select>
+                  onChange={(patientId) => setForm((prev) => ({ ...prev, patientId }))}
+                />
               </label>
 
               <label className="form-label">
@@ -320,7 +314,6 @@ function Appointments() {
                       onClick={async () => {
                         try {
                           await deleteQueueToken(q.token_id)
-                          await refreshQueue()
                         } catch {
                           setError('Failed to delete token.')
                         }
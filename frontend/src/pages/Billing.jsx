@@ -1,9 +1,9 @@
-import { useEffect, useState } from "react";
-import { getPatients, createBill } from "../services/api";
+import { useState } from "react";
+import { createBill } from "../services/api";
+import PatientPicker from "../components/PatientPicker";
 import "./Billing.css";
 
 function Billing() {
-  const [patients, setPatients] = useState([]);
   const [form, setForm] = useState({
     patientId: "",
     amount: "",
@@ -15,17 +15,6 @@ function Billing() {
   const [loading, setLoading] = useState(false);
   const [summary, setSummary] = useState("");
 
-  useEffect(() => {
-    (async () => {
-      try {
-        const res = await getPatients();
-        setPatients(res.data || []);
-      } catch (err) {
-        setError("Could not load patients.");
-      }
-    })();
-  }, []);
-
   const handleChange = (e) => {
     const { name, value } = e.target;
     setForm((prev) => ({ ...prev, [name]: value }));
@@ -65,18 +54,10 @@ function Billing() {
 
       <form className="billing-form" onSubmit={generateBill}>
         <label>Patient</label>
-        <select
-          name="patientId"
+        <PatientPicker
           value={form.patientId}
-          onChange={handleChange}
-        >
-          <option value="">Select patient</option>
-          {patients.map((p) => (
-            <option key={p.id} value={p.id}>
-              {p.name} (#{p.id})
-            </option>
-          ))}
-        </select>
+          onChange={(patientId) => setForm((prev) => ({ ...prev, patientId }))}
+        />
 
         <label>Amount (₹)</label>
         <input
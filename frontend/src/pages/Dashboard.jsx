@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { getDoctorOnLeave, setDoctorOnLeave } from '../utils/doctorStatus'
-import { getAppointments, getPatients, getQueueStatus } from '../services/api'
+import { getAppointments, getDashboardStats, getQueueStatus } from '../services/api'
 import './Dashboard.css'
 
 function Dashboard() {
@@ -24,40 +24,52 @@ function Dashboard() {
     try {
       setLoading(true)
       setError('')
-      const [aptRes, patientRes, queueRes] = await Promise.all([
-        getAppointments(),
-        getPatients(),
+      // counts come from the server; only today's appointments and tokens are listed
+      const start = new Date()
+      start.setUTCHours(0, 0, 0, 0)
+      const end = new Date(start.getTime() + 24 * 60 * 60 * 1000)
+      const [statsRes, aptRes, queueRes] = await Promise.all([
+        getDashboardStats(),
+        getAppointments({ start: start.toISOString(), end: end.toISOString(), limit: 200 }),
         getQueueStatus()
       ])
-      const appts = aptRes.data || []
-      setAppointments(appts)
+      const stats = statsRes.data
+      setAppointments(aptRes.data || [])
       setQueue(queueRes.data || [])
       // simple notifications based on latest activity
       const notes = []
-      if (appts.length) {
+      if (stats.appointments_today) {
         notes.push({
           id: 'apt',
-          message: `You have ${appts.length} appointments scheduled`,
+          message: `You have ${stats.appointments_today} appointments scheduled`,
           date: 'Today',
           icon: '📅'
         })
       }
-      if (queueRes.data && queueRes.data.length) {
+      if (stats.queue_waiting) {
         notes.push({
           id: 'queue',
-          message: `Queue active: ${queueRes.data.length} patients waiting`,
+          message: `Queue active: ${stats.queue_waiting} patients waiting`,
           date: 'Live',
           icon: '⏱️'
         })
       }
-      if (patientRes.data && patientRes.data.length) {
+      if (stats.total_patients) {
         notes.push({
           id: 'patients',
-          message: `${patientRes.data.length} patients in records`,
+          message: `${stats.total_patients} patients in records`,
           date: 'Today',
           icon: '🧑‍⚕️'
         })
       }
+      if (stats.unpaid_bills) {
+        notes.push({
+          id: 'billing',
+          message: `${stats.unpaid_bills} unpaid bills totalling ${stats.unpaid_amount.toFixed(2)}`,
+          date: 'Today',
+          icon: '💳'
+        })
+      }
       setNotifications(notes)
     } catch (err) {
       setError('Could not load dashboard data.')
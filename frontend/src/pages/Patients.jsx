@@ -6,6 +6,7 @@ import "./Patients.css"
 function Patients() {
   const navigate = useNavigate()
   const [patients, setPatients] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
   const [error, setError] = useState('')
   const [loading, setLoading] = useState(false)
   const [form, setForm] = useState({
@@ -19,12 +20,14 @@ function Patients() {
     loadPatients()
   }, [])
 
-  const loadPatients = async () => {
+  // first page replaces the list; passing a cursor appends the next one
+  const loadPatients = async (cursor) => {
     try {
       setLoading(true)
       setError('')
-      const res = await getPatients()
-      setPatients(res.data)
+      const res = await getPatients({ cursor: cursor || undefined })
+      setPatients((prev) => (cursor ? [...prev, ...res.data] : res.data))
+      setNextCursor(res.nextCursor)
     } catch (err) {
       setError('Could not load patients.')
     } finally {
@@ -72,7 +75,7 @@ function Patients() {
         <div className="patients-card">
           <h2>Patient List</h2>
 
-          {loading ? (
+          {loading && patients.length === 0 ? (
             <div className="loading">Loading...</div>
           ) : (
             <div className="patients-list">
@@ -107,6 +110,11 @@ function Patients() {
                 </div>
               ))}
               {patients.length === 0 && <div className="empty">No patients yet.</div>}
+              {nextCursor && (
+                <button className="small-btn" disabled={loading} onClick={() => loadPatients(nextCursor)}>
+                  {loading ? "Loading..." : "Load more"}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -1,9 +1,9 @@
 import { useEffect, useState, useRef } from "react";
-import { getPatients, createPrescription, generatePrescriptionAI, transcribeVoice, getPrescriptionsByPatient, deletePrescription } from "../services/api";
+import { createPrescription, generatePrescriptionAI, transcribeVoiceStream, getPrescriptionsByPatient, deletePrescription } from "../services/api";
+import PatientPicker from "../components/PatientPicker";
 import "./Prescription.css";
 
 const Prescription = () => {
-  const [patients, setPatients] = useState([]);
   const [form, setForm] = useState({
     patientId: "",
     diagnosis: "",
@@ -22,17 +22,6 @@ const Prescription = () => {
   const [recording, setRecording] = useState(false);
   const [recent, setRecent] = useState([]);
 
-  useEffect(() => {
-    (async () => {
-      try {
-        const res = await getPatients();
-        setPatients(res.data || []);
-      } catch (err) {
-        setError("Could not load patients.");
-      }
-    })();
-  }, []);
-
   useEffect(() => {
     if (form.patientId) {
       loadRecent(form.patientId);
@@ -126,8 +115,14 @@ const Prescription = () => {
       setTranscribing(true);
       const fd = new FormData();
       fd.append("file", file);
-      const res = await transcribeVoice(fd);
-      setSymptoms((prev) => (prev ? `${prev}\n${res.data.text}` : res.data.text));
+      // append each segment as soon as the server has transcribed it
+      let first = true;
+      await transcribeVoiceStream(fd, (segment) => {
+        if (!segment.text) return;
+        const sep = first ? "\n" : " ";
+        first = false;
+        setSymptoms((prev) => (prev ? `${prev}${sep}${segment.text}` : segment.text));
+      });
       setMessage("Transcript added to symptoms.");
     } catch (err) {
       setError("Transcription failed. Ensure OPENAI_API_KEY is set.");
@@ -183,7 +178,6 @@ const Prescription = () => {
         </div>
         <div className="header-actions">
           <span className="badge soft">AI ready</span>
-          <span className="badge soft blue">{patients.length} patients</span>
         </div>
       </div>
 
@@ -199,18 +193,10 @@ const Prescription = () => {
           <form className="prescription-form" onSubmit={handleSubmit}>
             <label className="form-label">
               Patient
-              <select
-                name="patientId"
+              <PatientPicker
                 value={form.patientId}
-                onChange={handleChange}
-              >
-                <option value="">Select patient</option>
-                {patients.map((p) => (
-                  <option key={p.id} value={p.id}>
-                    {p.name} (#{p.id})
-                  </option>
-                ))}
-              </select>
+                onChange={(patientId) => setForm((prev) => ({ ...prev, patientId }))}
+              />
             </label>
 
             <label className="form-label">
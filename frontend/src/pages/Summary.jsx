@@ -1,24 +1,13 @@
-import { useEffect, useState } from "react"
-import { getPatients, getPatientSummary } from "../services/api"
+import { useState } from "react"
+import { getPatientSummary } from "../services/api"
+import PatientPicker from "../components/PatientPicker"
 
 function Summary() {
-  const [patients, setPatients] = useState([])
   const [selected, setSelected] = useState("")
   const [summary, setSummary] = useState(null)
   const [error, setError] = useState("")
   const [loading, setLoading] = useState(false)
 
-  useEffect(() => {
-    (async () => {
-      try {
-        const res = await getPatients()
-        setPatients(res.data || [])
-      } catch {
-        setError("Could not load patients.")
-      }
-    })()
-  }, [])
-
   const loadSummary = async (patientId) => {
     setError("")
     setLoading(true)
@@ -44,17 +33,7 @@ function Summary() {
       <div className="patients-card" style={{ marginBottom: 16 }}>
         <h2>Select Patient</h2>
         <div className="patient-form" style={{ gap: 12 }}>
-          <select
-            value={selected}
-            onChange={(e) => setSelected(e.target.value)}
-          >
-            <option value="">Choose patient</option>
-            {patients.map((p) => (
-              <option key={p.id} value={p.id}>
-                {p.name} (#{p.id})
-              </option>
-            ))}
-          </select>
+          <PatientPicker value={selected} onChange={setSelected} />
           <button
             className="primary-btn"
             onClick={() => selected && loadSummary(selected)}
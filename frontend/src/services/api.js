@@ -11,11 +11,30 @@ const API = axios.create({
   }
 })
 
+/**
+ * One page of a keyset-paginated list.
+ * Resolves to { data, nextCursor }; pass nextCursor back as `cursor` for the
+ * next page (null after the last one).
+ */
+const getPage = async (path, params = {}) => {
+  const res = await API.get(path, { params, paramsSerializer: { indexes: null } })
+  return { data: res.data, nextCursor: res.headers["x-next-cursor"] || null }
+}
+
+
 /* =========================
    PATIENTS
 ========================= */
 
-export const getPatients = () => API.get("/patients")
+// one page (100 by default) with nextCursor
+export const getPatients = (params) => getPage("/patients", params)
+
+// name lookup for the patients referenced on a page of other records
+export const getPatientsByIds = (ids) =>
+  getPage("/patients", { ids, limit: Math.max(ids.length, 1) })
+
+export const searchPatients = (q, limit = 20) =>
+  API.get("/patients/search", { params: { q, limit } })
 
 export const getPatientById = (patientId) =>
   API.get(`/patients/${patientId}`)
@@ -37,8 +56,8 @@ export const getPatientAppointments = (patientId) =>
    APPOINTMENTS
 ========================= */
 
-export const getAppointments = () =>
-  API.get("/appointments")
+// one page (100 by default), newest first, with nextCursor
+export const getAppointments = (params) => getPage("/appointments", params)
 
 export const getAppointmentById = (appointmentId) =>
   API.get(`/appointments/${appointmentId}`)
@@ -46,6 +65,9 @@ export const getAppointmentById = (appointmentId) =>
 export const createAppointment = (data) =>
   API.post("/appointments", data)
 
+export const getAvailability = (params) =>
+  API.get("/appointments/availability", { params })
+
 export const deleteAppointment = (appointmentId) =>
   API.delete(`/appointments/${appointmentId}`)
 
@@ -63,6 +85,10 @@ export const getPrescriptionByAppointment = (appointmentId) =>
 export const getPrescriptionsByPatient = (patientId) =>
   API.get(`/prescriptions/patient/${patientId}`)
 
+// printable PDF (open in a new tab; re-prints are served from the ETag cache)
+export const prescriptionPdfUrl = (prescriptionId) =>
+  `${API.defaults.baseURL}/prescriptions/${prescriptionId}/pdf`
+
 export const deletePrescription = (prescriptionId) =>
   API.delete(`/prescriptions/${prescriptionId}`)
 
@@ -80,16 +106,26 @@ export const getBillByAppointment = (appointmentId) =>
 export const getBillsByPatient = (patientId) =>
   API.get(`/billing/patient/${patientId}`)
 
+export const billPdfUrl = (billId) =>
+  `${API.defaults.baseURL}/billing/${billId}/pdf`
+
 export const deleteBill = (billId) =>
   API.delete(`/billing/${billId}`)
 
+export const documentPackUrl = (start, end, kinds = "invoice,prescription") =>
+  `${API.defaults.baseURL}/documents/daily-pack?${new URLSearchParams({ start, end: end || start, kinds })}`
+
+export const getDocumentPackProgress = (batchId) =>
+  API.get(`/documents/daily-pack/${batchId}/progress`)
+
 
 /* =========================
    QUEUE MANAGEMENT
 ========================= */
 
-export const getQueueStatus = (appointmentId) =>
-  API.get("/queue")
+// tokens issued today (UTC); pass { day: "YYYY-MM-DD" } for another day
+export const getQueueStatus = (params) =>
+  API.get("/queue", { params })
 
 export const createQueueToken = (data) =>
   API.post("/queue", null, { params: data })
@@ -100,6 +136,71 @@ export const updateQueueToken = (tokenId, status) =>
 export const deleteQueueToken = (tokenId) =>
   API.delete(`/queue/${tokenId}`)
 
+/**
+ * Live queue feed over WebSocket.
+ * onEvent receives { type: "snapshot", tokens } first, then
+ * created / updated / deleted diffs. A dropped socket is reopened with
+ * backoff (1 s doubling to 30 s); the server starts every connection with a
+ * fresh snapshot, so nothing missed in between lingers.
+ * Returns { close } to stop the feed.
+ */
+export const subscribeQueue = (onEvent) => {
+  const wsURL = API.defaults.baseURL.replace(/^http/, "ws") + "/queue/ws"
+  let socket
+  let timer
+  let delay = 1000
+  let closed = false
+
+  const connect = () => {
+    socket = new WebSocket(wsURL)
+    socket.onopen = () => {
+      delay = 1000
+    }
+    socket.onmessage = (msg) => onEvent(JSON.parse(msg.data))
+    socket.onclose = () => {
+      if (closed) return
+      timer = setTimeout(connect, delay)
+      delay = Math.min(delay * 2, 30000)
+    }
+  }
+
+  connect()
+  return {
+    close: () => {
+      closed = true
+      clearTimeout(timer)
+      socket.close()
+    }
+  }
+}
+
+/**
+ * Apply a live queue event to the current token list.
+ */
+export const applyQueueEvent = (tokens, event) => {
+  switch (event.type) {
+    case "snapshot":
+      return event.tokens
+    case "created":
+      return [...tokens.filter((t) => t.token_id !== event.token.token_id), event.token]
+        .sort((a, b) => a.token_number - b.token_number)
+    case "updated":
+      return tokens.map((t) => (t.token_id === event.token.token_id ? event.token : t))
+    case "deleted":
+      return tokens.filter((t) => t.token_id !== event.token_id)
+    default:
+      return tokens
+  }
+}
+
+
+/* =========================
+   DASHBOARD
+========================= */
+
+export const getDashboardStats = () =>
+  API.get("/dashboard/stats")
+
 
 /* =========================
    AI ASSISTANT
@@ -108,13 +209,47 @@ export const deleteQueueToken = (tokenId) =>
 export const generatePrescriptionAI = (data) =>
   API.post("/ai/prescription", data)
 
+// queues a job: { job_id, status }; poll getSOAPJob until status is done / failed
 export const generateSOAPNotes = (data) =>
   API.post("/ai/soap", data)
 
+export const getSOAPJob = (jobId, wait = 20) =>
+  API.get(`/ai/soap/jobs/${jobId}`, { params: { wait } })
+
 export const transcribeVoice = (formData) =>
   API.post("/ai/transcribe", formData, {
     headers: { "Content-Type": "multipart/form-data" }
   })
 
+/**
+ * Streamed transcription: onSegment receives each { index, start, end, text }
+ * as soon as it is ready. Resolves with the full transcript.
+ */
+export const transcribeVoiceStream = async (formData, onSegment) => {
+  const res = await fetch(`${API.defaults.baseURL}/ai/transcribe/stream`, {
+    method: "POST",
+    body: formData
+  })
+  if (!res.ok) throw new Error(`Transcription failed (${res.status})`)
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ""
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+    const lines = buffered.split("\n")
+    buffered = lines.pop()
+    for (const line of lines) {
+      if (!line.trim()) continue
+      const event = JSON.parse(line)
+      if (event.error) throw new Error(event.error)
+      if (event.done) return event.text
+      onSegment(event)
+    }
+  }
+  throw new Error("Transcription stream ended early")
+}
+
 
 export default API